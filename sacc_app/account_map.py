@@ -0,0 +1,83 @@
+import frappe
+
+from sacc_app.cache import clear_cached_value_on_commit, get_cached_value
+
+ACCOUNT_MAP_KEY = "sacc_app:account_map"
+
+
+def get_default_company():
+	return frappe.defaults.get_user_default("Company") or get_account_maps().get("default_company")
+
+
+def get_account_map(company=None):
+	"""
+	Resolved posting accounts for a company:
+	company, cash, bank, interest_income, interest_receivable, welfare_fund, share_capital,
+	member_loans_parent, member_savings_parent and mode_of_payment {mode: account}.
+	"""
+	company = company or get_default_company()
+	return get_account_maps()["companies"].get(company) or frappe._dict(company=company, mode_of_payment={})
+
+
+def get_payment_account(mode=None, company=None):
+	"""Account for a mode of payment: the Mode of Payment Account mapping, else the cash account."""
+	accounts = get_account_map(company)
+	return accounts.mode_of_payment.get(mode) or accounts.cash
+
+
+def get_account_maps():
+	return get_cached_value(ACCOUNT_MAP_KEY, build_account_maps)
+
+
+def build_account_maps():
+	maps = frappe._dict(
+		default_company=frappe.db.get_single_value("Global Defaults", "default_company"),
+		companies={}
+	)
+
+	mode_accounts = {}
+	for row in frappe.db.get_all("Mode of Payment Account",
+		filters={"parenttype": "Mode of Payment", "default_account": ["is", "set"]},
+		fields=["parent", "company", "default_account"]):
+		mode_accounts.setdefault(row.company, {})[row.parent] = row.default_account
+
+	for company in frappe.db.get_all("Company", pluck="name"):
+		maps.companies[company] = build_company_accounts(company, mode_accounts.get(company, {}))
+
+	return maps
+
+
+def build_company_accounts(company, mode_of_payment):
+	def find(*filters):
+		# First filter set that matches wins, same fallbacks the posting code used inline
+		for f in filters:
+			account = frappe.db.get_value("Account", dict(f, company=company))
+			if account:
+				return account
+
+	return frappe._dict(
+		company=company,
+		cash=find({"account_type": "Cash", "is_group": 0}, {"is_group": 0, "root_type": "Asset"}),
+		bank=find({"account_type": "Bank", "is_group": 0}),
+		interest_income=find({"account_name": "SACCO Interest Income"}, {"root_type": "Income", "is_group": 0}),
+		interest_receivable=find({"account_name": "SACCO Interest Receivable"}),
+		welfare_fund=find({"account_name": "Welfare Fund Account"}, {"root_type": "Liability", "is_group": 0}),
+		share_capital=find({"account_name": "Share Capital Account"}, {"root_type": "Equity", "is_group": 0}),
+		member_loans_parent=find({"account_name": "SACCO Members Accounts"}),
+		member_savings_parent=find({"account_name": "SACCO Member Savings"}),
+		mode_of_payment=mode_of_payment
+	)
+
+
+def clear_account_map(doc=None, method=None, *args, **kwargs):
+	"""
+	doc_events hook for Account, Company, Global Defaults and Mode of Payment. after_rename also
+	passes the old and new names and the merge flag.
+	"""
+	if doc and doc.doctype == "Account" and not doc.is_group:
+		# Individual member ledgers are created with every member and never appear in the map
+		accounts = get_account_map(doc.company)
+		if doc.parent_account and doc.parent_account in (accounts.member_loans_parent, accounts.member_savings_parent):
+			return
+
+	clear_cached_value_on_commit(ACCOUNT_MAP_KEY)
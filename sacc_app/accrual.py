@@ -0,0 +1,178 @@
+"""
+Daily interest accrual.
+
+Each day an active loan earns the part of its current installment's interest not yet
+recognized, spread evenly over the days left to the due date, so flat and reducing-balance loans
+alike have recognized exactly their scheduled interest by each due date. One SACCO Interest
+Accrual with one Journal Entry (Dr Interest Receivable, Cr Interest Income) is posted per product
+per day; the accrual is named after the date and product, so re-running a range skips what is
+already posted.
+Repayments clear the loan's accrued interest from the receivable before crediting income.
+"""
+
+import frappe
+from frappe.utils import add_days, flt, getdate, nowdate
+
+from sacc_app.account_map import get_account_map
+from sacc_app.jobs import track_job_run
+
+# Upper bound on days per run
+MAX_ACCRUAL_DAYS = 366
+
+# Per-loan daily interest on %(date)s from the current installment, whose period runs from the
+# previous due date (a month before the first) to its own. Interest is recognized once, either
+# accrued or collected beyond what was accrued, so what is left to recognize is the interest
+# less the larger of the two; it is spread over the days left to the due date.
+ACCRUAL_JOIN = """
+	`tabSACCO Loan` loan
+	INNER JOIN `tabSACCO Loan Installment` inst ON inst.parent = loan.name AND inst.parenttype = 'SACCO Loan'
+	LEFT JOIN `tabSACCO Loan Installment` prev ON prev.parent = inst.parent AND prev.parenttype = 'SACCO Loan'
+		AND prev.installment_no = inst.installment_no - 1
+"""
+
+ACCRUAL_CONDITIONS = """
+	loan.docstatus = 1 AND loan.status = 'Active' {conditions}
+		AND inst.due_date >= %(date)s
+		AND IFNULL(prev.due_date, DATE_SUB(inst.due_date, INTERVAL 1 MONTH)) < %(date)s
+		AND GREATEST(inst.interest_accrued, inst.interest_paid) < inst.interest - 0.005
+"""
+
+DAILY_INTEREST = """ROUND((inst.interest - GREATEST(inst.interest_accrued, inst.interest_paid))
+	/ (DATEDIFF(inst.due_date, %(date)s) + 1), 2)"""
+
+
+def accrue_interest(from_date=None, to_date=None, run=None):
+	"""
+	Daily task: posts yesterday's accrual. Given a range, posts every day in it that has not
+	been posted yet, so a missed night or a back-fill is just a re-run.
+	"""
+	to_date = getdate(to_date or add_days(nowdate(), -1))
+	from_date = getdate(from_date or to_date)
+	if (to_date - from_date).days + 1 > MAX_ACCRUAL_DAYS:
+		frappe.throw(f"Too many days. Maximum is {MAX_ACCRUAL_DAYS} per run.")
+
+	with track_job_run("Interest Accrual", run=run) as run:
+		run.details = {"from_date": str(from_date), "to_date": str(to_date), "posted": [], "skipped": 0}
+		date = from_date
+		while date <= to_date:
+			posted, skipped = post_interest_accrual(date)
+			run.details["posted"].extend(posted)
+			run.details["skipped"] += skipped
+			run.rows_affected += len(posted)
+			date = add_days(date, 1)
+
+
+def post_interest_accrual(date):
+	"""
+	Posts one date's accrual for every product not yet accrued on that date. Each product is its
+	own transaction: accrual record, Journal Entry and loan balances commit together.
+	Returns (accrual names posted, products skipped as already posted).
+	"""
+	date = getdate(date)
+	done = set(frappe.db.sql_list("SELECT loan_product FROM `tabSACCO Interest Accrual` WHERE accrual_date = %s", (date,)))
+
+	posted, skipped = [], 0
+	for row in frappe.db.sql(f"""
+		SELECT loan.loan_product, COUNT(*) AS loan_count, SUM({DAILY_INTEREST}) AS amount
+		FROM {ACCRUAL_JOIN}
+		WHERE {ACCRUAL_CONDITIONS.format(conditions="")}
+		GROUP BY loan.loan_product
+	""", {"date": date}, as_dict=True):
+		if row.loan_product in done:
+			skipped += 1
+			continue
+		if flt(row.amount, 2) <= 0:
+			continue
+
+		try:
+			posted.append(post_product_accrual(date, row))
+			frappe.db.commit()
+		except frappe.DuplicateEntryError:
+			# Posted by a concurrent run
+			frappe.db.rollback()
+			skipped += 1
+
+	return posted, skipped
+
+
+def post_product_accrual(date, row):
+	accrual = frappe.get_doc({
+		"doctype": "SACCO Interest Accrual",
+		"accrual_date": date,
+		"loan_product": row.loan_product,
+		"loan_count": row.loan_count,
+		"amount": flt(row.amount, 2)
+	})
+	accrual.insert(ignore_permissions=True)
+
+	# Loan first: the installment's accrued amount is part of the day's interest, and the order
+	# of assignments within one multi-table UPDATE is not guaranteed
+	for target in ("loan.accrued_interest", "inst.interest_accrued"):
+		frappe.db.sql(f"""
+			UPDATE {ACCRUAL_JOIN}
+			SET {target} = {target} + {DAILY_INTEREST}
+			WHERE {ACCRUAL_CONDITIONS.format(conditions="AND loan.loan_product = %(loan_product)s")}
+		""", {"date": date, "loan_product": row.loan_product})
+
+	accrual.db_set("journal_entry", make_accrual_journal_entry(accrual))
+	return accrual.name
+
+
+def make_accrual_journal_entry(accrual):
+	"""Dr Interest Receivable, Cr Interest Income with the day's accrual for one product."""
+	accounts = get_account_map()
+	if not accounts.interest_receivable or not accounts.interest_income:
+		frappe.throw("SACCO Interest Receivable and SACCO Interest Income accounts are required for interest accrual.")
+
+	je = frappe.new_doc("Journal Entry")
+	je.posting_date = accrual.accrual_date
+	je.company = accounts.company
+	je.voucher_type = "Journal Entry"
+	je.user_remark = f"Interest Accrual {accrual.name}: {accrual.loan_product} ({accrual.loan_count} loans)"
+	je.append("accounts", {
+		"account": accounts.interest_receivable,
+		"debit_in_account_currency": accrual.amount,
+		"credit_in_account_currency": 0
+	})
+	je.append("accounts", {
+		"account": accounts.interest_income,
+		"debit_in_account_currency": 0,
+		"credit_in_account_currency": accrual.amount
+	})
+	je.save(ignore_permissions=True)
+	je.submit()
+	return je.name
+
+
+def settle_accrued_interest(interest_by_loan):
+	"""
+	Clears collected interest against each loan's accrued balance. `interest_by_loan` is a list
+	of (loan, interest collected) in posting order; returns the part of each that came out of
+	the receivable, in the same order. Loans are locked so concurrent accruals wait.
+	"""
+	loans = tuple({loan for loan, _ in interest_by_loan})
+	if not loans:
+		return []
+
+	accrued = {name: flt(amount) for name, amount in frappe.db.sql("""
+		SELECT name, accrued_interest FROM `tabSACCO Loan` WHERE name IN %s FOR UPDATE
+	""", (loans,))}
+
+	settled, totals = [], {}
+	for loan, interest in interest_by_loan:
+		amount = flt(min(max(0, flt(interest)), accrued.get(loan, 0)), 2)
+		accrued[loan] = flt(accrued.get(loan, 0) - amount, 2)
+		totals[loan] = totals.get(loan, 0) + amount
+		settled.append(amount)
+
+	for loan, amount in totals.items():
+		if amount > 0:
+			adjust_accrued_interest(loan, -amount)
+
+	return settled
+
+
+def adjust_accrued_interest(loan, amount):
+	frappe.db.sql("""
+		UPDATE `tabSACCO Loan` SET accrued_interest = GREATEST(accrued_interest + %s, 0) WHERE name = %s
+	""", (flt(amount, 2), loan))
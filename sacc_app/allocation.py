@@ -0,0 +1,236 @@
+"""
+Repayment allocation waterfall.
+
+Payments settle the oldest unpaid installments first and, within an installment, its
+components in the order configured in SACCO Settings (penalty, interest, principal by default).
+Each loan keeps a cursor (next_installment_idx) on the oldest installment not fully paid, so a
+payment reads only the unpaid head of the schedule instead of the whole loan.
+"""
+
+import frappe
+from frappe.utils import cint, flt
+
+from sacc_app.guarantors import update_exposure_for_loans
+
+COMPONENTS = ("penalty", "interest", "principal")
+DEFAULT_ALLOCATION_ORDER = "Penalty, Interest, Principal"
+
+# Installments read per page when walking the schedule
+PAGE_SIZE = 12
+
+INSTALLMENT_FIELDS = """name, installment_no, due_date, principal, interest, penalty,
+	principal_paid, interest_paid, penalty_paid, status"""
+
+
+def parse_allocation_order(value):
+	"""'Penalty, Interest, Principal' -> ["penalty", "interest", "principal"]; each component exactly once."""
+	order = [part.strip().lower() for part in (value or DEFAULT_ALLOCATION_ORDER).split(",") if part.strip()]
+	if sorted(order) != sorted(COMPONENTS):
+		frappe.throw(f"Repayment allocation order must list Penalty, Interest and Principal once each, e.g. '{DEFAULT_ALLOCATION_ORDER}'")
+	return order
+
+
+def get_allocation_order():
+	return parse_allocation_order(frappe.db.get_single_value("SACCO Settings", "repayment_allocation_order"))
+
+
+def get_installment_status(row):
+	if all(flt(row.get(f"{c}_paid")) >= flt(row.get(c)) - 0.01 for c in COMPONENTS):
+		return "Paid"
+	if any(flt(row.get(f"{c}_paid")) > 0 for c in COMPONENTS):
+		return "Partially Paid"
+	return "Pending"
+
+
+def get_amount_unpaid(row):
+	return sum(max(0, flt(row.get(c)) - flt(row.get(f"{c}_paid"))) for c in COMPONENTS)
+
+
+def apply_waterfall(installments, amount, order):
+	"""
+	Applies `amount` to installment rows in the order given (oldest first), paying each row's
+	components in `order`. Rows are updated in place. Returns (paid per component, changed rows,
+	amount left once every row is settled).
+	"""
+	paid = dict.fromkeys(COMPONENTS, 0)
+	changed = []
+	remaining = flt(amount, 2)
+
+	for row in installments:
+		if remaining <= 0:
+			break
+
+		touched = False
+		for component in order:
+			pay = flt(min(remaining, max(0, flt(row.get(component)) - flt(row.get(f"{component}_paid")))), 2)
+			if pay <= 0:
+				continue
+			row[f"{component}_paid"] = flt(row.get(f"{component}_paid")) + pay
+			paid[component] += pay
+			remaining = flt(remaining - pay, 2)
+			touched = True
+
+		if touched:
+			row.status = get_installment_status(row)
+			changed.append(row)
+
+	return paid, changed, remaining
+
+
+def reverse_waterfall(installments, paid):
+	"""
+	Takes `paid` ({component: amount}) back from installment rows given latest first.
+	Rows are updated in place; returns the changed rows.
+	"""
+	remaining = {c: flt(paid.get(c)) for c in COMPONENTS}
+	changed = []
+
+	for row in installments:
+		if not any(v > 0 for v in remaining.values()):
+			break
+
+		touched = False
+		for component in COMPONENTS:
+			take = flt(min(remaining[component], flt(row.get(f"{component}_paid"))), 2)
+			if take <= 0:
+				continue
+			row[f"{component}_paid"] = flt(row.get(f"{component}_paid")) - take
+			remaining[component] = flt(remaining[component] - take, 2)
+			touched = True
+
+		if touched:
+			row.status = get_installment_status(row)
+			changed.append(row)
+
+	return changed
+
+
+def get_next_installment_idx(installments, default):
+	"""Cursor after allocation: the first row not fully paid, else `default`."""
+	for row in installments:
+		if row.status != "Paid":
+			return row.installment_no
+	return default
+
+
+def allocate_payment(loan, amount, order=None):
+	"""
+	Applies a payment to loan `loan` through the waterfall, reading installments a page at a time
+	from the loan's cursor. Writes the touched installments and the loan's paid totals, outstanding
+	balance, cursor and (when settled) Completed status. Anything left once the whole schedule is
+	paid counts as a principal prepayment. Returns the amount paid per component.
+	"""
+	order = order or get_allocation_order()
+
+	# Lock the loan so concurrent payments allocate one after the other
+	cursor = frappe.db.sql("SELECT next_installment_idx FROM `tabSACCO Loan` WHERE name = %s FOR UPDATE", (loan,))
+	cursor = cint(cursor[0][0] if cursor else 0) or 1
+
+	paid = dict.fromkeys(COMPONENTS, 0)
+	remaining = flt(amount, 2)
+	changed = []
+
+	while remaining > 0:
+		rows = frappe.db.sql(f"""
+			SELECT {INSTALLMENT_FIELDS}
+			FROM `tabSACCO Loan Installment`
+			WHERE parent = %s AND parenttype = 'SACCO Loan' AND installment_no >= %s
+			ORDER BY installment_no
+			LIMIT %s
+		""", (loan, cursor, PAGE_SIZE), as_dict=True)
+		if not rows:
+			break
+
+		page_paid, page_changed, remaining = apply_waterfall(rows, remaining, order)
+		for component in COMPONENTS:
+			paid[component] += page_paid[component]
+		changed.extend(page_changed)
+
+		cursor = rows[-1].installment_no + 1
+		next_idx = get_next_installment_idx(rows, None)
+		if next_idx is not None:
+			cursor = next_idx
+			break
+
+	# Beyond the schedule: a prepayment of principal
+	paid["principal"] = flt(paid["principal"] + remaining, 2)
+
+	write_installments(changed)
+	update_loan_totals(loan, paid, cursor)
+	return paid
+
+
+def reverse_allocation(loan, paid):
+	"""
+	Takes a cancelled payment ({component: amount}) back from the latest paid installments and
+	restores the loan's totals, outstanding balance, cursor and Active status.
+	"""
+	rows = frappe.db.sql(f"""
+		SELECT {INSTALLMENT_FIELDS}
+		FROM `tabSACCO Loan Installment`
+		WHERE parent = %s AND parenttype = 'SACCO Loan'
+			AND (principal_paid > 0 OR interest_paid > 0 OR penalty_paid > 0)
+		ORDER BY installment_no DESC
+	""", (loan,), as_dict=True)
+
+	changed = reverse_waterfall(rows, paid)
+	write_installments(changed)
+
+	cursor = cint(frappe.db.get_value("SACCO Loan", loan, "next_installment_idx")) or 1
+	if changed:
+		cursor = min(cursor, min(row.installment_no for row in changed))
+	update_loan_totals(loan, {c: -flt(paid.get(c)) for c in COMPONENTS}, cursor)
+
+
+def write_installments(rows):
+	for row in rows:
+		frappe.db.sql("""
+			UPDATE `tabSACCO Loan Installment`
+			SET principal_paid = %s, interest_paid = %s, penalty_paid = %s, status = %s
+			WHERE name = %s
+		""", (row.principal_paid, row.interest_paid, row.penalty_paid, row.status, row.name))
+
+
+def update_loan_totals(loan, paid, cursor, update_guarantors=True):
+	"""
+	Adds `paid` to the loan's totals in one UPDATE. Penalties sit outside total_repayable,
+	so only principal and interest reduce the outstanding balance. Settling the balance
+	completes the loan; a reversal reopens it. The member's active loan and the guarantors'
+	exposure follow; batch callers pass update_guarantors=False and refresh once at the end.
+	"""
+	settled = flt(paid.get("principal")) + flt(paid.get("interest"))
+	member, status, outstanding = frappe.db.get_value("SACCO Loan", loan, ["member", "status", "outstanding_balance"])
+
+	new_outstanding = flt(outstanding) - settled
+	if new_outstanding <= 0.005 and settled > 0:
+		new_status = "Completed"
+	elif status == "Completed" and new_outstanding > 0.005:
+		new_status = "Active"
+	else:
+		new_status = status
+
+	frappe.db.sql("""
+		UPDATE `tabSACCO Loan`
+		SET principal_paid = principal_paid + %(principal)s,
+			interest_paid = interest_paid + %(interest)s,
+			outstanding_balance = %(outstanding)s,
+			next_installment_idx = %(cursor)s,
+			status = %(status)s,
+			modified = NOW()
+		WHERE name = %(loan)s
+	""", {
+		"loan": loan,
+		"principal": flt(paid.get("principal")),
+		"interest": flt(paid.get("interest")),
+		"outstanding": max(0, flt(new_outstanding, 2)),
+		"cursor": cursor,
+		"status": new_status
+	})
+
+	if new_status == "Completed" and status != "Completed":
+		frappe.db.sql("UPDATE `tabSACCO Member` SET active_loan = NULL WHERE name = %s AND active_loan = %s", (member, loan))
+	elif new_status == "Active" and status == "Completed":
+		frappe.db.set_value("SACCO Member", member, "active_loan", loan)
+
+	if update_guarantors:
+		update_exposure_for_loans([loan])
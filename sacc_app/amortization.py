@@ -0,0 +1,108 @@
+"""
+Loan amortization engine.
+
+Schedules are linear in the principal, so each (rate, period, method) combination is
+solved once for a principal of 1 and every amount is priced by scaling that unit schedule.
+Pricing hundreds of amount/period scenarios costs one solve per distinct period.
+No database access, so it can be used from calculators, jobs and tests alike.
+"""
+
+from functools import lru_cache
+
+FLAT_RATE = "Flat Rate"
+REDUCING_BALANCE = "Reducing Balance"
+
+
+def periodic_rate(interest_rate, interest_period="Monthly"):
+	"""Monthly rate as a fraction; annual product rates are spread over 12 months."""
+	rate = float(interest_rate or 0) / 100.0
+	return rate if interest_period == "Monthly" else rate / 12.0
+
+
+@lru_cache(maxsize=1024)
+def unit_schedule(interest_rate, repayment_period, interest_method=FLAT_RATE, interest_period="Monthly"):
+	"""
+	Schedule for a principal of 1: (installment, total_interest, rows) where rows are
+	(principal, interest, balance_after) tuples. balance_after is the remaining total repayable.
+	"""
+	n = int(repayment_period or 0)
+	if n <= 0:
+		return 0.0, 0.0, ()
+
+	if interest_method == REDUCING_BALANCE:
+		r = periodic_rate(interest_rate, interest_period)
+		if r > 0:
+			growth = (1 + r) ** n
+			installment = r * growth / (growth - 1)
+		else:
+			installment = 1.0 / n
+		total_repayable = installment * n
+		total_interest = total_repayable - 1
+
+		rows = []
+		principal_left = 1.0
+		for k in range(1, n + 1):
+			interest = principal_left * r
+			principal = installment - interest
+			principal_left -= principal
+			rows.append((principal, interest, total_repayable - installment * k))
+	else:
+		# Flat Rate: interest on the original principal for the whole term, split proportionally
+		if interest_period == "Monthly":
+			total_interest = float(interest_rate or 0) / 100.0 * n
+		else:
+			total_interest = float(interest_rate or 0) / 100.0 * (n / 12.0)
+		total_repayable = 1 + total_interest
+		installment = total_repayable / n
+
+		principal_ratio = 1 / total_repayable
+		interest_ratio = total_interest / total_repayable
+		rows = [
+			(installment * principal_ratio, installment * interest_ratio, total_repayable - installment * k)
+			for k in range(1, n + 1)
+		]
+
+	return installment, total_interest, tuple(rows)
+
+
+def amortize(loan_amount, interest_rate, repayment_period, interest_method=FLAT_RATE,
+	interest_period="Monthly", with_schedule=True):
+	"""
+	Prices one loan: monthly_installment, total_interest, total_repayable and, optionally,
+	the schedule rows (installment_no, amount, principal, interest, balance_after), rounded to 2dp.
+	"""
+	amount = float(loan_amount or 0)
+	installment, total_interest, rows = unit_schedule(
+		float(interest_rate or 0), int(repayment_period or 0), interest_method, interest_period)
+
+	quote = {
+		"loan_amount": amount,
+		"repayment_period": int(repayment_period or 0),
+		"monthly_installment": installment * amount,
+		"total_interest": total_interest * amount,
+		"total_repayable": (1 + total_interest) * amount if rows else amount,
+	}
+
+	if with_schedule:
+		quote["schedule"] = [
+			{
+				"installment_no": k,
+				"amount": round(installment * amount, 2),
+				"principal": round(principal * amount, 2),
+				"interest": round(interest * amount, 2),
+				"balance_after": max(0, round(balance * amount, 2))
+			}
+			for k, (principal, interest, balance) in enumerate(rows, start=1)
+		]
+
+	return quote
+
+
+def amortize_many(loan_amounts, repayment_periods, interest_rate, interest_method=FLAT_RATE,
+	interest_period="Monthly", with_schedule=True):
+	"""Quotes for every amount x period combination, one unit solve per distinct period."""
+	return [
+		amortize(amount, interest_rate, period, interest_method, interest_period, with_schedule)
+		for period in repayment_periods
+		for amount in loan_amounts
+	]
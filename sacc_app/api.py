@@ -2,8 +2,15 @@ import frappe
 import random
 import string
 from frappe import _
-from frappe.utils import flt
+from frappe.utils import add_days, cint, flt
 from sacc_app.swagger_spec import get_swagger_spec
+from sacc_app.account_map import get_account_map, get_payment_account
+from sacc_app.cache import get_cached_report
+from sacc_app.arrears import AGING_BUCKETS, PAR_BUCKETS, get_aging_bucket
+from sacc_app.guarantors import find_eligible_guarantors, get_guarantee_limits
+from sacc_app.ledger import get_account_balances, get_balances_as_of, get_subtree_bounds
+from sacc_app.rollups import get_activity_series
+from sacc_app.transaction_feed import CATEGORY_FILTERS
 import sacc_app.budget_api # Expose budget APIs
 
 
@@ -141,7 +148,8 @@ def apply_for_loan(data=None, **kwargs):
     repayment_period = data.get("repayment_period")
     
     # 1. Fetch Loan Product Settings
-    product = frappe.get_doc("SACCO Loan Product", product_name)
+    from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_loan_product
+    product = get_loan_product(product_name)
     
     # Validate Repayment Period
     if repayment_period:
@@ -196,6 +204,31 @@ def apply_for_loan(data=None, **kwargs):
     doc.insert(ignore_permissions=True) 
     return {"status": "success", "message": "Loan application created", "loan_id": doc.name}
 
+@frappe.whitelist(allow_guest=True)
+def get_eligible_guarantors(amount=0, borrower=None, search=None, limit=20):
+    """
+    Active members who can still guarantee at least `amount`, ranked by free capacity
+    (savings x the guarantee multiple in SACCO Settings, less their exposure on active loans).
+    """
+    limits = get_guarantee_limits()
+    guarantors = find_eligible_guarantors(amount=amount, exclude=borrower, search=search,
+        limit=min(frappe.utils.cint(limit) or 20, 100), limits=limits)
+
+    for g in guarantors:
+        for field in ("total_savings", "total_guaranteed", "exposure", "guarantee_limit", "free_capacity"):
+            g[field] = flt(g[field], 2)
+
+    return {
+        "status": "success",
+        "message": f"{len(guarantors)} eligible guarantor(s)",
+        "data": {
+            "guarantee_multiple": limits.multiple,
+            "max_active_guarantees": limits.max_active,
+            "limits_enforced": limits.enforce,
+            "guarantors": guarantors
+        }
+    }
+
 # --- Loan Product CRUD ---
 
 @frappe.whitelist(allow_guest=True)
@@ -212,8 +245,8 @@ def create_loan_product(data=None, **kwargs):
 
 @frappe.whitelist(allow_guest=True)
 def get_all_loan_products():
-    products = frappe.db.get_all("SACCO Loan Product", 
-        fields=["name", "product_name", "interest_rate", "interest_period", "interest_method", "max_repayment_period", "min_loan_amount", "max_loan_amount", "requires_guarantor", "min_guarantors", "description"])
+    from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_product_catalog
+    products = [dict(p) for p in get_product_catalog()["products"]]
     return {"status": "success", "data": products}
 
 @frappe.whitelist(allow_guest=True)
@@ -594,14 +627,13 @@ def delete_account(account_name):
 
 @frappe.whitelist(allow_guest= True  )
 def record_expense(amount, expense_account, description, mode_of_payment="Cash", vendor_name=None):
-    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+    accounts = get_account_map()
+    company = accounts.company
     
     # Get Cash/Bank Account
-    credit_account = None
-    if mode_of_payment == "Cash":
-        credit_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company})
-    else:
-        credit_account = frappe.db.get_value("Account", {"account_type": "Bank", "company": company})
+    credit_account = accounts.mode_of_payment.get(mode_of_payment)
+    if not credit_account:
+        credit_account = accounts.cash if mode_of_payment == "Cash" else accounts.bank
         
     expense_acc_name = frappe.db.get_value("Account", {"account_name": expense_account, "company": company})
     
@@ -757,7 +789,7 @@ def pay_registration_fee(member, amount=None, mode="Cash", reference=None, posti
         "reference_date": posting_date or frappe.utils.nowdate(),
         "mode_of_payment": mode,
         "posting_date": posting_date or frappe.utils.nowdate(),
-        "paid_to": frappe.db.get_value("Account", {"account_type": "Cash", "company": frappe.defaults.get_user_default("Company")}, "name") 
+        "paid_to": get_payment_account(mode)
     })
     pe.append("references", {
         "reference_doctype": "Sales Invoice",
@@ -829,9 +861,12 @@ def get_member_financial_history(member, savings_start=0, savings_limit=20, repa
 
 @frappe.whitelist(allow_guest= True  )
 def get_loan_products():
-    # Fetch actual products from DB
-    products = frappe.db.get_all("SACCO Loan Product", 
-        fields=["name as type", "interest_rate", "max_repayment_period as max_period", "description"])
+    # Served from the cached product catalog
+    from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_product_catalog
+    products = [
+        frappe._dict(type=p.name, interest_rate=p.interest_rate, max_period=p.max_repayment_period, description=p.description)
+        for p in get_product_catalog()["products"]
+    ]
     
     for p in products:
         p["interest"] = f"{p.interest_rate}%"
@@ -945,24 +980,60 @@ def get_all_accounts():
 @frappe.whitelist(allow_guest= True  )
 def get_all_accounts_with_balances():
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-    accounts = frappe.db.get_all("Account", filters={"company": company}, fields=["name", "account_name", "account_type", "root_type"])
-    
-    from frappe.utils import flt
-    from erpnext.accounts.utils import get_balance_on
-    
-    results = []
-    for acc in accounts:
-        balance = get_balance_on(acc.name)
-        results.append({
-            "name": acc.name,
-            "account_name": acc.account_name,
-            "account_type": acc.account_type,
-            "root_type": acc.root_type,
-            "balance": flt(balance)
-        })
-        
+
+    # One grouped GL query for every account; group balances are rolled up from their children
+    results = [{
+        "name": acc.name,
+        "account_name": acc.account_name,
+        "account_type": acc.account_type,
+        "root_type": acc.root_type,
+        "balance": acc.balance
+    } for acc in get_account_balances(company)]
+
     return {"status": "success", "data": results}
 
+@frappe.whitelist(allow_guest=True)
+def get_chart_of_accounts(as_of=None, parent_account=None, leaf_only=0, start=0, page_length=500):
+    """
+    Chart of accounts in tree order with balances (debit - credit) rolled up to the groups,
+    optionally as of a date and limited to the subtree under `parent_account`. Balances come
+    from one grouped GL query; pages are cut after the roll-up so group totals stay complete.
+    """
+    from frappe.utils import cint
+
+    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+    if parent_account and not frappe.db.exists("Account", parent_account):
+        return {"status": "error", "message": f"Account {parent_account} not found"}
+
+    accounts = get_account_balances(company, as_of=as_of, root=parent_account)
+    if cint(leaf_only):
+        accounts = [acc for acc in accounts if not acc.is_group]
+
+    start = max(cint(start), 0)
+    page_length = min(max(cint(page_length), 1), 5000)
+
+    return {
+        "status": "success",
+        "data": {
+            "company": company,
+            "as_of": as_of,
+            "parent_account": parent_account,
+            "total_count": len(accounts),
+            "start": start,
+            "accounts": [{
+                "name": acc.name,
+                "account_name": acc.account_name,
+                "account_number": acc.account_number,
+                "parent_account": acc.parent_account,
+                "is_group": acc.is_group,
+                "root_type": acc.root_type,
+                "account_type": acc.account_type,
+                "indent": acc.indent,
+                "balance": acc.balance
+            } for acc in accounts[start:start + page_length]]
+        }
+    }
+
 # --- Status Management ---
 
 @frappe.whitelist(allow_guest= True  )
@@ -1011,7 +1082,7 @@ def get_report_dates(from_date=None, to_date=None):
     return getdate(from_date), to_date
 
 @frappe.whitelist(allow_guest=True)
-def get_profit_and_loss(from_date=None, to_date=None):
+def get_profit_and_loss(from_date=None, to_date=None, refresh=0):
     from_date, to_date = get_report_dates(from_date, to_date)
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
     filters = {
@@ -1025,11 +1096,16 @@ def get_profit_and_loss(from_date=None, to_date=None):
         "accumulated_values": 1
     }
     from erpnext.accounts.report.profit_and_loss_statement.profit_and_loss_statement import execute
-    columns, data, message, chart, report_summary, primitive_summary = execute(frappe._dict(filters))
-    return {"status": "success", "columns": columns, "data": data, "report_summary": report_summary}
+
+    def run_report():
+        columns, data, message, chart, report_summary, primitive_summary = execute(frappe._dict(filters))
+        return columns, data, report_summary
+
+    (columns, data, report_summary), cache = get_cached_report("profit_and_loss", company, filters, run_report, refresh=cint(refresh))
+    return {"status": "success", "columns": columns, "data": data, "report_summary": report_summary, "cache": cache}
 
 @frappe.whitelist(allow_guest=True)
-def get_balance_sheet(to_date=None):
+def get_balance_sheet(to_date=None, refresh=0):
     if not to_date:
         to_date = frappe.utils.nowdate()
         
@@ -1046,11 +1122,16 @@ def get_balance_sheet(to_date=None):
         "accumulated_values": 1
     }
     from erpnext.accounts.report.balance_sheet.balance_sheet import execute
-    columns, data, message, chart, report_summary, primitive_summary = execute(frappe._dict(filters))
-    return {"status": "success", "columns": columns, "data": data, "report_summary": report_summary}
+
+    def run_report():
+        columns, data, message, chart, report_summary, primitive_summary = execute(frappe._dict(filters))
+        return columns, data, report_summary
+
+    (columns, data, report_summary), cache = get_cached_report("balance_sheet", company, filters, run_report, refresh=cint(refresh))
+    return {"status": "success", "columns": columns, "data": data, "report_summary": report_summary, "cache": cache}
 
 @frappe.whitelist(allow_guest=True)
-def get_trial_balance(from_date=None, to_date=None):
+def get_trial_balance(from_date=None, to_date=None, refresh=0):
     from_date, to_date = get_report_dates(from_date, to_date)
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
     
@@ -1065,12 +1146,13 @@ def get_trial_balance(from_date=None, to_date=None):
         "show_zero_values": 1
     }
     from erpnext.accounts.report.trial_balance.trial_balance import execute
-    columns, data = execute(frappe._dict(filters))
-    return {"status": "success", "columns": columns, "data": data}
+    (columns, data), cache = get_cached_report("trial_balance", company, filters,
+        lambda: execute(frappe._dict(filters)), refresh=cint(refresh))
+    return {"status": "success", "columns": columns, "data": data, "cache": cache}
 
 @frappe.whitelist(allow_guest=True)
 @frappe.whitelist(allow_guest=True)
-def get_account_statement(account=None, member=None, from_date=None, to_date=None):
+def get_account_statement(account=None, member=None, from_date=None, to_date=None, refresh=0):
     from_date, to_date = get_report_dates(from_date, to_date)
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
     
@@ -1078,13 +1160,31 @@ def get_account_statement(account=None, member=None, from_date=None, to_date=Non
     if not target:
          return {"status": "error", "message": "Please provide either 'account' or 'member'."}
 
+    real_account = resolve_statement_account(target, company)
+    if not real_account:
+        return {"status": "error", "message": f"Account {target} could not be resolved to a valid General Ledger account."}
+
+    filters = {
+        "company": company,
+        "account": [real_account],
+        "from_date": from_date,
+        "to_date": to_date,
+        "group_by": "Group by Voucher (Consolidated)"
+    }
+    from erpnext.accounts.report.general_ledger.general_ledger import execute
+    (columns, data), cache = get_cached_report("account_statement", company, filters,
+        lambda: execute(frappe._dict(filters)), refresh=cint(refresh))
+    return {"status": "success", "columns": columns, "data": data, "cache": cache}
+
+
+def resolve_statement_account(target, company):
+    """GL account for an Account ID or name, a member ID, a SACCO Savings or a SACCO Loan; None if unresolved."""
     # Resolve account name if it's a SACCO Savings record, Member ID, or Loan ID
     real_account = target
     
     # Check if target is a valid Account ID first
     if not frappe.db.exists("Account", target):
         # 0. Check if it's an Account Name
-        company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
         acc_by_name = frappe.db.get_value("Account", {"account_name": target, "company": company}, "name")
         if acc_by_name:
             real_account = acc_by_name
@@ -1106,18 +1206,9 @@ def get_account_statement(account=None, member=None, from_date=None, to_date=Non
                         real_account = frappe.db.get_value("SACCO Member", loan_member, "ledger_account")
 
     if not real_account or not frappe.db.exists("Account", real_account):
-        return {"status": "error", "message": f"Account {target} could not be resolved to a valid General Ledger account."}
+        return None
+    return real_account
 
-    filters = {
-        "company": company,
-        "account": [real_account],
-        "from_date": from_date,
-        "to_date": to_date,
-        "group_by": "Group by Voucher (Consolidated)"
-    }
-    from erpnext.accounts.report.general_ledger.general_ledger import execute
-    columns, data = execute(frappe._dict(filters))
-    return {"status": "success", "columns": columns, "data": data}
 
 # --- Operational Reports ---
 
@@ -1135,34 +1226,42 @@ def get_loan_repayment_summary(from_date=None, to_date=None):
     return {"status": "success", "data": data}
 
 @frappe.whitelist(allow_guest=True)
-def get_loan_aging_report(bucket=None):
-    """
-    Returns loans categorized by overdue days: 30, 60, 90, 120+.
-    """
-    query = """
-        SELECT 
-            l.name as loan_id,
-            l.member,
-            l.loan_amount,
-            l.outstanding_balance,
-            l.status,
-            COALESCE(d.days_overdue, 0) as days_overdue,
-            CASE 
-                WHEN COALESCE(d.days_overdue, 0) > 120 THEN '120+'
-                WHEN COALESCE(d.days_overdue, 0) > 90 THEN '91-120'
-                WHEN COALESCE(d.days_overdue, 0) > 60 THEN '61-90'
-                WHEN COALESCE(d.days_overdue, 0) > 30 THEN '31-60'
-                ELSE '0-30'
-            END as aging_bucket
-        FROM `tabSACCO Loan` l
-        LEFT JOIN `tabSACCO Defaulter` d ON d.loan = l.name
-        WHERE l.status IN ('Active', 'Defaulted')
-    """
-    
-    if bucket:
-        query += f" HAVING aging_bucket = '{bucket}'"
-        
-    records = frappe.db.sql(query, as_dict=True)
+def get_loan_aging_report(bucket=None, loan_product=None, member=None):
+    """
+    Returns active loans with days past due and arrears from the nightly SACCO Loan Arrears table.
+    `bucket` accepts a PAR bucket (Current, PAR 1, PAR 30, PAR 60, PAR 90) or a legacy aging label (0-30 ... 120+).
+    """
+    conditions, values = [], {}
+    aging_bounds = {label: days for days, label in AGING_BUCKETS}
+    if bucket in aging_bounds:
+        values["min_days"] = aging_bounds[bucket]
+        conditions.append("days_past_due >= %(min_days)s")
+        higher = [days for days in aging_bounds.values() if days > values["min_days"]]
+        if higher:
+            values["max_days"] = min(higher)
+            conditions.append("days_past_due < %(max_days)s")
+    elif bucket:
+        conditions.append("par_bucket = %(bucket)s")
+        values["bucket"] = bucket
+    if loan_product:
+        conditions.append("loan_product = %(loan_product)s")
+        values["loan_product"] = loan_product
+    if member:
+        conditions.append("member = %(member)s")
+        values["member"] = member
+
+    records = frappe.db.sql(f"""
+        SELECT
+            loan as loan_id, member, loan_product, loan_amount, outstanding_balance,
+            loan_status as status, days_past_due as days_overdue, arrears_amount,
+            oldest_due_date, par_bucket, as_of_date
+        FROM `tabSACCO Loan Arrears`
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY days_past_due DESC, loan
+    """, values, as_dict=True)
+
+    for row in records:
+        row.aging_bucket = get_aging_bucket(row.days_overdue)
     return {"status": "success", "data": records}
 
 @frappe.whitelist(allow_guest=True)
@@ -1173,7 +1272,42 @@ def get_loan_performance_report():
         FROM `tabSACCO Loan`
         GROUP BY status
     """, as_dict=True)
-    return {"status": "success", "data": stats}
+
+    # Portfolio at risk from the nightly arrears table
+    buckets = frappe.db.sql("""
+        SELECT par_bucket, COUNT(*) as count, SUM(outstanding_balance) as outstanding_balance,
+            SUM(arrears_amount) as arrears_amount
+        FROM `tabSACCO Loan Arrears`
+        GROUP BY par_bucket
+    """, as_dict=True)
+    by_bucket = {row.par_bucket: row for row in buckets}
+    portfolio = sum(flt(row.outstanding_balance) for row in buckets)
+
+    par = []
+    at_risk = 0
+    for days, label in PAR_BUCKETS:
+        row = by_bucket.get(label) or frappe._dict(count=0, outstanding_balance=0, arrears_amount=0)
+        if days:
+            # PAR n counts every loan at least n days past due
+            at_risk += flt(row.outstanding_balance)
+        par.append({
+            "par_bucket": label,
+            "count": row.count,
+            "outstanding_balance": flt(row.outstanding_balance, 2),
+            "arrears_amount": flt(row.arrears_amount, 2),
+            "par_ratio": flt(at_risk / portfolio * 100, 2) if days and portfolio else 0
+        })
+    par.reverse()
+
+    return {
+        "status": "success",
+        "data": stats,
+        "portfolio_at_risk": {
+            "as_of_date": frappe.db.sql("SELECT MAX(as_of_date) FROM `tabSACCO Loan Arrears`")[0][0],
+            "portfolio_outstanding": flt(portfolio, 2),
+            "buckets": par
+        }
+    }
 
 @frappe.whitelist(allow_guest=True)
 def get_interest_collection_report(loan_product=None, from_date=None, to_date=None):
@@ -1325,34 +1459,31 @@ def get_all_welfare_contributions(from_date=None, to_date=None):
 @frappe.whitelist(allow_guest=True)
 def get_member_loans(member):
     """
-    Returns all loans for a specific member, including parsed repayment schedules.
+    Returns all loans for a specific member, including repayment schedules.
     """
     loans = frappe.db.get_all("SACCO Loan",
         filters={"member": member},
-        fields=["name", "loan_product", "loan_amount", "interest_rate", "repayment_period", "status", "total_repayable", "outstanding_balance", "repayment_schedule", "creation"],
+        fields=["name", "loan_product", "loan_amount", "interest_rate", "repayment_period", "status", "total_repayable", "outstanding_balance", "creation"],
         order_by="creation desc"
     )
     
-    import json
+    from sacc_app.sacco.doctype.sacco_loan.sacco_loan import get_repayment_schedules
+    schedules = get_repayment_schedules([loan.name for loan in loans])
     for loan in loans:
-        if loan.repayment_schedule:
-            try:
-                loan.repayment_schedule = json.loads(loan.repayment_schedule)
-            except:
-                loan.repayment_schedule = []
+        loan.repayment_schedule = schedules[loan.name]
                 
     return {"status": "success", "data": loans}
 
 @frappe.whitelist(allow_guest=True)
 def get_loan_application_by_id(loan_id):
     """
-    Returns a single loan application by its ID, with repayment schedule parsed.
+    Returns a single loan application by its ID, with its repayment schedule.
     """
     if not frappe.db.exists("SACCO Loan", loan_id):
         return {"status": "error", "message": f"Loan {loan_id} not found."}
 
     loan = frappe.db.get_value("SACCO Loan", loan_id, 
-        ["name", "member", "loan_product", "loan_amount", "interest_rate", "repayment_period", "status", "total_repayable", "outstanding_balance", "repayment_schedule", "creation"],
+        ["name", "member", "loan_product", "loan_amount", "interest_rate", "repayment_period", "status", "total_repayable", "outstanding_balance", "creation"],
         as_dict=True
     )
     
@@ -1364,14 +1495,8 @@ def get_loan_application_by_id(loan_id):
             loan["first_name"] = member_data.first_name
             loan["last_name"] = member_data.last_name
     
-    import json
-    if loan.repayment_schedule:
-        try:
-            loan.repayment_schedule = json.loads(loan.repayment_schedule)
-        except:
-            loan.repayment_schedule = []
-    else:
-        loan.repayment_schedule = []
+    from sacc_app.sacco.doctype.sacco_loan.sacco_loan import get_repayment_schedules
+    loan.repayment_schedule = get_repayment_schedules([loan_id])[loan_id]
                 
     return {"status": "success", "data": loan}
 
@@ -1695,136 +1820,200 @@ def delete_sacco_settings():
     return {"status": "success", "message": "SACCO Settings have been reset to defaults."}
 
 
+# Loan ledger rows: the member comes from a join on their loan account, not a lookup per row
+LEDGER_REPORT_SQL = """
+    SELECT gle.name, gle.posting_date, gle.creation, gle.account, gle.debit, gle.credit,
+        gle.voucher_type, gle.voucher_no, gle.against, gle.remarks, gle.party,
+        m.name AS member, m.member_name
+    FROM `tabGL Entry` gle
+    {join}
+    LEFT JOIN `tabSACCO Member` m ON m.ledger_account = gle.account
+    WHERE {conditions}
+"""
+
+LEDGER_REPORT_ORDER = "ORDER BY gle.posting_date, gle.creation, gle.name"
+
+
 @frappe.whitelist(allow_guest=True)
-def get_loan_ledger_report(date_from=None, date_to=None, member=None, loan_id=None, limit_start=0, limit_page_length=100):
+def get_loan_ledger_report(date_from=None, date_to=None, member=None, loan_id=None, limit_start=0, limit_page_length=100, cursor=None):
     """
     Returns loan ledger report with GL Entry transactions.
     Filters: date_from, date_to, member, loan_id
     Shows running balance for loan accounts.
+
+    Pages by cursor: pass the returned next_cursor to get the next page. The cursor carries the
+    last row's position and the running balance, so every page costs the same and its balances
+    continue from the previous one. limit_start still works for the first pages.
     """
-    from frappe.utils import flt
-    
-    limit_start = int(limit_start)
-    limit_page_length = int(limit_page_length)
-    
-    # Build filters
-    filters = {
-        "is_cancelled": 0
-    }
-    
-    # Filter by member's loan ledger account
-    if member:
-        ledger_account = frappe.db.get_value("SACCO Member", member, "ledger_account")
-        if ledger_account:
-            filters["account"] = ledger_account
-        else:
-            return {"status": "error", "message": f"Member {member} has no loan ledger account"}
+    limit_start = int(limit_start or 0)
+    limit_page_length = min(max(int(limit_page_length or 100), 1), 1000)
+
+    try:
+        ledger = get_loan_ledger_filters(date_from, date_to, member, loan_id)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    join, conditions, values = ledger.join, ledger.conditions, ledger.values
+    opening_balance = ledger.opening_balance
+
+    if cursor:
+        try:
+            position = decode_ledger_cursor(cursor)
+        except ValueError:
+            return {"status": "error", "message": "Invalid cursor"}
+        # Keyset: rows strictly after the last one returned, resolved on the (posting_date, creation, name) order
+        conditions.append("""(gle.posting_date > %(after_date)s
+            OR (gle.posting_date = %(after_date)s AND (gle.creation > %(after_creation)s
+                OR (gle.creation = %(after_creation)s AND gle.name > %(after_name)s))))""")
+        values.update(after_date=position["posting_date"], after_creation=position["creation"],
+            after_name=position["name"])
+        running_balance = flt(position["balance"])
+        offset = 0
     else:
-        # Get all loan ledger accounts (accounts under "SACCO Members Accounts")
-        parent_account = frappe.db.get_value("Account", {"account_name": "SACCO Members Accounts"})
-        if parent_account:
-            loan_accounts = frappe.db.get_all("Account", 
-                filters={"parent_account": parent_account},
-                pluck="name"
-            )
-            if loan_accounts:
-                filters["account"] = ["in", loan_accounts]
-    
-    # Filter by date range
-    if date_from:
-        filters["posting_date"] = [">=", date_from]
-    if date_to:
-        if "posting_date" in filters:
-            filters["posting_date"] = ["between", [date_from, date_to]]
-        else:
-            filters["posting_date"] = ["<=", date_to]
-    
-    # Filter by loan_id (voucher_no for Journal Entry or against for Payment Entry)
-    if loan_id:
-        filters["voucher_no"] = ["like", f"%{loan_id}%"]
-    
-    # Get GL entries
-    gl_entries = frappe.db.get_all("GL Entry",
-        filters=filters,
-        fields=["posting_date", "account", "debit", "credit", "voucher_type", "voucher_no", "against", "remarks", "party"],
-        order_by="posting_date asc, creation asc",
-        limit_start=limit_start,
-        limit_page_length=limit_page_length
-    )
-    
-    # Calculate running balance and enrich data
-    running_balance = 0
-    opening_balance = 0
-    
-    # Get opening balance if date_from is specified
-    if date_from and filters.get("account"):
-        account_filter = filters["account"]
-        if isinstance(account_filter, list) and account_filter[0] == "in":
-            # Multiple accounts - sum all
-            for acc in account_filter[1]:
-                opening_balance += flt(frappe.db.sql("""
-                    SELECT sum(debit) - sum(credit)
-                    FROM `tabGL Entry`
-                    WHERE account = %s AND posting_date < %s AND is_cancelled = 0
-                """, (acc, date_from))[0][0])
-        else:
-            # Single account
-            opening_balance = flt(frappe.db.sql("""
-                SELECT sum(debit) - sum(credit)
-                FROM `tabGL Entry`
-                WHERE account = %s AND posting_date < %s AND is_cancelled = 0
-            """, (account_filter, date_from))[0][0])
-    
-    running_balance = opening_balance
-    
+        running_balance = opening_balance
+        offset = limit_start
+        if offset:
+            # Offset pages start from the balance after the rows they skip
+            running_balance += flt(frappe.db.sql(f"""
+                SELECT SUM(t.debit - t.credit) FROM (
+                    {LEDGER_REPORT_SQL.format(join=join, conditions=" AND ".join(conditions))}
+                    {LEDGER_REPORT_ORDER}
+                    LIMIT %(offset)s
+                ) t
+            """, dict(values, offset=offset))[0][0])
+
+    values.update(limit=limit_page_length + 1, offset=offset)
+    gl_entries = frappe.db.sql(f"""
+        {LEDGER_REPORT_SQL.format(join=join, conditions=" AND ".join(conditions))}
+        {LEDGER_REPORT_ORDER}
+        LIMIT %(limit)s OFFSET %(offset)s
+    """, values, as_dict=True)
+
+    has_more = len(gl_entries) > limit_page_length
+    gl_entries = gl_entries[:limit_page_length]
+    page_opening = flt(running_balance, 2)
+
     transactions = []
     total_debit = 0
     total_credit = 0
-    
+
     for entry in gl_entries:
-        # Get member info from account name
-        member_id = entry.account.split(" - ")[0] if " - " in entry.account else None
-        member_name = frappe.db.get_value("SACCO Member", member_id, "member_name") if member_id else None
-        
         # Extract loan_id from voucher_no or against field
         loan_ref = entry.voucher_no if "LOAN" in (entry.voucher_no or "") else entry.against
-        
+
         debit = flt(entry.debit)
         credit = flt(entry.credit)
-        running_balance += debit - credit
-        
+        running_balance = flt(running_balance + debit - credit, 2)
+
         total_debit += debit
         total_credit += credit
-        
+
         transactions.append({
             "date": str(entry.posting_date),
             "voucher_type": entry.voucher_type,
             "voucher_no": entry.voucher_no,
             "loan_id": loan_ref,
-            "member": member_id,
-            "member_name": member_name,
+            "member": entry.member,
+            "member_name": entry.member_name,
             "account": entry.account,
             "debit": debit,
             "credit": credit,
             "balance": running_balance,
             "remarks": entry.remarks
         })
-    
+
+    next_cursor = None
+    if has_more:
+        last = gl_entries[-1]
+        next_cursor = encode_ledger_cursor(last.posting_date, last.creation, last.name, running_balance)
+
     return {
         "status": "success",
         "data": {
             "transactions": transactions,
             "summary": {
                 "opening_balance": opening_balance,
-                "total_debit": total_debit,
-                "total_credit": total_credit,
+                "page_opening_balance": page_opening,
+                "total_debit": flt(total_debit, 2),
+                "total_credit": flt(total_credit, 2),
                 "closing_balance": running_balance
             },
-            "count": len(transactions)
+            "count": len(transactions),
+            "has_more": has_more,
+            "next_cursor": next_cursor
         }
     }
 
 
+def get_loan_ledger_filters(date_from=None, date_to=None, member=None, loan_id=None):
+    """
+    Join, conditions and values for LEDGER_REPORT_SQL, and the opening balance as of the day
+    before date_from. Raises ValueError for a member without a loan account.
+    """
+    conditions = ["gle.is_cancelled = 0"]
+    values = {}
+    join = ""
+    opening_filter = {}
+
+    # Filter by member's loan ledger account
+    if member:
+        ledger_account = frappe.db.get_value("SACCO Member", member, "ledger_account")
+        if not ledger_account:
+            raise ValueError(f"Member {member} has no loan ledger account")
+        conditions.append("gle.account = %(account)s")
+        values["account"] = ledger_account
+        opening_filter["accounts"] = [ledger_account]
+    else:
+        # All loan ledger accounts (accounts under "SACCO Members Accounts"), joined rather than listed
+        parent_account = frappe.db.get_value("Account", {"account_name": "SACCO Members Accounts"})
+        if parent_account:
+            join = "INNER JOIN `tabAccount` acc ON acc.name = gle.account AND acc.parent_account = %(parent_account)s"
+            values["parent_account"] = parent_account
+            bounds = get_subtree_bounds(parent_account)
+            if bounds:
+                opening_filter["bounds"] = bounds
+
+    if date_from:
+        conditions.append("gle.posting_date >= %(date_from)s")
+        values["date_from"] = date_from
+    if date_to:
+        conditions.append("gle.posting_date <= %(date_to)s")
+        values["date_to"] = date_to
+
+    # Filter by loan_id (voucher_no, or the loan named in the entry's remarks)
+    if loan_id:
+        conditions.append("(gle.voucher_no LIKE %(loan_id)s OR gle.remarks LIKE %(loan_id)s)")
+        values["loan_id"] = f"%{loan_id}%"
+
+    # Opening balance as of the day before date_from: one set-based lookup over the daily balance snapshots
+    opening_balance = 0
+    if date_from and opening_filter:
+        opening_balance = flt(sum(get_balances_as_of(add_days(date_from, -1), **opening_filter).values()), 2)
+
+    return frappe._dict(join=join, conditions=conditions, values=values, opening_balance=opening_balance)
+
+
+def encode_ledger_cursor(posting_date, creation, name, balance):
+    """Opaque page cursor: the last row's sort key and the running balance after it."""
+    import base64
+    import json
+
+    payload = json.dumps([str(posting_date), str(creation), name, flt(balance, 2)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_ledger_cursor(cursor):
+    """Inverse of encode_ledger_cursor; raises ValueError for anything it did not produce."""
+    import base64
+    import binascii
+    import json
+
+    try:
+        posting_date, creation, name, balance = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError, AttributeError):
+        raise ValueError("Invalid cursor")
+    return {"posting_date": posting_date, "creation": creation, "name": name, "balance": flt(balance)}
+
+
 # --- Loan Dashboard APIs ---
 
 @frappe.whitelist(allow_guest=True)
@@ -2068,46 +2257,18 @@ def get_savings_dashboard():
 @frappe.whitelist(allow_guest=True)
 def get_savings_vs_expense():
     """
-    Returns monthly savings vs expense comparison for the last 6 months.
+    Returns monthly savings vs expense comparison for the last 6 months, from the activity rollups.
     """
-    from frappe.utils import add_months, getdate, formatdate, get_first_day, get_last_day
-    
-    data = []
+    from frappe.utils import add_months, getdate, formatdate, get_first_day
+
     today = getdate()
-    
-    for i in range(5, -1, -1):
-        month_pivot = add_months(today, -i)
-        month_start = get_first_day(month_pivot)
-        month_end = get_last_day(month_pivot)
-        
-        month_label = formatdate(month_pivot, "MMM YYYY")
-        
-        # Total Savings (Deposits) for the month
-        savings = frappe.db.get_value("SACCO Savings", 
-            filters={
-                "type": "Deposit", 
-                "posting_date": ["between", [month_start, month_end]], 
-                "docstatus": 1
-            }, 
-            fieldname="SUM(amount)") or 0.0
-            
-        # Total Expense for the month (Journal Entries to Expense accounts)
-        expense = frappe.db.sql("""
-            SELECT SUM(jea.debit) as total
-            FROM `tabJournal Entry Account` jea
-            JOIN `tabJournal Entry` je ON jea.parent = je.name
-            JOIN `tabAccount` acc ON jea.account = acc.name
-            WHERE acc.root_type = 'Expense' 
-              AND je.posting_date BETWEEN %s AND %s
-              AND je.docstatus = 1
-        """, (month_start, month_end), as_dict=True)[0].total or 0.0
-        
-        data.append({
-            "month": month_label,
-            "savings": round(flt(savings), 2),
-            "expense": round(flt(expense), 2)
-        })
-        
+    series = get_activity_series(["Deposits", "Expenses"], "month", add_months(get_first_day(today), -5), today)
+    data = [{
+        "month": formatdate(row["period"], "MMM YYYY"),
+        "savings": row["Deposits"]["amount"],
+        "expense": row["Expenses"]["amount"]
+    } for row in series]
+
     return {"status": "success", "data": data}
 
 
@@ -2153,53 +2314,24 @@ def get_savings_transactions(limit_start=0, limit_page_length=20, member=None, t
     """
     limit_start = int(limit_start)
     limit_page_length = int(limit_page_length)
-    
-    conditions = ["docstatus = 1"]
-    params = []
-    
-    if member:
-        conditions.append("member = %s")
-        params.append(member)
-    if type:
-        conditions.append("type = %s")
-        params.append(type)
-    if date_from and date_to:
-        conditions.append("posting_date BETWEEN %s AND %s")
-        params.extend([date_from, date_to])
-    elif date_from:
-        conditions.append("posting_date >= %s")
-        params.append(date_from)
-    elif date_to:
-        conditions.append("posting_date <= %s")
-        params.append(date_to)
-        
-    if searchTerm:
-        # Search in name and reference_number
-        conditions.append("(name LIKE %s OR reference_number LIKE %s OR member IN (SELECT name FROM `tabSACCO Member` WHERE member_name LIKE %s))")
-        search_val = f"%{searchTerm}%"
-        params.extend([search_val, search_val, search_val])
-        
-    where_clause = "WHERE " + " AND ".join(conditions)
-    
+
+    where_clause, params = get_savings_filters(member, type, date_from, date_to, searchTerm)
+
     query = f"""
         SELECT 
-            name, member, type, amount, posting_date, payment_mode, reference_number
-        FROM `tabSACCO Savings`
+            s.name, s.member, m.member_name, s.type, s.amount, s.posting_date, s.payment_mode, s.reference_number
+        FROM `tabSACCO Savings` s
+        LEFT JOIN `tabSACCO Member` m ON m.name = s.member
         {where_clause}
-        ORDER BY posting_date DESC, creation DESC
+        ORDER BY s.posting_date DESC, s.creation DESC
         LIMIT %s OFFSET %s
     """
-    
+
     params.extend([limit_page_length, limit_start])
-    
-    transactions = frappe.db.sql(query, tuple(params), as_dict=True)
-    
-    results = []
-    for t in transactions:
-        t.member_name = frappe.db.get_value("SACCO Member", t.member, "member_name")
-        results.append(t)
-        
-    count_query = f"SELECT COUNT(*) as total FROM `tabSACCO Savings` {where_clause}"
+
+    results = frappe.db.sql(query, tuple(params), as_dict=True)
+
+    count_query = f"SELECT COUNT(*) as total FROM `tabSACCO Savings` s {where_clause}"
     count_params = params[:-2]
     total_count = frappe.db.sql(count_query, tuple(count_params), as_dict=True)
     total = total_count[0].total if total_count else 0
@@ -2213,7 +2345,38 @@ def get_savings_transactions(limit_start=0, limit_page_length=20, member=None, t
             "total": total
         }
     }
-    
+
+
+def get_savings_filters(member=None, type=None, date_from=None, date_to=None, searchTerm=None):
+    """WHERE clause and positional params over `tabSACCO Savings` s for the savings list filters."""
+    conditions = ["s.docstatus = 1"]
+    params = []
+
+    if member:
+        conditions.append("s.member = %s")
+        params.append(member)
+    if type:
+        conditions.append("s.type = %s")
+        params.append(type)
+    if date_from and date_to:
+        conditions.append("s.posting_date BETWEEN %s AND %s")
+        params.extend([date_from, date_to])
+    elif date_from:
+        conditions.append("s.posting_date >= %s")
+        params.append(date_from)
+    elif date_to:
+        conditions.append("s.posting_date <= %s")
+        params.append(date_to)
+
+    if searchTerm:
+        # Search in name and reference_number
+        conditions.append("(s.name LIKE %s OR s.reference_number LIKE %s OR s.member IN (SELECT name FROM `tabSACCO Member` WHERE member_name LIKE %s))")
+        search_val = f"%{searchTerm}%"
+        params.extend([search_val, search_val, search_val])
+
+    return "WHERE " + " AND ".join(conditions), params
+
+
 @frappe.whitelist(allow_guest=True)
 def get_transactions_dashboard():
     """
@@ -2266,148 +2429,74 @@ def get_transactions_dashboard():
 @frappe.whitelist(allow_guest=True)
 def get_all_transactions(limit_start=0, limit_page_length=20, category=None, start_date=None, end_date=None, status=None, search=None):
     """
-    Returns a consolidated list of transactions from GL Entry.
+    Returns a consolidated list of transactions, one per voucher, from the SACCO Transaction Feed.
     """
     limit_start = int(limit_start)
     limit_page_length = int(limit_page_length)
-    
-    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-    
-    # We want one row per "Transaction" (Voucher)
-    # Most transactions have multiple GL entries. We focus on the "Cash/Bank" side or the "Party" side.
-    # To keep it simple and accurate, we group by voucher_no.
-    
-    conditions = ["gl.docstatus = 1", "gl.company = %s"]
-    params = [company]
-    
-    if category:
-        if category == "Savings":
-            conditions.append("gl.voucher_type = 'Journal Entry' AND gl.voucher_no LIKE 'SAV-%%'")
-        elif category == "Loan":
-            conditions.append("gl.voucher_type IN ('Journal Entry', 'Payment Entry') AND (gl.voucher_no LIKE 'LREP-%%' OR gl.voucher_no LIKE 'LOAN-%%')")
-        elif category == "Expense":
-            conditions.append("gl.voucher_type = 'Journal Entry' AND EXISTS (SELECT 1 FROM `tabJournal Entry Account` jea JOIN `tabAccount` acc ON jea.account = acc.name WHERE jea.parent = gl.voucher_no AND acc.root_type = 'Expense')")
-            
-    if start_date and end_date:
-        conditions.append("gl.posting_date BETWEEN %s AND %s")
-        params.extend([start_date, end_date])
-
-    if status:
-        if status.lower() == "completed":
-            conditions.append("gl.docstatus = 1")
-        elif status.lower() == "cancelled":
-            conditions.append("gl.docstatus = 2")
-        elif status.lower() == "draft":
-            conditions.append("gl.docstatus = 0")
 
-    if search:
-        search_val = f"%{search}%"
-        conditions.append("(gl.voucher_no LIKE %s OR gl.remarks LIKE %s OR gl.party LIKE %s)")
-        params.extend([search_val, search_val, search_val])
+    where_clause, values = get_transaction_filters(category, start_date, end_date, status, search)
 
-    where_clause = "WHERE " + " AND ".join(conditions)
-    
-    # Query for distinct vouchers
-    query = f"""
-        SELECT 
-            gl.voucher_no as transaction_id,
-            gl.posting_date as date,
-            gl.voucher_type,
-            SUM(gl.debit) as total_volume,
-            gl.party,
-            gl.party_type,
-            gl.remarks,
-            gl.docstatus
-        FROM `tabGL Entry` gl
+    transactions = frappe.db.sql(f"""
+        SELECT feed.name AS transaction_id, feed.posting_date, feed.member_name, feed.direction,
+            feed.category, feed.amount, feed.remarks, feed.status
+        FROM `tabSACCO Transaction Feed` feed
         {where_clause}
-        GROUP BY gl.voucher_no
-        ORDER BY gl.posting_date DESC, gl.creation DESC
-        LIMIT %s OFFSET %s
-    """
-    
-    params.extend([limit_page_length, limit_start])
-    vouchers = frappe.db.sql(query, tuple(params), as_dict=True)
-    
-    # Identify Cash/Bank accounts to determine In/Out
-    bank_accounts = frappe.db.get_all("Account", 
-        filters={"account_type": ["in", ["Cash", "Bank"]], "company": company, "is_group": 0},
-        pluck="name"
-    )
-    
-    results = []
-    for v in vouchers:
-        # Determine Category
-        category = "General"
-        remarks_lower = (v.remarks or "").lower()
-        
-        if "savings" in remarks_lower:
-            category = "Savings"
-        elif "repayment" in remarks_lower:
-            category = "Loan Repayment"
-        elif "disbursement" in remarks_lower:
-            category = "Loan Disbursement"
-        elif "registration" in remarks_lower:
-            category = "Registration Fee"
-        elif v.voucher_type == "Journal Entry":
-            # Check for Expense accounts in this voucher
-            has_expense = frappe.db.sql("""
-                SELECT 1 FROM `tabGL Entry` gl
-                JOIN `tabAccount` acc ON gl.account = acc.name
-                WHERE gl.voucher_no = %s AND acc.root_type = 'Expense'
-                LIMIT 1
-            """, v.transaction_id)
-            if has_expense:
-                category = "Expense"
-
-        # Determine In/Out based on Cash/Bank impact
-        # If Cash/Bank is Debited -> In
-        # If Cash/Bank is Credited -> Out
-        cash_impact = frappe.db.sql("""
-            SELECT SUM(debit - credit) as net
-            FROM `tabGL Entry`
-            WHERE voucher_no = %s AND account IN %s
-        """, (v.transaction_id, tuple(bank_accounts)), as_dict=True)
-        
-        net_cash = cash_impact[0].net if cash_impact and cash_impact[0].net else 0.0
-        tx_type = "In" if net_cash > 0 else "Out" if net_cash < 0 else "Neutral"
-        
-        # Absolute amount for display
-        display_amount = abs(net_cash) if net_cash != 0 else (flt(v.total_volume) / 1.0) # Fallback to total volume if no cash impact (unlikely)
-        
-        # Member Name
-        member_name = ""
-        if v.party_type == "Customer":
-            member_name = frappe.db.get_value("SACCO Member", {"customer_link": v.party}, "member_name")
-        
-        if not member_name and v.remarks:
-            import re
-            match = re.search(r'MEM-\d+', v.remarks)
-            if match:
-                member_id = match.group()
-                member_name = frappe.db.get_value("SACCO Member", member_id, "member_name")
-        
-        results.append({
-            "transaction_id": v.transaction_id,
-            "date": str(v.date),
-            "member_name": member_name or "System",
-            "type": tx_type,
-            "category": category,
-            "amount": round(display_amount, 2),
-            "reference": v.remarks,
-            "status": "Completed" if v.docstatus == 1 else "Cancelled" if v.docstatus == 2 else "Draft"
-        })
-        
+        ORDER BY feed.posting_date DESC, feed.posted_on DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """, dict(values, limit=limit_page_length, offset=limit_start), as_dict=True)
+
+    results = [{
+        "transaction_id": tx.transaction_id,
+        "date": str(tx.posting_date),
+        "member_name": tx.member_name or "System",
+        "type": tx.direction,
+        "category": tx.category,
+        "amount": flt(tx.amount, 2),
+        "reference": tx.remarks,
+        "status": tx.status
+    } for tx in transactions]
+
     return {
         "status": "success",
         "data": results,
         "pagination": {
             "limit_start": limit_start,
             "limit_page_length": limit_page_length,
-            "total": frappe.db.sql(f"SELECT COUNT(DISTINCT voucher_no) as total FROM `tabGL Entry` gl {where_clause}", tuple(params[:-2]), as_dict=True)[0].total
+            "total": frappe.db.sql(f"SELECT COUNT(*) FROM `tabSACCO Transaction Feed` feed {where_clause}", values)[0][0]
         }
     }
 
 
+def get_transaction_filters(category=None, start_date=None, end_date=None, status=None, search=None):
+    """WHERE clause and values over `tabSACCO Transaction Feed` feed for the transactions list filters."""
+    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+
+    conditions = ["feed.company = %(company)s"]
+    values = {"company": company}
+
+    if category:
+        conditions.append("feed.category IN %(categories)s")
+        values["categories"] = CATEGORY_FILTERS.get(category, (category,))
+
+    if start_date:
+        conditions.append("feed.posting_date >= %(start_date)s")
+        values["start_date"] = start_date
+    if end_date:
+        conditions.append("feed.posting_date <= %(end_date)s")
+        values["end_date"] = end_date
+
+    if status:
+        conditions.append("feed.status = %(status)s")
+        values["status"] = status.title()
+
+    if search:
+        conditions.append("""(feed.name LIKE %(search)s OR feed.remarks LIKE %(search)s OR feed.party LIKE %(search)s
+            OR feed.member LIKE %(search)s OR feed.member_name LIKE %(search)s)""")
+        values["search"] = f"%{search}%"
+
+    return "WHERE " + " AND ".join(conditions), values
+
+
 @frappe.whitelist(allow_guest=True)
 def get_transaction_details(transaction_id):
     """
@@ -2460,3 +2549,111 @@ def get_transaction_details(transaction_id):
 
 
 
+
+# --- Background Jobs ---
+
+@frappe.whitelist(allow_guest=True)
+def get_job_run_status(run_id):
+    """
+    Status of a background batch job (SACCO Job Run): progress, rows affected and its details,
+    e.g. per-loan outcomes of a disbursement run.
+    """
+    run = frappe.db.get_value("SACCO Job Run", run_id,
+        ["name", "job_name", "status", "progress", "rows_affected", "started_at", "finished_at",
+            "duration", "details", "error"], as_dict=True)
+    if not run:
+        return {"status": "error", "message": f"Job run {run_id} not found"}
+
+    if run.details:
+        import json
+        try:
+            run.details = json.loads(run.details)
+        except ValueError:
+            pass
+
+    return {"status": "success", "data": run}
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def run_interest_accrual(from_date=None, to_date=None):
+    """
+    Queues the daily interest accrual for a date range (default: yesterday). Days and products
+    already accrued are skipped, so a range can be re-run safely. Poll get_job_run_status with
+    the returned run ID.
+    """
+    from frappe.utils import add_days, getdate, nowdate
+    from sacc_app.accrual import MAX_ACCRUAL_DAYS
+
+    to_date = getdate(to_date or add_days(nowdate(), -1))
+    from_date = getdate(from_date or to_date)
+    if from_date > to_date:
+        return {"status": "error", "message": "from_date must be on or before to_date"}
+    if to_date >= getdate(nowdate()):
+        return {"status": "error", "message": "Interest can only be accrued for days that have ended"}
+    if (to_date - from_date).days + 1 > MAX_ACCRUAL_DAYS:
+        return {"status": "error", "message": f"Too many days. Maximum is {MAX_ACCRUAL_DAYS} per run."}
+
+    run = frappe.get_doc({"doctype": "SACCO Job Run", "job_name": "Interest Accrual"})
+    run.insert(ignore_permissions=True)
+    frappe.enqueue(
+        "sacc_app.accrual.accrue_interest",
+        queue="long",
+        timeout=3600,
+        from_date=from_date,
+        to_date=to_date,
+        run=run.name,
+        enqueue_after_commit=True
+    )
+
+    return {
+        "status": "success",
+        "message": f"Interest accrual from {from_date} to {to_date} queued",
+        "data": {"run_id": run.name, "from_date": from_date, "to_date": to_date}
+    }
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def start_member_statement_run(from_date=None, to_date=None, format="html", members=None):
+    """
+    Queues statements for every member (or the given member IDs) for a period, default last
+    month. The membership is split into chunks generated by parallel background jobs; each
+    statement is attached to the member as a private File. Poll get_job_run_status with the
+    returned run ID; resume_member_statement_run retries whatever failed.
+    """
+    from frappe.utils import add_days, get_first_day, get_last_day, getdate, nowdate
+    from sacc_app.loan_calculator_api import parse_list
+    from sacc_app.statements import STATEMENT_FORMATS, start_statement_run
+
+    last_month = add_days(get_first_day(nowdate()), -1)
+    from_date = getdate(from_date or get_first_day(last_month))
+    to_date = getdate(to_date or get_last_day(from_date))
+    format = (format or "html").lower()
+    if from_date > to_date:
+        return {"status": "error", "message": "from_date must be on or before to_date"}
+    if format not in STATEMENT_FORMATS:
+        return {"status": "error", "message": f"Unsupported format {format}. Use one of: {', '.join(STATEMENT_FORMATS)}"}
+
+    members = list(dict.fromkeys(str(m).strip() for m in parse_list(members) if str(m).strip())) or None
+    run = start_statement_run(from_date, to_date, format, members)
+
+    return {
+        "status": "success",
+        "message": f"Statement run from {from_date} to {to_date} queued",
+        "data": {"run_id": run, "from_date": from_date, "to_date": to_date, "format": format}
+    }
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def resume_member_statement_run(run_id):
+    """Re-queues the unfinished chunks of a statement run; members already done are skipped."""
+    from sacc_app.statements import resume_statement_run
+
+    if frappe.db.get_value("SACCO Job Run", run_id, "job_name") != "Member Statement Run":
+        return {"status": "error", "message": f"Statement run {run_id} not found"}
+
+    queued = resume_statement_run(run_id)
+    return {
+        "status": "success",
+        "message": f"{queued} chunk(s) re-queued" if queued else "Nothing to resume; every chunk has completed",
+        "data": {"run_id": run_id, "queued_chunks": queued}
+    }
@@ -0,0 +1,224 @@
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, getdate, nowdate, now_datetime
+
+from sacc_app.jobs import track_job_run
+
+# (minimum days past due, bucket), checked from the top
+PAR_BUCKETS = [(90, "PAR 90"), (60, "PAR 60"), (30, "PAR 30"), (1, "PAR 1"), (0, "Current")]
+
+# Legacy aging labels still returned by get_loan_aging_report
+AGING_BUCKETS = [(121, "120+"), (91, "91-120"), (61, "61-90"), (31, "31-60"), (0, "0-30")]
+
+# Used until the threshold is saved in SACCO Settings
+DEFAULT_AFTER_DAYS_PAST_DUE = 90
+
+# Loans per chunk in the default sweep
+DEFAULT_SWEEP_CHUNK = 1000
+
+# Installments due by %(as_of)s, aggregated per loan
+DUE_INSTALLMENTS_SQL = """
+	SELECT parent,
+		SUM(amount) AS amount_due,
+		SUM(principal_paid + interest_paid) AS amount_paid,
+		SUM(GREATEST(amount - principal_paid - interest_paid, 0)) AS arrears_amount,
+		MIN(CASE WHEN amount - principal_paid - interest_paid > 0.01 THEN due_date END) AS oldest_due_date
+	FROM `tabSACCO Loan Installment`
+	WHERE parenttype = 'SACCO Loan' AND due_date <= %(as_of)s {loan_condition}
+	GROUP BY parent
+"""
+
+
+def process_loan_arrears():
+	"""Nightly task: refreshes the arrears table, then flags loans past the default threshold."""
+	update_loan_arrears()
+	flag_defaulted_loans()
+
+
+def update_loan_arrears(as_of=None):
+	"""
+	Nightly task: compares every active loan's installments due by `as_of` with what has been
+	paid against them and upserts days past due, arrears and PAR bucket into SACCO Loan Arrears.
+	Loans that are no longer active drop out of the table.
+	"""
+	as_of = getdate(as_of or nowdate())
+	par_case = "\n".join(
+		f"WHEN IFNULL(DATEDIFF(%(as_of)s, due.oldest_due_date), 0) >= {days} THEN '{bucket}'"
+		for days, bucket in PAR_BUCKETS
+	)
+
+	with track_job_run("Loan Arrears") as run:
+		frappe.db.sql(f"""
+			INSERT INTO `tabSACCO Loan Arrears` (
+				name, creation, modified, owner, modified_by, docstatus, idx,
+				loan, member, loan_product, loan_status, as_of_date, loan_amount, outstanding_balance,
+				amount_due, amount_paid, arrears_amount, oldest_due_date, days_past_due, par_bucket
+			)
+			SELECT
+				loan.name, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+				loan.name, loan.member, loan.loan_product, loan.status, %(as_of)s,
+				loan.loan_amount, loan.outstanding_balance,
+				IFNULL(due.amount_due, 0), IFNULL(due.amount_paid, 0), IFNULL(due.arrears_amount, 0),
+				due.oldest_due_date,
+				IFNULL(DATEDIFF(%(as_of)s, due.oldest_due_date), 0),
+				CASE {par_case} END
+			FROM `tabSACCO Loan` loan
+			LEFT JOIN ({DUE_INSTALLMENTS_SQL.format(loan_condition="")}
+			) due ON due.parent = loan.name
+			WHERE loan.docstatus = 1 AND loan.status IN ('Active', 'Defaulted')
+			ON DUPLICATE KEY UPDATE
+				modified = VALUES(modified),
+				member = VALUES(member),
+				loan_product = VALUES(loan_product),
+				loan_status = VALUES(loan_status),
+				as_of_date = VALUES(as_of_date),
+				loan_amount = VALUES(loan_amount),
+				outstanding_balance = VALUES(outstanding_balance),
+				amount_due = VALUES(amount_due),
+				amount_paid = VALUES(amount_paid),
+				arrears_amount = VALUES(arrears_amount),
+				oldest_due_date = VALUES(oldest_due_date),
+				days_past_due = VALUES(days_past_due),
+				par_bucket = VALUES(par_bucket)
+		""", {"as_of": as_of})
+		run.rows_affected = frappe.db._cursor.rowcount
+
+		frappe.db.sql("""
+			DELETE arrears FROM `tabSACCO Loan Arrears` arrears
+			LEFT JOIN `tabSACCO Loan` loan ON loan.name = arrears.loan
+			WHERE loan.name IS NULL OR loan.docstatus != 1 OR loan.status NOT IN ('Active', 'Defaulted')
+		""")
+		run.rows_affected += frappe.db._cursor.rowcount
+
+
+def get_aging_bucket(days_past_due):
+	for days, bucket in AGING_BUCKETS:
+		if (days_past_due or 0) >= days:
+			return bucket
+
+
+def flag_defaulted_loans():
+	"""
+	Sweeps SACCO Loan Arrears for loans whose oldest unpaid installment is past the threshold in
+	SACCO Settings and defaults them in chunks with `default_loans`. Loans already defaulted only
+	get their defaulter record refreshed with the current days overdue and arrears.
+	"""
+	threshold = cint(frappe.db.get_single_value("SACCO Settings", "default_after_days_past_due")) or DEFAULT_AFTER_DAYS_PAST_DUE
+	min_arrears = flt(frappe.db.get_single_value("SACCO Settings", "default_min_arrears_amount"))
+
+	with track_job_run("Loan Defaults") as run:
+		run.details = {"threshold_days": threshold, "newly_defaulted": 0}
+		last_loan = ""
+		while True:
+			rows = frappe.db.sql("""
+				SELECT arrears.loan, loan.member, loan.status AS loan_status, arrears.days_past_due,
+					arrears.arrears_amount, loan.outstanding_balance
+				FROM `tabSACCO Loan Arrears` arrears
+				INNER JOIN `tabSACCO Loan` loan ON loan.name = arrears.loan
+				WHERE arrears.loan > %s
+					AND arrears.days_past_due >= %s
+					AND arrears.arrears_amount >= %s
+					AND loan.docstatus = 1 AND loan.status IN ('Active', 'Defaulted')
+				ORDER BY arrears.loan
+				LIMIT %s
+			""", (last_loan, threshold, min_arrears, DEFAULT_SWEEP_CHUNK), as_dict=True)
+			if not rows:
+				break
+
+			last_loan = rows[-1].loan
+			run.details["newly_defaulted"] += default_loans(rows)
+			run.rows_affected += len(rows)
+			frappe.db.commit()
+
+
+def get_live_arrears(loans, as_of=None):
+	"""Arrears rows for specific loans computed straight from their installments."""
+	return frappe.db.sql(f"""
+		SELECT loan.name AS loan, loan.member, loan.status AS loan_status, loan.outstanding_balance,
+			IFNULL(due.arrears_amount, 0) AS arrears_amount,
+			IFNULL(DATEDIFF(%(as_of)s, due.oldest_due_date), 0) AS days_past_due
+		FROM `tabSACCO Loan` loan
+		LEFT JOIN ({DUE_INSTALLMENTS_SQL.format(loan_condition="AND parent IN %(loans)s")}
+		) due ON due.parent = loan.name
+		WHERE loan.name IN %(loans)s
+	""", {"as_of": getdate(as_of or nowdate()), "loans": tuple(loans)}, as_dict=True)
+
+
+def default_loans(rows):
+	"""
+	Defaults a batch of loans given their arrears rows (loan, member, loan_status, days_past_due,
+	arrears_amount): one UPDATE for the loan status, one upsert for the SACCO Defaulter records
+	and one bulk outbox insert for the guarantor notices. Returns the number of loans newly defaulted.
+	"""
+	from sacc_app.notify import queue_member_emails
+	from sacc_app.utils import reserve_names
+
+	if not rows:
+		return 0
+
+	loans = tuple(row.loan for row in rows)
+	newly_defaulted = [row for row in rows if row.loan_status != "Defaulted"]
+	if newly_defaulted:
+		names = tuple(row.loan for row in newly_defaulted)
+		frappe.db.sql("""
+			UPDATE `tabSACCO Loan` SET status = 'Defaulted', modified = %s
+			WHERE name IN %s AND status != 'Defaulted'
+		""", (now_datetime(), names))
+		frappe.db.sql("UPDATE `tabSACCO Loan Arrears` SET loan_status = 'Defaulted' WHERE loan IN %s", (names,))
+
+	guarantors = {}
+	if newly_defaulted:
+		for g in frappe.db.sql("""
+			SELECT parent AS loan, guarantor_member, guarantee_amount
+			FROM `tabSACCO Guarantor`
+			WHERE parenttype = 'SACCO Loan' AND parent IN %s AND status != 'Rejected'
+		""", (tuple(row.loan for row in newly_defaulted),), as_dict=True):
+			guarantors.setdefault(g.loan, []).append(g)
+
+	# Open (not yet recovered) defaulter records are refreshed in place; the rest get new names
+	open_records = dict(frappe.db.sql("""
+		SELECT loan, name FROM `tabSACCO Defaulter`
+		WHERE loan IN %s AND status != 'Recovered'
+	""", (loans,)))
+	new_names = iter(reserve_names("DEF-", len([row for row in rows if row.loan not in open_records])))
+
+	now = now_datetime()
+	user = frappe.session.user
+	values = []
+	for row in rows:
+		status = "Guarantor Notified" if guarantors.get(row.loan) else "New Default"
+		values.extend([
+			open_records.get(row.loan) or next(new_names), now, now, user, user,
+			row.member, row.loan, flt(row.arrears_amount, 2), cint(row.days_past_due), status
+		])
+
+	frappe.db.sql(f"""
+		INSERT INTO `tabSACCO Defaulter`
+			(name, creation, modified, owner, modified_by, member, loan, overdue_amount, days_overdue, status)
+		VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(rows))}
+		ON DUPLICATE KEY UPDATE
+			modified = VALUES(modified),
+			modified_by = VALUES(modified_by),
+			overdue_amount = VALUES(overdue_amount),
+			days_overdue = VALUES(days_overdue)
+	""", values)
+
+	queue_member_emails([
+		get_default_notice(row, g)
+		for row in newly_defaulted
+		for g in guarantors.get(row.loan, [])
+	])
+
+	return len(newly_defaulted)
+
+
+def get_default_notice(row, guarantor):
+	"""Builds the outbox entry telling one guarantor that a loan they guaranteed has defaulted."""
+	message = f"""
+	<p>Loan <strong>{row.loan}</strong> for member <strong>{row.member}</strong>, which you guaranteed,
+	has been declared in default after {cint(row.days_past_due)} day(s) without repayment.</p>
+	<p>Amount in Arrears: <strong>{frappe.format_value(row.arrears_amount, "Currency")}</strong><br>
+	Your Guarantee: <strong>{frappe.format_value(guarantor.guarantee_amount, "Currency")}</strong></p>
+	<p>Please contact the SACCO office to discuss recovery of the outstanding amount.</p>
+	"""
+	return {"recipient": guarantor.guarantor_member, "subject": _("Loan Default Notice"), "message": message}
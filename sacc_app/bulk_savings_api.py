@@ -0,0 +1,273 @@
+import csv
+import io
+import json
+
+import frappe
+from frappe.utils import cint, flt, getdate, now_datetime
+
+from sacc_app.account_map import get_account_map, get_payment_account
+from sacc_app.notify import queue_member_emails
+from sacc_app.rollups import refresh_activity_rollups
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+from sacc_app.utils import reserve_names
+
+PAYMENT_MODES = ("Cash", "Bank Transfer", "M-Pesa", "Cheque")
+
+# Member lines per consolidated Journal Entry. Keeps ERPNext's per-row
+# validation bounded while still posting thousands of deposits per call.
+JOURNAL_ENTRY_ROWS = 500
+
+SAVINGS_FIELDS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "member", "type", "amount", "posting_date", "payment_mode", "reference_number", "journal_entry"
+]
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def record_bulk_savings_deposits(rows=None, file_url=None, skip_invalid=1):
+    """
+    Posts a batch of savings deposits in one transaction.
+
+    Rows come either as a JSON array of {member, amount, mode, reference, posting_date}
+    or as an uploaded CSV (request file `file` or an existing `file_url`) with the same headers.
+    All rows are validated up front. Invalid rows are reported and skipped, or with
+    skip_invalid=0 the whole batch is rejected. Member balances are updated once per member.
+    """
+    raw_rows = parse_deposit_rows(rows, file_url)
+    if not raw_rows:
+        frappe.throw("No deposit rows provided.")
+
+    results, deposits = validate_deposit_rows(raw_rows)
+    failed = len(results) - len(deposits)
+
+    if failed and not cint(skip_invalid):
+        return {
+            "status": "error",
+            "message": f"{failed} row(s) failed validation. Nothing was posted.",
+            "data": {"posted": 0, "failed": failed, "rows": results}
+        }
+
+    journal_entries = post_deposits(deposits)
+
+    totals = {}
+    for d in deposits:
+        totals[d.member] = totals.get(d.member, 0) + d.amount
+    for member, amount in totals.items():
+        update_member_balances(member, savings=amount)
+
+    for d in deposits:
+        results[d.row - 1].update({"status": "Posted", "id": d.name, "journal_entry": d.journal_entry})
+
+    if deposits:
+        notify_depositors(deposits)
+
+    return {
+        "status": "success",
+        "message": f"{len(deposits)} deposit(s) posted, {failed} failed.",
+        "data": {
+            "posted": len(deposits),
+            "failed": failed,
+            "journal_entries": journal_entries,
+            "rows": results
+        }
+    }
+
+
+def parse_deposit_rows(rows=None, file_url=None):
+    """Returns deposit rows from a JSON payload or an uploaded/attached CSV file."""
+    if isinstance(rows, str):
+        rows = json.loads(rows)
+    if rows:
+        return [frappe._dict(r) for r in rows]
+
+    content = None
+    request = getattr(frappe.local, "request", None)
+    if file_url:
+        content = frappe.get_doc("File", {"file_url": file_url}).get_content()
+    elif request and request.files.get("file"):
+        content = request.files["file"].stream.read()
+
+    if not content:
+        return []
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+
+    reader = csv.DictReader(io.StringIO(content))
+    return [
+        frappe._dict({(k or "").strip().lower(): (v or "").strip() for k, v in row.items()})
+        for row in reader
+    ]
+
+
+def validate_deposit_rows(rows):
+    """
+    Validates every row against members and previously posted references using
+    two batched queries. Returns (per-row results, valid deposits).
+    """
+    member_ids = list({r.get("member") for r in rows if r.get("member")})
+    members = {}
+    if member_ids:
+        for m in frappe.db.get_all("SACCO Member",
+            filters={"name": ["in", member_ids]},
+            fields=["name", "savings_account", "customer_link"]):
+            members[m.name] = m
+
+    references = list({r.get("reference") for r in rows if r.get("reference")})
+    posted = set()
+    if references:
+        posted = {
+            (s.member, s.reference_number) for s in frappe.db.get_all("SACCO Savings",
+                filters={"reference_number": ["in", references], "docstatus": 1, "type": "Deposit"},
+                fields=["member", "reference_number"])
+        }
+
+    results = []
+    deposits = []
+    seen = set()
+
+    for idx, row in enumerate(rows, start=1):
+        member = row.get("member")
+        reference = row.get("reference") or row.get("reference_number") or ""
+        mode = row.get("mode") or row.get("payment_mode") or "Cash"
+        amount = flt(row.get("amount"))
+        error = None
+        posting_date = None
+
+        try:
+            posting_date = getdate(row.get("posting_date") or None)
+        except Exception:
+            error = f"Invalid posting date '{row.get('posting_date')}'"
+
+        if not member:
+            error = "Member is required"
+        elif member not in members:
+            error = f"Member {member} not found"
+        elif not members[member].savings_account:
+            error = f"Member {member} does not have a linked Savings Account"
+        elif amount <= 0:
+            error = "Amount must be greater than zero"
+        elif mode not in PAYMENT_MODES:
+            error = f"Invalid payment mode '{mode}'. Allowed: {', '.join(PAYMENT_MODES)}"
+        elif reference and (member, reference) in posted:
+            error = f"Reference {reference} has already been posted for member {member}"
+        elif reference and (member, reference) in seen:
+            error = f"Duplicate reference {reference} for member {member} in this batch"
+
+        results.append({
+            "row": idx,
+            "member": member,
+            "amount": amount,
+            "reference": reference,
+            "status": "Failed" if error else "Valid",
+            "error": error
+        })
+
+        if error:
+            continue
+
+        if reference:
+            seen.add((member, reference))
+        deposits.append(frappe._dict({
+            "row": idx,
+            "member": member,
+            "amount": amount,
+            "mode": mode,
+            "reference": reference,
+            "posting_date": posting_date,
+            "savings_account": members[member].savings_account,
+            "customer_link": members[member].customer_link
+        }))
+
+    return results, deposits
+
+
+def post_deposits(deposits):
+    """
+    Posts validated deposits: one Journal Entry per posting date (chunked) and a
+    single bulk insert of submitted SACCO Savings rows linked to their entry.
+    """
+    if not deposits:
+        return []
+
+    company = get_account_map().company
+    for d in deposits:
+        d.cash_account = get_payment_account(d.mode, company)
+        if not d.cash_account:
+            frappe.throw("No Cash/Bank Account found. Please set up Chart of Accounts.")
+
+    for d, name in zip(deposits, reserve_names("SAV-", len(deposits))):
+        d.name = name
+
+    by_date = {}
+    for d in deposits:
+        by_date.setdefault(d.posting_date, []).append(d)
+
+    journal_entries = []
+    for posting_date, day_deposits in sorted(by_date.items()):
+        for start in range(0, len(day_deposits), JOURNAL_ENTRY_ROWS):
+            chunk = day_deposits[start:start + JOURNAL_ENTRY_ROWS]
+            je = make_batch_journal_entry(chunk, posting_date, company)
+            journal_entries.append(je)
+            for d in chunk:
+                d.journal_entry = je
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert("SACCO Savings", fields=SAVINGS_FIELDS, values=[
+        (d.name, now, now, user, user, 1, d.member, "Deposit", d.amount,
+            d.posting_date, d.mode, d.reference, d.journal_entry)
+        for d in deposits
+    ])
+    # Bulk inserts skip the submit hooks that keep the rollups current
+    refresh_activity_rollups("Deposits", by_date)
+
+    return journal_entries
+
+
+def make_batch_journal_entry(deposits, posting_date, company):
+    """Dr each cash/bank account once for its share of the chunk, Cr each member's savings account."""
+    je = frappe.new_doc("Journal Entry")
+    je.posting_date = posting_date
+    je.company = company
+    je.voucher_type = "Journal Entry"
+    je.user_remark = f"Bulk Savings Deposit ({len(deposits)} deposits: {deposits[0].name} - {deposits[-1].name})"
+
+    cash_totals = {}
+    for d in deposits:
+        cash_totals[d.cash_account] = cash_totals.get(d.cash_account, 0) + d.amount
+    for cash_account, total in cash_totals.items():
+        je.append("accounts", {
+            "account": cash_account,
+            "debit_in_account_currency": total,
+            "credit_in_account_currency": 0
+        })
+
+    for d in deposits:
+        je.append("accounts", {
+            "account": d.savings_account,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": d.amount,
+            "is_advance": "Yes",
+            "party_type": "Customer",
+            "party": d.customer_link,
+            "user_remark": f"Savings Deposit for {d.member} (Ref: {d.name})"
+        })
+
+    je.save(ignore_permissions=True)
+    je.submit()
+    return je.name
+
+
+def notify_depositors(deposits):
+    """Queues one deposit notification per row in the outbox, delivered after commit."""
+    totals = dict(frappe.db.get_all("SACCO Member",
+        filters={"name": ["in", list({d.member for d in deposits})]},
+        fields=["name", "total_savings"],
+        as_list=True))
+
+    queue_member_emails([{
+        "recipient": d.member,
+        "subject": "Savings Deposit Received",
+        "message": f"Your account has been <b>credited</b> with <b>{d.amount}</b>. "
+            f"New Total Savings: <b>{totals.get(d.member)}</b>."
+    } for d in deposits])
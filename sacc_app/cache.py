@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+import frappe
+from frappe.utils import now_datetime, time_diff_in_seconds
+
+# Process-local copies: {(site, key): (version, value)}
+_local_cache = {}
+
+
+def get_cached_value(key, generator):
+	"""
+	Two-tier cache. The in-process copy is reused while its version matches the one in Redis,
+	so a hit costs a single small Redis read; on a miss the value comes from Redis,
+	and only if that is gone is `generator()` called to rebuild it.
+	"""
+	cache = frappe.cache()
+	local_key = (frappe.local.site, key)
+
+	version = cache.get_value(f"{key}:version")
+	local = _local_cache.get(local_key)
+	if local and version and local[0] == version:
+		return local[1]
+
+	cached = cache.get_value(key)
+	if version and cached and cached[0] == version:
+		value = cached[1]
+	else:
+		value = generator()
+		version = frappe.generate_hash(length=12)
+		cache.set_value(key, (version, value))
+		cache.set_value(f"{key}:version", version)
+
+	_local_cache[local_key] = (version, value)
+	return value
+
+
+def clear_cached_value(key):
+	"""Drops the value everywhere: Redis now, other workers on their next version check."""
+	cache = frappe.cache()
+	cache.delete_value([key, f"{key}:version"])
+	_local_cache.pop((frappe.local.site, key), None)
+
+
+def clear_cached_value_on_commit(key):
+	"""
+	Clears now and again after commit, so a concurrent request that rebuilt from
+	not-yet-committed data can't leave a stale copy behind.
+	"""
+	clear_cached_value(key)
+	frappe.db.after_commit.add(lambda: clear_cached_value(key))
+
+
+# Report results are reused until the ledger moves; the TTL only bounds abandoned entries
+REPORT_CACHE_TTL = 24 * 60 * 60
+
+# Counter bumped after every posting commits
+REPORT_VERSION_KEY = "sacc_app:report_version"
+
+
+def bump_report_version(doc=None, method=None):
+	"""
+	doc_events hook for Journal Entry / Payment Entry on submit and cancel. The counter moves
+	once the posting has committed, however long its transaction ran, so a report cached in
+	between is never reused after it.
+	"""
+	frappe.db.after_commit.add(increment_report_version)
+
+
+def increment_report_version():
+	cache = frappe.cache()
+	cache.incr(cache.make_key(REPORT_VERSION_KEY))
+
+
+def get_report_version():
+	cache = frappe.cache()
+	version = cache.get(cache.make_key(REPORT_VERSION_KEY))
+	return int(version) if version else 0
+
+
+def get_gl_watermark():
+	"""
+	Latest change to GL Entry or Account. Postings insert GL rows, cancellations and reposts
+	update them and chart edits update accounts, so any of them moves it. Each part is a
+	single lookup on the `modified` index.
+	"""
+	gl, accounts = frappe.db.sql("""
+		SELECT (SELECT MAX(modified) FROM `tabGL Entry`), (SELECT MAX(modified) FROM `tabAccount`)
+	""")[0]
+	return f"{gl}|{accounts}"
+
+
+def get_cached_report(report, company, filters, generator, refresh=False):
+	"""
+	Result of `generator()` for a report, company and filters, reused while neither the posting
+	counter nor the GL watermark has moved. The watermark alone misses rows committed late with
+	an older `modified` than a posting committed before them; the counter does not, and the
+	watermark still catches GL and chart changes made outside a posting. Returns (result, cache info) where the info says whether it was a hit and how
+	old the result is.
+	"""
+	cache = frappe.cache()
+	filters_hash = hashlib.sha1(json.dumps([company, filters], sort_keys=True, default=str).encode()).hexdigest()[:16]
+	key = f"sacc_app:report:{report}:{filters_hash}"
+
+	# Read before computing: a posting that commits mid-computation leaves the result stale, and
+	# the next call sees the newer counter and recomputes
+	watermark = f"{get_report_version()}|{get_gl_watermark()}"
+	cached = None if refresh else cache.get_value(key)
+	hit = bool(cached and cached["watermark"] == watermark)
+	if not hit:
+		cached = {"watermark": watermark, "computed_at": now_datetime(), "result": generator()}
+		cache.set_value(key, cached, expires_in_sec=REPORT_CACHE_TTL)
+
+	return cached["result"], {
+		"hit": hit,
+		"computed_at": str(cached["computed_at"]),
+		"age_seconds": round(time_diff_in_seconds(now_datetime(), cached["computed_at"]), 1)
+	}
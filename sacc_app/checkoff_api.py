@@ -0,0 +1,413 @@
+import csv
+import io
+import json
+
+import frappe
+from frappe.utils import cint, flt, get_last_day, getdate, now_datetime
+
+from sacc_app.account_map import get_account_map, get_payment_account
+from sacc_app.accrual import settle_accrued_interest
+from sacc_app.allocation import (COMPONENTS, INSTALLMENT_FIELDS, apply_waterfall, get_allocation_order,
+    get_amount_unpaid, get_next_installment_idx, update_loan_totals)
+from sacc_app.bulk_savings_api import PAYMENT_MODES, SAVINGS_FIELDS
+from sacc_app.guarantors import update_exposure_for_loans
+from sacc_app.notify import queue_member_emails
+from sacc_app.rollups import refresh_activity_rollups
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+from sacc_app.utils import reserve_names
+
+# Keys per IN (...) lookup
+LOOKUP_CHUNK = 1000
+
+REPAYMENT_FIELDS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "loan", "member", "payment_amount", "payment_date", "payment_mode", "reference_number",
+    "principal_portion", "interest_portion", "penalty_portion", "accrued_interest_portion", "journal_entry"
+]
+
+LINE_FIELDS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "parent", "parenttype", "parentfield", "idx",
+    "row_no", "member", "allocation", "amount", "loan", "principal_amount", "interest_amount",
+    "penalty_amount", "loan_repayment", "savings_entry", "status", "error"
+]
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def import_checkoff_remittance(employer, posting_date=None, payment_mode="Bank Transfer",
+    reference_number=None, rows=None, file_url=None, skip_invalid=1):
+    """
+    Posts an employer payroll check-off remittance.
+
+    Rows come as a JSON array or a CSV (request file `file` or `file_url`) with a `member`
+    (or `national_id`) and `amount` column; the file is read row by row. Each member's amount
+    pays the installments due on their active loans by the end of the posting month, oldest
+    loan first, and the remainder goes to savings. The whole remittance is posted as one
+    Journal Entry with a line per member account, and recorded as a SACCO Checkoff Remittance
+    with one allocation line per loan repayment / savings deposit.
+    """
+    posting_date = getdate(posting_date)
+    if payment_mode not in PAYMENT_MODES:
+        return {"status": "error", "message": f"Invalid payment mode '{payment_mode}'. Allowed: {', '.join(PAYMENT_MODES)}"}
+    if reference_number and frappe.db.exists("SACCO Checkoff Remittance",
+        {"reference_number": reference_number, "status": "Posted"}):
+        return {"status": "error", "message": f"Remittance {reference_number} has already been posted"}
+
+    lines = resolve_members(list(iter_remittance_rows(rows, file_url)))
+    if not lines:
+        frappe.throw("No remittance rows provided.")
+
+    failed = [line for line in lines if line.error]
+    if failed and not cint(skip_invalid):
+        return {
+            "status": "error",
+            "message": f"{len(failed)} row(s) failed validation. Nothing was posted.",
+            "data": {"failed": len(failed), "rows": [{"row": l.row_no, "member": l.member, "error": l.error} for l in failed]}
+        }
+
+    remittance = frappe.get_doc({
+        "doctype": "SACCO Checkoff Remittance",
+        "employer": employer,
+        "posting_date": posting_date,
+        "payment_mode": payment_mode,
+        "reference_number": reference_number,
+        "source_file": file_url
+    })
+    remittance.insert(ignore_permissions=True)
+
+    summary = post_remittance(remittance, lines)
+
+    return {
+        "status": "success",
+        "message": f"Remittance {remittance.name} posted: {summary['member_count']} member(s), {summary['failed_count']} failed row(s).",
+        "data": dict(summary, remittance=remittance.name)
+    }
+
+
+def iter_remittance_rows(rows=None, file_url=None):
+    """Yields normalized remittance rows from a JSON payload or a CSV read line by line."""
+    if isinstance(rows, str):
+        rows = json.loads(rows)
+    if rows:
+        for row in rows:
+            yield normalize_row(row)
+        return
+
+    request = getattr(frappe.local, "request", None)
+    if file_url:
+        stream = open(frappe.get_doc("File", {"file_url": file_url}).get_full_path(), encoding="utf-8-sig", newline="")
+    elif request and request.files.get("file"):
+        stream = io.TextIOWrapper(request.files["file"].stream, encoding="utf-8-sig", newline="")
+    else:
+        return
+
+    with stream:
+        for row in csv.DictReader(stream):
+            yield normalize_row(row)
+
+
+def normalize_row(row):
+    return frappe._dict({(k or "").strip().lower(): (v or "").strip() if isinstance(v, str) else v
+        for k, v in row.items()})
+
+
+def resolve_members(rows):
+    """
+    Matches rows to members by ID or national ID with chunked lookups.
+    Returns one line per row with its member record, amount and any validation error.
+    """
+    ids = list({r.get("member") or r.get("member_id") for r in rows if r.get("member") or r.get("member_id")})
+    national_ids = list({r.get("national_id") for r in rows if r.get("national_id")})
+    fields = ["name", "national_id", "ledger_account", "savings_account", "customer_link", "active_loan"]
+
+    members, by_national_id = {}, {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        for m in frappe.db.get_all("SACCO Member", filters={"name": ["in", ids[start:start + LOOKUP_CHUNK]]}, fields=fields):
+            members[m.name] = m
+    for start in range(0, len(national_ids), LOOKUP_CHUNK):
+        for m in frappe.db.get_all("SACCO Member", filters={"national_id": ["in", national_ids[start:start + LOOKUP_CHUNK]]}, fields=fields):
+            members[m.name] = m
+            by_national_id[m.national_id] = m
+
+    lines = []
+    for idx, row in enumerate(rows, start=1):
+        key = row.get("member") or row.get("member_id")
+        member = members.get(key) if key else by_national_id.get(row.get("national_id"))
+        amount = flt(row.get("amount"))
+        error = None
+
+        if not (key or row.get("national_id")):
+            error = "Member or national_id is required"
+        elif not member:
+            error = f"Member {key or row.get('national_id')} not found"
+        elif amount <= 0:
+            error = "Amount must be greater than zero"
+        elif not member.savings_account or not member.ledger_account:
+            error = f"Member {member.name} does not have linked Savings and Loan accounts"
+
+        lines.append(frappe._dict(row_no=idx, member=member.name if member else key, member_doc=member,
+            amount=amount, error=error))
+
+    return lines
+
+
+def post_remittance(remittance, lines):
+    """
+    Allocates and posts all valid lines: loans first (installments due by month end, oldest loan
+    first, through the repayment waterfall), then savings. Writes repayments, savings deposits, installment and loan updates with
+    bulk statements and a single Journal Entry. Returns the totals stored on the remittance.
+    """
+    valid = [line for line in lines if not line.error]
+    loans_by_member = get_active_loans({line.member for line in valid}, get_last_day(remittance.posting_date))
+    order = get_allocation_order()
+
+    allocations = []
+    for line in lines:
+        if line.error:
+            allocations.append(frappe._dict(row_no=line.row_no, member=line.member, allocation="Unallocated",
+                amount=line.amount, status="Failed", error=line.error))
+            continue
+
+        remaining = line.amount
+        for loan in loans_by_member.get(line.member, []):
+            pay = flt(min(remaining, loan.amount_due), 2)
+            if pay <= 0:
+                continue
+            paid, changed, _ = apply_waterfall(loan.installments, pay, order)
+            for component in COMPONENTS:
+                loan.paid[component] += paid[component]
+            loan.changed.update((row.name, row) for row in changed)
+            loan.amount_due = flt(loan.amount_due - pay, 2)
+            remaining = flt(remaining - pay, 2)
+            allocations.append(frappe._dict(row_no=line.row_no, member=line.member, allocation="Loan Repayment",
+                amount=pay, loan=loan.name, principal_amount=paid["principal"], interest_amount=paid["interest"],
+                penalty_amount=paid["penalty"], member_doc=line.member_doc, status="Posted"))
+
+        if remaining > 0:
+            allocations.append(frappe._dict(row_no=line.row_no, member=line.member, allocation="Savings",
+                amount=remaining, member_doc=line.member_doc, status="Posted"))
+
+    repayments = [a for a in allocations if a.allocation == "Loan Repayment"]
+    deposits = [a for a in allocations if a.allocation == "Savings"]
+    for a, name in zip(repayments, reserve_names("LREP-", len(repayments))):
+        a.loan_repayment = name
+    for a, name in zip(deposits, reserve_names("SAV-", len(deposits))):
+        a.savings_entry = name
+    for a, accrued in zip(repayments, settle_accrued_interest([(a.loan, a.interest_amount) for a in repayments])):
+        a.accrued_interest_amount = accrued
+
+    journal_entry = make_remittance_journal_entry(remittance, repayments, deposits) if repayments or deposits else None
+
+    now = now_datetime()
+    user = frappe.session.user
+    reference = remittance.reference_number or remittance.name
+    frappe.db.bulk_insert("SACCO Loan Repayment", fields=REPAYMENT_FIELDS, values=[
+        (a.loan_repayment, now, now, user, user, 1, a.loan, a.member, a.amount, remittance.posting_date,
+            remittance.payment_mode, reference, a.principal_amount, a.interest_amount, a.penalty_amount,
+            a.accrued_interest_amount, journal_entry)
+        for a in repayments
+    ])
+    frappe.db.bulk_insert("SACCO Savings", fields=SAVINGS_FIELDS, values=[
+        (a.savings_entry, now, now, user, user, 1, a.member, "Deposit", a.amount,
+            remittance.posting_date, remittance.payment_mode, reference, journal_entry)
+        for a in deposits
+    ])
+    frappe.db.bulk_insert("SACCO Checkoff Remittance Line", fields=LINE_FIELDS, values=[
+        (frappe.generate_hash(length=10), now, now, user, user, 0, remittance.name, "SACCO Checkoff Remittance",
+            "lines", idx, a.row_no, a.member, a.allocation, a.amount, a.loan, a.principal_amount or 0,
+            a.interest_amount or 0, a.penalty_amount or 0, a.loan_repayment, a.savings_entry, a.status, a.error)
+        for idx, a in enumerate(allocations, start=1)
+    ])
+    # Bulk inserts skip the submit hooks that keep the rollups current
+    if repayments:
+        refresh_activity_rollups("Repayments", [remittance.posting_date])
+    if deposits:
+        refresh_activity_rollups("Deposits", [remittance.posting_date])
+
+    update_paid_loans([loan for loans in loans_by_member.values() for loan in loans if loan.changed])
+
+    balances = {}
+    for a in repayments + deposits:
+        savings, principal = balances.get(a.member, (0, 0))
+        balances[a.member] = (savings + (a.amount if a.allocation == "Savings" else 0), principal + flt(a.principal_amount))
+    for member, (savings, principal) in balances.items():
+        update_member_balances(member, savings=savings, loan=-principal)
+
+    summary = {
+        "status": "Posted",
+        "journal_entry": journal_entry,
+        "total_amount": flt(sum(line.amount for line in valid), 2),
+        "loan_repayment_amount": flt(sum(a.amount for a in repayments), 2),
+        "savings_amount": flt(sum(a.amount for a in deposits), 2),
+        "member_count": len(balances),
+        "failed_count": len(lines) - len(valid)
+    }
+    remittance.db_set(summary)
+
+    notify_remitted_members(remittance, repayments + deposits)
+    return summary
+
+
+def get_active_loans(members, due_by):
+    """
+    Active loans per member, oldest first, each with its installments from the allocation cursor
+    on and the unpaid amount of those due by `due_by`.
+    """
+    members = list(members)
+    names = []
+    for start in range(0, len(members), LOOKUP_CHUNK):
+        names.extend(frappe.db.sql_list("""
+            SELECT name FROM `tabSACCO Loan`
+            WHERE member IN %s AND docstatus = 1 AND status IN ('Active', 'Defaulted')
+        """, (tuple(members[start:start + LOOKUP_CHUNK]),)))
+
+    # Locked in name order until the import commits, as allocate_payment locks a loan, so a
+    # repayment posted meanwhile either lands first and is read here, or waits for the import.
+    # Locking reads also see rows committed after this transaction's snapshot.
+    names = sorted(set(names))
+    loans = {}
+    for start in range(0, len(names), LOOKUP_CHUNK):
+        for loan in frappe.db.sql("""
+            SELECT name, member, next_installment_idx, creation FROM `tabSACCO Loan`
+            WHERE name IN %s AND docstatus = 1 AND status IN ('Active', 'Defaulted')
+            ORDER BY name
+            FOR UPDATE
+        """, (tuple(names[start:start + LOOKUP_CHUNK]),), as_dict=True):
+            loan.update(installments=[], paid=dict.fromkeys(COMPONENTS, 0), changed={})
+            loans[loan.name] = loan
+
+    loans_by_member = {}
+    for loan in sorted(loans.values(), key=lambda loan: loan.creation):
+        loans_by_member.setdefault(loan.member, []).append(loan)
+
+    names = list(loans)
+    for start in range(0, len(names), LOOKUP_CHUNK):
+        for row in frappe.db.sql(f"""
+            SELECT inst.parent, {", ".join("inst." + f.strip() for f in INSTALLMENT_FIELDS.split(","))}
+            FROM `tabSACCO Loan Installment` inst
+            INNER JOIN `tabSACCO Loan` loan ON loan.name = inst.parent
+            WHERE inst.parenttype = 'SACCO Loan' AND inst.parent IN %s
+                AND inst.installment_no >= IFNULL(NULLIF(loan.next_installment_idx, 0), 1)
+            ORDER BY inst.parent, inst.installment_no
+            FOR UPDATE
+        """, (tuple(names[start:start + LOOKUP_CHUNK]),), as_dict=True):
+            loans[row.parent].installments.append(row)
+
+    for loan in loans.values():
+        loan.amount_due = flt(sum(get_amount_unpaid(row) for row in loan.installments if getdate(row.due_date) <= getdate(due_by)), 2)
+    return loans_by_member
+
+
+def update_paid_loans(loans):
+    """Writes the installments each loan's payments touched, then its totals and cursor."""
+    changed = [row for loan in loans for row in loan.changed.values()]
+    for start in range(0, len(changed), LOOKUP_CHUNK):
+        chunk = changed[start:start + LOOKUP_CHUNK]
+        frappe.db.sql(f"""
+            INSERT INTO `tabSACCO Loan Installment` (name, principal_paid, interest_paid, penalty_paid, status)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))}
+            ON DUPLICATE KEY UPDATE
+                principal_paid = VALUES(principal_paid),
+                interest_paid = VALUES(interest_paid),
+                penalty_paid = VALUES(penalty_paid),
+                status = VALUES(status)
+        """, [v for row in chunk for v in (row.name, row.principal_paid, row.interest_paid, row.penalty_paid, row.status)])
+
+    for loan in loans:
+        last = loan.installments[-1].installment_no + 1 if loan.installments else loan.next_installment_idx
+        update_loan_totals(loan.name, loan.paid, get_next_installment_idx(loan.installments, last),
+            update_guarantors=False)
+    update_exposure_for_loans([loan.name for loan in loans])
+
+
+def make_remittance_journal_entry(remittance, repayments, deposits):
+    """
+    Dr the remittance bank/cash account with the total; Cr each member's loan account with
+    principal, Interest Receivable with the interest already accrued, Interest Income with the
+    rest of the interest and penalties and each member's savings account.
+    """
+    accounts = get_account_map()
+    company = accounts.company
+    cash_account = get_payment_account(remittance.payment_mode, company)
+    if not cash_account:
+        frappe.throw("No Cash/Bank Account found. Please set up Chart of Accounts.")
+
+    principal_by_member, savings_by_member = {}, {}
+    for a in repayments:
+        principal_by_member[a.member] = principal_by_member.get(a.member, 0) + flt(a.principal_amount)
+    for a in deposits:
+        savings_by_member[a.member] = savings_by_member.get(a.member, 0) + flt(a.amount)
+    members = {a.member: a.member_doc for a in repayments + deposits}
+    total_accrued = flt(sum(flt(a.accrued_interest_amount) for a in repayments), 2)
+    total_interest = flt(sum(flt(a.interest_amount) + flt(a.penalty_amount) for a in repayments) - total_accrued, 2)
+
+    je = frappe.new_doc("Journal Entry")
+    je.posting_date = remittance.posting_date
+    je.company = company
+    je.voucher_type = "Journal Entry"
+    je.user_remark = f"Check-off Remittance {remittance.name}: {remittance.employer} (Ref: {remittance.reference_number or remittance.name})"
+    if remittance.reference_number:
+        je.cheque_no = remittance.reference_number
+        je.cheque_date = remittance.posting_date
+
+    je.append("accounts", {
+        "account": cash_account,
+        "debit_in_account_currency": flt(sum(a.amount for a in repayments + deposits), 2),
+        "credit_in_account_currency": 0
+    })
+
+    for member, principal in principal_by_member.items():
+        je.append("accounts", {
+            "account": members[member].ledger_account,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": flt(principal, 2),
+            "party_type": "Customer",
+            "party": members[member].customer_link,
+            "user_remark": f"Check-off Loan Repayment for {member}"
+        })
+
+    if total_accrued > 0:
+        je.append("accounts", {
+            "account": accounts.interest_receivable,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": total_accrued
+        })
+
+    if total_interest > 0:
+        je.append("accounts", {
+            "account": accounts.interest_income,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": total_interest
+        })
+
+    for member, amount in savings_by_member.items():
+        je.append("accounts", {
+            "account": members[member].savings_account,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": flt(amount, 2),
+            "is_advance": "Yes",
+            "party_type": "Customer",
+            "party": members[member].customer_link,
+            "user_remark": f"Check-off Savings Deposit for {member}"
+        })
+
+    je.save(ignore_permissions=True)
+    je.submit()
+    return je.name
+
+
+def notify_remitted_members(remittance, allocations):
+    """Queues one check-off statement per member in the outbox."""
+    by_member = {}
+    for a in allocations:
+        by_member.setdefault(a.member, []).append(a)
+
+    queue_member_emails([{
+        "recipient": member,
+        "subject": "Check-off Remittance Received",
+        "message": f"We have received <b>{flt(sum(a.amount for a in rows), 2)}</b> from {remittance.employer}: "
+            + ", ".join(
+                f"<b>{a.amount}</b> to loan {a.loan}" if a.allocation == "Loan Repayment" else f"<b>{a.amount}</b> to savings"
+                for a in rows
+            ) + "."
+    } for member, rows in by_member.items()])
@@ -1,5 +1,9 @@
+import json
+
 import frappe
-from frappe.utils import flt, nowdate, get_datetime
+from frappe.utils import add_months, flt, getdate, nowdate, get_datetime
+
+from sacc_app.rollups import GRANULARITIES, METRIC_SOURCES, get_activity_series
 
 @frappe.whitelist(allow_guest=True)
 def get_dashboard_stats():
@@ -208,20 +212,52 @@ def get_payment_requests(limit_start=0, limit_page_length=20, search=None):
 @frappe.whitelist(allow_guest=True)
 def get_savings_growth():
     """
-    Returns monthly savings growth.
+    Returns monthly savings growth, from the monthly deposit rollups.
     """
     data = frappe.db.sql("""
         SELECT 
-            MONTHNAME(posting_date) as month_name, 
-            YEAR(posting_date) as year,
+            MONTHNAME(period_start) as month_name, 
+            YEAR(period_start) as year,
             SUM(amount) as total
-        FROM `tabSACCO Savings`
-        WHERE type = 'Deposit' AND docstatus = 1
-        GROUP BY YEAR(posting_date), MONTH(posting_date)
-        ORDER BY YEAR(posting_date) ASC, MONTH(posting_date) ASC
+        FROM `tabSACCO Activity Rollup`
+        WHERE period_type = 'Month' AND metric = 'Deposits' AND entry_count > 0
+        GROUP BY period_start
+        ORDER BY period_start ASC
     """, as_dict=True)
     
     return {
         "status": "success",
         "data": data
     }
+
+@frappe.whitelist(allow_guest=True)
+def get_activity_trends(metrics=None, granularity="month", from_date=None, to_date=None, category=None, company=None):
+    """
+    Time series of activity totals per day, week, month, quarter or year, from the activity rollups.
+    - metrics: list (or JSON/comma-separated string) of Deposits, Withdrawals, Repayments,
+      Disbursements, Welfare Contributions, Welfare Withdrawals, Expenses. Defaults to all.
+    - from_date/to_date: range, default the last 12 months. Buckets are whole periods.
+    - category: an expense account, to narrow Expenses to it.
+    """
+    if isinstance(metrics, str):
+        metrics = json.loads(metrics) if metrics.startswith("[") else [m.strip() for m in metrics.split(",")]
+    metrics = metrics or list(METRIC_SOURCES)
+    unknown = [m for m in metrics if m not in METRIC_SOURCES]
+    if unknown:
+        return {"status": "error", "message": f"Unknown metrics: {', '.join(unknown)}. Use any of: {', '.join(METRIC_SOURCES)}"}
+    if granularity not in GRANULARITIES:
+        return {"status": "error", "message": f"Unsupported granularity {granularity}. Use one of: {', '.join(GRANULARITIES)}"}
+
+    to_date = getdate(to_date or nowdate())
+    from_date = getdate(from_date or add_months(to_date, -11))
+    if from_date > to_date:
+        return {"status": "error", "message": "from_date must be on or before to_date."}
+
+    return {
+        "status": "success",
+        "data": {
+            "granularity": granularity,
+            "metrics": metrics,
+            "series": get_activity_series(metrics, granularity, from_date, to_date, category, company)
+        }
+    }
@@ -3,6 +3,8 @@ from frappe import _
 from frappe.utils import flt, nowdate, getdate, add_months, formatdate
 import json
 
+from sacc_app.rollups import get_activity_series
+
 @frappe.whitelist(allow_guest=True)
 def get_expense_dashboard_stats():
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
@@ -70,30 +72,13 @@ def get_expenses_by_category():
 def get_monthly_expense_trends():
     company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
     
-    # Last 6 months
-    trends = []
-    for i in range(5, -1, -1):
-        target_date = add_months(nowdate(), -i)
-        year = getdate(target_date).year
-        month = getdate(target_date).month
-        month_name = formatdate(target_date, "MMMM")
-        
-        start_date = f"{year}-{month:02d}-01"
-        # End date logic simplified
-        end_date = add_months(start_date, 1)
-        
-        total = frappe.db.sql("""
-            SELECT SUM(gl.debit - gl.credit)
-            FROM `tabGL Entry` gl
-            JOIN `tabAccount` acc ON gl.account = acc.name
-            WHERE gl.company = %s AND acc.root_type = 'Expense' 
-            AND gl.posting_date >= %s AND gl.posting_date < %s AND gl.docstatus = 1
-        """, (company, start_date, end_date))[0][0] or 0.0
-        
-        trends.append({
-            "month": month_name,
-            "total": round(total, 2)
-        })
+    # Last 6 months, from the monthly expense rollups
+    today = getdate(nowdate())
+    series = get_activity_series(["Expenses"], "month", add_months(today, -5), today, company=company)
+    trends = [{
+        "month": formatdate(row["period"], "MMMM"),
+        "total": row["Expenses"]["amount"]
+    } for row in series]
         
     return {"status": "success", "data": trends}
 
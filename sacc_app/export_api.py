@@ -0,0 +1,245 @@
+import csv
+import io
+import tempfile
+from contextlib import contextmanager
+from decimal import Decimal
+
+import frappe
+from frappe.utils import add_days, flt
+from werkzeug.wrappers import Response
+
+from sacc_app.api import (
+    LEDGER_REPORT_ORDER, LEDGER_REPORT_SQL, get_loan_ledger_filters, get_report_dates,
+    get_savings_filters, get_transaction_filters, resolve_statement_account
+)
+from sacc_app.ledger import get_balance_as_of
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+# Rows per CSV write to the response, and bytes per XLSX read
+EXPORT_CHUNK = 1000
+FILE_CHUNK = 64 * 1024
+
+# XLSX rows are spooled in memory up to this size before moving to a temp file
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024
+
+SAVINGS_COLUMNS = [
+    ("posting_date", "Date"), ("name", "Transaction"), ("member", "Member"), ("member_name", "Member Name"),
+    ("type", "Type"), ("amount", "Amount"), ("payment_mode", "Payment Mode"), ("reference_number", "Reference")
+]
+
+TRANSACTION_COLUMNS = [
+    ("posting_date", "Date"), ("transaction_id", "Transaction"), ("member_name", "Member Name"),
+    ("direction", "Type"), ("category", "Category"), ("amount", "Amount"), ("remarks", "Reference"),
+    ("status", "Status")
+]
+
+LEDGER_COLUMNS = [
+    ("posting_date", "Date"), ("voucher_type", "Voucher Type"), ("voucher_no", "Voucher No"),
+    ("member", "Member"), ("member_name", "Member Name"), ("account", "Account"), ("debit", "Debit"),
+    ("credit", "Credit"), ("balance", "Balance"), ("remarks", "Remarks")
+]
+
+STATEMENT_COLUMNS = [
+    ("posting_date", "Date"), ("voucher_type", "Voucher Type"), ("voucher_no", "Voucher No"),
+    ("debit", "Debit"), ("credit", "Credit"), ("balance", "Balance"), ("remarks", "Remarks")
+]
+
+
+@frappe.whitelist(allow_guest=True)
+def export_savings_transactions(format="csv", member=None, type=None, date_from=None, date_to=None, searchTerm=None):
+    """Streams every savings/withdrawal transaction matching the get_savings_transactions filters."""
+    if format not in EXPORT_FORMATS:
+        return format_error(format)
+
+    where_clause, params = get_savings_filters(member, type, date_from, date_to, searchTerm)
+    query = f"""
+        SELECT s.posting_date, s.name, s.member, m.member_name, s.type, s.amount, s.payment_mode, s.reference_number
+        FROM `tabSACCO Savings` s
+        LEFT JOIN `tabSACCO Member` m ON m.name = s.member
+        {where_clause}
+        ORDER BY s.posting_date DESC, s.creation DESC
+    """
+    return export_response("savings_transactions", format, SAVINGS_COLUMNS, lambda: iter_query(query, tuple(params)))
+
+
+@frappe.whitelist(allow_guest=True)
+def export_transactions(format="csv", category=None, start_date=None, end_date=None, status=None, search=None):
+    """Streams every transaction matching the get_all_transactions filters."""
+    if format not in EXPORT_FORMATS:
+        return format_error(format)
+
+    where_clause, values = get_transaction_filters(category, start_date, end_date, status, search)
+    query = f"""
+        SELECT feed.posting_date, feed.name AS transaction_id, IFNULL(feed.member_name, 'System') AS member_name,
+            feed.direction, feed.category, feed.amount, feed.remarks, feed.status
+        FROM `tabSACCO Transaction Feed` feed
+        {where_clause}
+        ORDER BY feed.posting_date DESC, feed.posted_on DESC
+    """
+    return export_response("transactions", format, TRANSACTION_COLUMNS, lambda: iter_query(query, values))
+
+
+@frappe.whitelist(allow_guest=True)
+def export_loan_ledger_report(format="csv", date_from=None, date_to=None, member=None, loan_id=None):
+    """Streams the loan ledger with its running balance from the opening balance on, as get_loan_ledger_report pages it."""
+    if format not in EXPORT_FORMATS:
+        return format_error(format)
+
+    try:
+        ledger = get_loan_ledger_filters(date_from, date_to, member, loan_id)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    query = f"""
+        {LEDGER_REPORT_SQL.format(join=ledger.join, conditions=" AND ".join(ledger.conditions))}
+        {LEDGER_REPORT_ORDER}
+    """
+    return export_response("loan_ledger", format, LEDGER_COLUMNS,
+        lambda: with_running_balance(iter_query(query, ledger.values), ledger.opening_balance))
+
+
+@frappe.whitelist(allow_guest=True)
+def export_account_statement(format="csv", account=None, member=None, from_date=None, to_date=None):
+    """
+    Streams an account statement consolidated by voucher, as get_account_statement returns it:
+    an opening row, then one row per voucher with the running balance.
+    """
+    if format not in EXPORT_FORMATS:
+        return format_error(format)
+
+    target = account or member
+    if not target:
+        return {"status": "error", "message": "Please provide either 'account' or 'member'."}
+
+    from_date, to_date = get_report_dates(from_date, to_date)
+    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+    real_account = resolve_statement_account(target, company)
+    if not real_account:
+        return {"status": "error", "message": f"Account {target} could not be resolved to a valid General Ledger account."}
+
+    opening_balance = get_balance_as_of(real_account, add_days(from_date, -1))
+    query = """
+        SELECT posting_date, voucher_type, voucher_no, SUM(debit) AS debit, SUM(credit) AS credit,
+            MIN(remarks) AS remarks
+        FROM `tabGL Entry`
+        WHERE account = %(account)s AND is_cancelled = 0 AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+        GROUP BY posting_date, voucher_type, voucher_no
+        ORDER BY posting_date, MIN(creation)
+    """
+    values = {"account": real_account, "from_date": from_date, "to_date": to_date}
+
+    def get_rows():
+        yield frappe._dict(posting_date=from_date, voucher_no="Opening", debit=0, credit=0, balance=opening_balance)
+        yield from with_running_balance(iter_query(query, values), opening_balance)
+
+    return export_response(f"statement_{frappe.scrub(real_account)}", format, STATEMENT_COLUMNS, get_rows)
+
+
+def format_error(format):
+    return {"status": "error", "message": f"Unsupported format {format}. Use one of: {', '.join(EXPORT_FORMATS)}"}
+
+
+def iter_query(query, values):
+    """Rows straight off a server-side cursor, so the result set is never held in memory."""
+    with frappe.db.unbuffered_cursor():
+        yield from frappe.db.sql(query, values, as_dict=True, as_iterator=True)
+
+
+def with_running_balance(rows, opening_balance):
+    balance = flt(opening_balance)
+    for row in rows:
+        balance = flt(balance + flt(row.debit) - flt(row.credit), 2)
+        row.balance = balance
+        yield row
+
+
+def export_response(name, format, columns, get_rows):
+    """
+    Streaming download of `get_rows()`. The body is written after the request's own database
+    connection is closed, so it runs on a connection of its own as the same user.
+    """
+    site, user = frappe.local.site, frappe.session.user
+
+    def body():
+        with export_connection(site, user):
+            yield from write_export(format, columns, get_rows())
+
+    return Response(body(), content_type=EXPORT_FORMATS[format], direct_passthrough=True, headers={
+        "Content-Disposition": f'attachment; filename="{name}.{format}"',
+        "X-Accel-Buffering": "no"
+    })
+
+
+@contextmanager
+def export_connection(site, user):
+    frappe.init(site=site)
+    frappe.connect()
+    frappe.set_user(user)
+    try:
+        yield
+    finally:
+        frappe.destroy()
+
+
+def write_export(format, columns, rows):
+    """Encoded chunks of the export; CSV goes out as rows arrive, XLSX once the workbook is closed."""
+    if format == "xlsx":
+        yield from write_xlsx(columns, rows)
+    else:
+        yield from write_csv(columns, rows)
+
+
+def write_csv(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps read the file as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow([label for _, label in columns])
+    # The header goes out before the first row is fetched
+    yield flush(buffer)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([format_value(row.get(field)) for field, _ in columns])
+        if count % EXPORT_CHUNK == 0:
+            yield flush(buffer)
+    if buffer.tell():
+        yield flush(buffer)
+
+
+def flush(buffer):
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def write_xlsx(columns, rows):
+    """
+    Write-only workbook: openpyxl keeps only the current row in memory and spools the sheet to
+    disk. An XLSX is a zip whose index is written last, so the file is sent once it is complete.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([label for _, label in columns])
+    for row in rows:
+        sheet.append([format_value(row.get(field), blank=None) for field, _ in columns])
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE) as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(FILE_CHUNK):
+            yield chunk
+
+
+def format_value(value, blank=""):
+    if value is None:
+        return blank
+    if isinstance(value, (float, Decimal)):
+        return flt(value, 2)
+    return value
@@ -0,0 +1,159 @@
+"""
+Guarantor exposure index.
+
+SACCO Guarantor rows live inside each loan, so SACCO Guarantor Exposure keeps one row per
+guarantor with what they stand behind across active loans. Exposure is each guarantee scaled
+by the share of its loan still outstanding: it falls as the borrower repays and drops out when
+the loan completes. A guarantor's capacity is their savings times the configured multiple, less
+their exposure.
+"""
+
+import frappe
+from frappe.utils import cint, flt
+
+# Used until the multiple is saved in SACCO Settings
+DEFAULT_GUARANTEE_MULTIPLE = 1
+
+# Guarantors per upsert in the full rebuild
+REBUILD_CHUNK = 1000
+
+# Members with their exposure and free capacity; one primary-key join per member
+CAPACITY_SQL = """
+	SELECT m.name AS member, m.member_name, m.status, m.total_savings,
+		IFNULL(e.active_guarantees, 0) AS active_guarantees,
+		IFNULL(e.total_guaranteed, 0) AS total_guaranteed,
+		IFNULL(e.exposure, 0) AS exposure,
+		m.total_savings * %(multiple)s AS guarantee_limit,
+		m.total_savings * %(multiple)s - IFNULL(e.exposure, 0) AS free_capacity
+	FROM `tabSACCO Member` m
+	LEFT JOIN `tabSACCO Guarantor Exposure` e ON e.name = m.name
+	WHERE {conditions}
+"""
+
+
+def get_guarantee_limits():
+	return frappe._dict(
+		enforce=cint(frappe.db.get_single_value("SACCO Settings", "enforce_guarantor_limits")),
+		multiple=flt(frappe.db.get_single_value("SACCO Settings", "guarantee_savings_multiple")) or DEFAULT_GUARANTEE_MULTIPLE,
+		max_active=cint(frappe.db.get_single_value("SACCO Settings", "max_active_guarantees"))
+	)
+
+
+def update_guarantor_exposure(guarantors):
+	"""Recomputes the exposure rows of the given guarantor members in one upsert."""
+	guarantors = tuple({g for g in guarantors if g})
+	if not guarantors:
+		return
+
+	frappe.db.sql("""
+		INSERT INTO `tabSACCO Guarantor Exposure` (
+			name, creation, modified, owner, modified_by, docstatus, idx,
+			guarantor, active_guarantees, total_guaranteed, exposure
+		)
+		SELECT
+			m.name, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+			m.name, COUNT(loan.name), IFNULL(SUM(g.guarantee_amount), 0),
+			IFNULL(SUM(g.guarantee_amount * LEAST(1, loan.outstanding_balance / NULLIF(loan.total_repayable, 0))), 0)
+		FROM `tabSACCO Member` m
+		LEFT JOIN (
+			`tabSACCO Guarantor` g
+			INNER JOIN `tabSACCO Loan` loan ON loan.name = g.parent
+				AND loan.docstatus = 1 AND loan.status IN ('Active', 'Defaulted')
+		) ON g.guarantor_member = m.name AND g.parenttype = 'SACCO Loan' AND g.status != 'Rejected'
+		WHERE m.name IN %(guarantors)s
+		GROUP BY m.name
+		ON DUPLICATE KEY UPDATE
+			modified = VALUES(modified),
+			active_guarantees = VALUES(active_guarantees),
+			total_guaranteed = VALUES(total_guaranteed),
+			exposure = VALUES(exposure)
+	""", {"guarantors": guarantors})
+
+
+def update_exposure_for_loans(loans):
+	"""Refreshes everyone guaranteeing any of `loans`; called when loans are disbursed, repaid or closed."""
+	loans = tuple({l for l in loans if l})
+	if not loans:
+		return
+
+	update_guarantor_exposure(frappe.db.sql_list("""
+		SELECT DISTINCT guarantor_member FROM `tabSACCO Guarantor`
+		WHERE parenttype = 'SACCO Loan' AND parent IN %s
+	""", (loans,)))
+
+
+def rebuild_guarantor_exposure():
+	"""Repair path: recomputes every guarantor's row from the loans."""
+	guarantors = frappe.db.sql_list("""
+		SELECT DISTINCT guarantor_member FROM `tabSACCO Guarantor`
+		WHERE parenttype = 'SACCO Loan' AND guarantor_member IS NOT NULL
+		ORDER BY guarantor_member
+	""")
+	for start in range(0, len(guarantors), REBUILD_CHUNK):
+		update_guarantor_exposure(guarantors[start:start + REBUILD_CHUNK])
+
+	# Rows of members who no longer guarantee anything
+	frappe.db.sql("""
+		DELETE exposure FROM `tabSACCO Guarantor Exposure` exposure
+		LEFT JOIN `tabSACCO Guarantor` g ON g.guarantor_member = exposure.guarantor AND g.parenttype = 'SACCO Loan'
+		WHERE g.name IS NULL
+	""")
+
+
+def get_guarantor_capacity(members, limits=None):
+	"""{member: capacity row} for the given members, from their savings and the exposure index."""
+	members = tuple({m for m in members if m})
+	if not members:
+		return {}
+
+	limits = limits or get_guarantee_limits()
+	return {row.member: row for row in frappe.db.sql(CAPACITY_SQL.format(conditions="m.name IN %(members)s"),
+		{"members": members, "multiple": limits.multiple}, as_dict=True)}
+
+
+def get_guarantor_error(guarantors, capacity, limits):
+	"""
+	First guarantor whose new guarantees (summed per member) exceed their free capacity or
+	active-guarantee limit, as a message. None when within limits or limits are not enforced.
+	"""
+	if not limits.enforce:
+		return None
+
+	requested = {}
+	for g in guarantors:
+		if g.get("status") != "Rejected":
+			requested[g.get("guarantor_member")] = requested.get(g.get("guarantor_member"), 0) + flt(g.get("guarantee_amount"))
+
+	for member, amount in requested.items():
+		row = capacity.get(member)
+		if not row:
+			return f"Guarantor {member} not found."
+		if row.status != "Active":
+			return f"Guarantor {member} is not an Active member."
+		if limits.max_active and cint(row.active_guarantees) >= limits.max_active:
+			return f"Guarantor {member} already guarantees {cint(row.active_guarantees)} active loans (limit {limits.max_active})."
+		if amount > flt(row.free_capacity) + 0.01:
+			return f"Guarantor {member} can guarantee up to {max(0, flt(row.free_capacity, 2))}. Requested: {flt(amount, 2)}"
+
+
+def find_eligible_guarantors(amount=0, exclude=None, search=None, limit=20, limits=None):
+	"""Active members with at least `amount` of free capacity, most capacity first."""
+	limits = limits or get_guarantee_limits()
+	conditions = ["m.status = 'Active'"]
+	values = {"multiple": limits.multiple, "amount": flt(amount), "limit": cint(limit) or 20}
+
+	if exclude:
+		conditions.append("m.name != %(exclude)s")
+		values["exclude"] = exclude
+	if search:
+		conditions.append("(m.name LIKE %(search)s OR m.member_name LIKE %(search)s)")
+		values["search"] = f"%{search}%"
+	if limits.max_active:
+		conditions.append("IFNULL(e.active_guarantees, 0) < %(max_active)s")
+		values["max_active"] = limits.max_active
+
+	return frappe.db.sql(CAPACITY_SQL.format(conditions=" AND ".join(conditions)) + """
+		HAVING free_capacity >= %(amount)s
+		ORDER BY free_capacity DESC, m.name
+		LIMIT %(limit)s
+	""", values, as_dict=True)
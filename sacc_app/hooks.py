@@ -145,12 +145,81 @@ app_license = "mit"
 # 	}
 # }
 
+doc_events = {
+	"Account": {
+		"on_update": "sacc_app.account_map.clear_account_map",
+		"after_rename": "sacc_app.account_map.clear_account_map",
+		"on_trash": "sacc_app.account_map.clear_account_map"
+	},
+	"Company": {
+		"on_update": "sacc_app.account_map.clear_account_map",
+		"on_trash": "sacc_app.account_map.clear_account_map"
+	},
+	"Global Defaults": {
+		"on_update": "sacc_app.account_map.clear_account_map"
+	},
+	"Mode of Payment": {
+		"on_update": "sacc_app.account_map.clear_account_map",
+		"on_trash": "sacc_app.account_map.clear_account_map"
+	},
+	"Journal Entry": {
+		"on_submit": [
+			"sacc_app.transaction_feed.update_transaction_feed",
+			"sacc_app.rollups.update_activity_rollups",
+			"sacc_app.cache.bump_report_version"
+		],
+		"on_cancel": [
+			"sacc_app.transaction_feed.update_transaction_feed",
+			"sacc_app.rollups.update_activity_rollups",
+			"sacc_app.cache.bump_report_version"
+		]
+	},
+	"Payment Entry": {
+		"on_submit": [
+			"sacc_app.transaction_feed.update_transaction_feed",
+			"sacc_app.rollups.update_activity_rollups",
+			"sacc_app.cache.bump_report_version"
+		],
+		"on_cancel": [
+			"sacc_app.transaction_feed.update_transaction_feed",
+			"sacc_app.rollups.update_activity_rollups",
+			"sacc_app.cache.bump_report_version"
+		]
+	},
+	"SACCO Savings": {
+		"on_submit": "sacc_app.rollups.update_activity_rollups",
+		"on_cancel": "sacc_app.rollups.update_activity_rollups"
+	},
+	"SACCO Loan Repayment": {
+		"on_submit": "sacc_app.rollups.update_activity_rollups",
+		"on_cancel": "sacc_app.rollups.update_activity_rollups"
+	},
+	"SACCO Loan": {
+		"on_submit": "sacc_app.rollups.update_activity_rollups",
+		"on_cancel": "sacc_app.rollups.update_activity_rollups"
+	},
+	"SACCO Welfare": {
+		"on_submit": "sacc_app.rollups.update_activity_rollups",
+		"on_cancel": "sacc_app.rollups.update_activity_rollups"
+	}
+}
+
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
+	"all": [
+		"sacc_app.notify.dispatch_notifications",
+		"sacc_app.ledger.update_account_balances"
+	],
 	"daily": [
-		"sacc_app.tasks.send_loan_reminders"
+		"sacc_app.tasks.send_loan_reminders",
+		"sacc_app.tasks.update_all_demanded_amounts",
+		"sacc_app.arrears.process_loan_arrears",
+		"sacc_app.accrual.accrue_interest"
+	],
+	"monthly": [
+		"sacc_app.statements.start_monthly_statement_run"
 	],
 }
 
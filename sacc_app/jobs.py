@@ -0,0 +1,62 @@
+import json
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+
+
+@contextmanager
+def track_job_run(job_name, run=None):
+	"""
+	Records a SACCO Job Run around a batch job: status, runtime and rows affected.
+	The body sets `run.rows_affected` (and optionally `run.details`) as it goes.
+	Pass an existing run name to continue a run created when the job was queued.
+	"""
+	if run:
+		run = frappe.get_doc("SACCO Job Run", run)
+	else:
+		run = frappe.get_doc({"doctype": "SACCO Job Run", "job_name": job_name})
+		run.insert(ignore_permissions=True)
+
+	run.db_set({"status": "Running", "started_at": now_datetime()})
+	run.rows_affected = run.rows_affected or 0
+	frappe.db.commit()
+
+	start = time.monotonic()
+	try:
+		yield run
+	except Exception:
+		frappe.db.rollback()
+		run.db_set({
+			"status": "Failed",
+			"finished_at": now_datetime(),
+			"duration": time.monotonic() - start,
+			"rows_affected": run.rows_affected,
+			"details": dump_details(run.details),
+			"error": frappe.get_traceback()
+		})
+		frappe.db.commit()
+		raise
+	else:
+		run.db_set({
+			"status": "Completed",
+			"progress": 100,
+			"finished_at": now_datetime(),
+			"duration": time.monotonic() - start,
+			"rows_affected": run.rows_affected,
+			"details": dump_details(run.details)
+		})
+		frappe.db.commit()
+
+
+def update_job_progress(run, progress):
+	"""Persists progress immediately so status endpoints can poll a running job."""
+	run.db_set({"progress": progress, "rows_affected": run.rows_affected, "details": dump_details(run.details)})
+	frappe.db.commit()
+
+
+def dump_details(details):
+	if details is None or isinstance(details, str):
+		return details
+	return json.dumps(details, default=str)
@@ -0,0 +1,287 @@
+"""
+Account balances.
+
+SACCO Account Daily Balance holds each account's debit, credit and closing balance per day
+with postings. A catch-up job refreshes the days touched by GL entries changed since its
+watermark, so a balance as of any date is the latest snapshot on or before it plus a short
+tail of GL entries changed since the last catch-up. The chart's nested set (lft/rgt) rolls
+account balances up to the group accounts in memory, in place of a balance query per account.
+"""
+
+import hashlib
+from datetime import timedelta
+
+import frappe
+from frappe.utils import flt, get_datetime, getdate
+
+from sacc_app.jobs import track_job_run
+
+WATERMARK_KEY = "sacc_app_account_balance_watermark"
+
+# GL entries modified this long before the watermark are rescanned, so entries committed late
+# by long transactions are still picked up
+CATCH_UP_OVERLAP_MINUTES = 10
+
+# (account, day) pairs per refresh statement
+SNAPSHOT_CHUNK = 1000
+
+ACCOUNT_FIELDS = """name, account_name, account_number, parent_account, is_group,
+	root_type, account_type, lft, rgt"""
+
+
+def get_subtree_bounds(account):
+	"""(lft, rgt) of an account, or None when it does not exist."""
+	bounds = frappe.db.get_value("Account", account, ["lft", "rgt"])
+	return tuple(bounds) if bounds and bounds[0] is not None else None
+
+
+def get_posted_balances(company, as_of=None, bounds=None):
+	"""{account: debit - credit} for `company`, optionally as of a date and within a subtree."""
+	return get_balances_as_of(as_of, company=company, bounds=bounds)
+
+
+def get_balances_as_of(as_of=None, accounts=None, company=None, bounds=None):
+	"""
+	{account: debit - credit} at the end of `as_of` (default: everything posted). Each account's
+	latest daily snapshot on or before the date, plus the GL entries changed since the last
+	catch-up. Before the snapshots are first built, sums GL Entry directly.
+	"""
+	conditions, values, join = [], {}, ""
+	if accounts is not None:
+		if not accounts:
+			return {}
+		conditions.append("{alias}.account IN %(accounts)s")
+		values["accounts"] = tuple(accounts)
+	if company:
+		conditions.append("{alias}.company = %(company)s")
+		values["company"] = company
+	if bounds:
+		join = "INNER JOIN `tabAccount` acc ON acc.name = {alias}.account"
+		conditions.append("acc.lft >= %(lft)s AND acc.rgt <= %(rgt)s")
+		values.update(lft=bounds[0], rgt=bounds[1])
+	if as_of:
+		conditions.append("{alias}.posting_date <= %(as_of)s")
+		values["as_of"] = getdate(as_of)
+
+	def where(alias, *extra):
+		return " AND ".join([c.format(alias=alias) for c in conditions] + list(extra)) or "1=1"
+
+	watermark = get_balance_watermark()
+	if not watermark:
+		return dict(frappe.db.sql(f"""
+			SELECT gle.account, SUM(gle.debit) - SUM(gle.credit)
+			FROM `tabGL Entry` gle
+			{join.format(alias="gle")}
+			WHERE {where("gle", "gle.is_cancelled = 0")}
+			GROUP BY gle.account
+		""", values))
+
+	balances = {account: flt(balance) for account, balance in frappe.db.sql(f"""
+		SELECT snap.account, snap.closing_balance
+		FROM `tabSACCO Account Daily Balance` snap
+		INNER JOIN (
+			SELECT snap.account, MAX(snap.posting_date) AS posting_date
+			FROM `tabSACCO Account Daily Balance` snap
+			{join.format(alias="snap")}
+			WHERE {where("snap")}
+			GROUP BY snap.account
+		) latest ON latest.account = snap.account AND latest.posting_date = snap.posting_date
+	""", values)}
+
+	# Tail: entries created since the catch-up count in, entries cancelled since count out
+	values["watermark"] = watermark
+	for account, change in frappe.db.sql(f"""
+		SELECT gle.account, SUM(CASE
+			WHEN gle.creation > %(watermark)s AND gle.is_cancelled = 0 THEN gle.debit - gle.credit
+			WHEN gle.creation <= %(watermark)s AND gle.is_cancelled = 1 THEN gle.credit - gle.debit
+			ELSE 0 END)
+		FROM `tabGL Entry` gle
+		{join.format(alias="gle")}
+		WHERE {where("gle", "gle.modified > %(watermark)s")}
+		GROUP BY gle.account
+	""", values):
+		balances[account] = balances.get(account, 0) + flt(change)
+
+	return balances
+
+
+def get_balance_as_of(account, as_of=None):
+	"""Balance (debit - credit) of one account at the end of `as_of`: one indexed lookup plus the tail."""
+	return flt(get_balances_as_of(as_of, accounts=[account]).get(account))
+
+
+def get_account_balances(company, as_of=None, root=None):
+	"""
+	Accounts of `company` in tree order (optionally only the subtree under `root`), each with
+	`balance` rolled up from its descendants and `indent` (depth below the subtree root).
+	"""
+	bounds = get_subtree_bounds(root) if root else None
+	if root and not bounds:
+		frappe.throw(f"Account {root} not found")
+
+	condition = "AND lft >= %(lft)s AND rgt <= %(rgt)s" if bounds else ""
+	accounts = frappe.db.sql(f"""
+		SELECT {ACCOUNT_FIELDS}
+		FROM `tabAccount`
+		WHERE company = %(company)s {condition}
+		ORDER BY lft
+	""", {"company": company, "lft": bounds and bounds[0], "rgt": bounds and bounds[1]}, as_dict=True)
+
+	balances = get_posted_balances(company, as_of, bounds)
+	by_name = {}
+	for account in accounts:
+		account.balance = flt(balances.get(account.name))
+		by_name[account.name] = account
+
+	# Descendants sort after their ancestors by lft, so walking backwards completes each
+	# account's balance before it is added to its parent
+	for account in reversed(accounts):
+		parent = by_name.get(account.parent_account)
+		if parent:
+			parent.balance += account.balance
+
+	open_rgt = []
+	for account in accounts:
+		while open_rgt and open_rgt[-1] < account.lft:
+			open_rgt.pop()
+		account.indent = len(open_rgt)
+		open_rgt.append(account.rgt)
+		account.balance = flt(account.balance, 2)
+
+	return accounts
+
+
+def get_balance_watermark():
+	watermark = frappe.db.get_global(WATERMARK_KEY)
+	return get_datetime(watermark) if watermark else None
+
+
+def update_account_balances():
+	"""
+	Scheduled catch-up: refreshes the daily snapshots of every (account, day) with GL entries
+	created or cancelled since the watermark. Does nothing until the first rebuild.
+	"""
+	watermark = get_balance_watermark()
+	if not watermark:
+		return
+
+	pairs = frappe.db.sql("""
+		SELECT DISTINCT account, posting_date FROM `tabGL Entry`
+		WHERE modified > %s
+	""", (watermark - timedelta(minutes=CATCH_UP_OVERLAP_MINUTES),))
+	if not pairs:
+		return
+
+	with track_job_run("Account Balance Snapshot") as run:
+		for start in range(0, len(pairs), SNAPSHOT_CHUNK):
+			refresh_account_days(pairs[start:start + SNAPSHOT_CHUNK])
+		run.rows_affected = len(pairs)
+
+		# Read after the refresh so nothing it included is counted again in the tail
+		set_balance_watermark()
+
+
+def set_balance_watermark():
+	watermark = frappe.db.sql("SELECT MAX(modified) FROM `tabGL Entry`")[0][0]
+	if watermark:
+		frappe.db.set_global(WATERMARK_KEY, str(watermark))
+
+
+def refresh_account_days(pairs):
+	"""Re-sums the given (account, day) pairs from GL Entry, then recomputes the accounts' closing balances from the earliest day."""
+	placeholders = ", ".join(["(%s, %s)"] * len(pairs))
+	keys = [v for pair in pairs for v in pair]
+
+	totals = frappe.db.sql(f"""
+		SELECT account, company, posting_date, SUM(debit), SUM(credit)
+		FROM `tabGL Entry`
+		WHERE is_cancelled = 0 AND (account, posting_date) IN ({placeholders})
+		GROUP BY account, company, posting_date
+	""", keys)
+
+	# Days left with no entries (everything on them cancelled) keep a row with zero movement
+	frappe.db.sql(f"""
+		UPDATE `tabSACCO Account Daily Balance` SET debit = 0, credit = 0
+		WHERE (account, posting_date) IN ({placeholders})
+	""", keys)
+
+	if totals:
+		frappe.db.sql(f"""
+			INSERT INTO `tabSACCO Account Daily Balance` (
+				name, creation, modified, owner, modified_by, docstatus, idx,
+				account, company, posting_date, debit, credit, closing_balance
+			)
+			VALUES {", ".join(["(%s, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0, %s, %s, %s, %s, %s, 0)"] * len(totals))}
+			ON DUPLICATE KEY UPDATE
+				modified = VALUES(modified),
+				debit = VALUES(debit),
+				credit = VALUES(credit)
+		""", [v for account, company, posting_date, debit, credit in totals
+			for v in (get_snapshot_name(account, posting_date), account, company, posting_date, debit, credit)])
+
+	recompute_closing_balances({account for account, _ in pairs}, min(getdate(day) for _, day in pairs))
+
+
+def recompute_closing_balances(accounts, from_date):
+	"""Running closing balance of each account's snapshot rows from `from_date` on."""
+	accounts = tuple(accounts)
+	opening = {account: flt(balance) for account, balance in frappe.db.sql("""
+		SELECT snap.account, snap.closing_balance
+		FROM `tabSACCO Account Daily Balance` snap
+		INNER JOIN (
+			SELECT account, MAX(posting_date) AS posting_date
+			FROM `tabSACCO Account Daily Balance`
+			WHERE account IN %(accounts)s AND posting_date < %(from_date)s
+			GROUP BY account
+		) prev ON prev.account = snap.account AND prev.posting_date = snap.posting_date
+	""", {"accounts": accounts, "from_date": from_date})}
+
+	running, changed = {}, []
+	for name, account, debit, credit, closing in frappe.db.sql("""
+		SELECT name, account, debit, credit, closing_balance
+		FROM `tabSACCO Account Daily Balance`
+		WHERE account IN %s AND posting_date >= %s
+		ORDER BY account, posting_date
+	""", (accounts, from_date)):
+		balance = flt(running.get(account, opening.get(account, 0)) + flt(debit) - flt(credit), 2)
+		running[account] = balance
+		if abs(balance - flt(closing)) >= 0.005:
+			changed.append((name, balance))
+
+	for start in range(0, len(changed), SNAPSHOT_CHUNK):
+		chunk = changed[start:start + SNAPSHOT_CHUNK]
+		frappe.db.sql(f"""
+			INSERT INTO `tabSACCO Account Daily Balance` (name, closing_balance)
+			VALUES {", ".join(["(%s, %s)"] * len(chunk))}
+			ON DUPLICATE KEY UPDATE closing_balance = VALUES(closing_balance)
+		""", [v for row in chunk for v in row])
+
+
+def rebuild_account_balances():
+	"""
+	Rebuilds every daily snapshot from GL Entry in one statement and resets the watermark.
+	Run after restoring or reposting ledgers: bench execute sacc_app.ledger.rebuild_account_balances
+	"""
+	with track_job_run("Account Balance Rebuild") as run:
+		frappe.db.sql("DELETE FROM `tabSACCO Account Daily Balance`")
+		frappe.db.sql("""
+			INSERT INTO `tabSACCO Account Daily Balance` (
+				name, creation, modified, owner, modified_by, docstatus, idx,
+				account, company, posting_date, debit, credit, closing_balance
+			)
+			SELECT
+				SUBSTRING(SHA1(CONCAT(account, '|', posting_date)), 1, 20), NOW(), NOW(),
+				'Administrator', 'Administrator', 0, 0,
+				account, company, posting_date, SUM(debit), SUM(credit),
+				SUM(SUM(debit) - SUM(credit)) OVER (PARTITION BY account ORDER BY posting_date)
+			FROM `tabGL Entry`
+			WHERE is_cancelled = 0
+			GROUP BY account, company, posting_date
+		""")
+		run.rows_affected = frappe.db._cursor.rowcount
+		set_balance_watermark()
+
+
+def get_snapshot_name(account, posting_date):
+	"""Same name the rebuild gives the row, so both paths upsert the same (account, day)."""
+	return hashlib.sha1(f"{account}|{getdate(posting_date)}".encode()).hexdigest()[:20]
@@ -0,0 +1,307 @@
+import json
+
+import frappe
+from frappe.utils import add_months, cint, flt, getdate, now_datetime, nowdate
+
+from sacc_app.account_map import get_default_company
+from sacc_app.amortization import amortize
+from sacc_app.guarantors import get_guarantee_limits, get_guarantor_capacity, update_exposure_for_loans
+from sacc_app.jobs import track_job_run, update_job_progress
+from sacc_app.rollups import refresh_activity_rollups
+from sacc_app.sacco.doctype.sacco_loan.sacco_loan import get_eligibility_error
+from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_product_catalog
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+
+# Loans per consolidated disbursement Journal Entry; each chunk commits on its own
+DISBURSEMENT_CHUNK = 100
+
+# Upper bound on loans per run
+MAX_RUN_LOANS = 5000
+
+MEMBER_FIELDS = [
+    "name", "status", "loan_eligible", "registration_fee_paid", "active_loan",
+    "savings_account", "ledger_account", "customer_link"
+]
+
+INSTALLMENT_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "parent", "parenttype", "parentfield", "idx",
+    "installment_no", "due_date", "amount", "principal", "interest",
+    "principal_paid", "interest_paid", "balance_after", "status"
+]
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def start_loan_disbursement_run(loan_ids, approve=0):
+    """
+    Queues a batch disbursement for many loans (JSON list or comma-separated IDs).
+
+    Loans must be Approved; with approve=1, loans Pending Approval are approved in the same run.
+    The run is validated in bulk and posted in chunks of DISBURSEMENT_CHUNK loans, each with one
+    Journal Entry. Poll sacc_app.api.get_job_run_status with the returned run ID for progress and
+    per-loan outcomes.
+    """
+    from sacc_app.loan_calculator_api import parse_list
+
+    loans = list(dict.fromkeys(str(l).strip() for l in parse_list(loan_ids) if str(l).strip()))
+    if not loans:
+        return {"status": "error", "message": "At least one loan ID is required"}
+    if len(loans) > MAX_RUN_LOANS:
+        return {"status": "error", "message": f"Too many loans. Maximum is {MAX_RUN_LOANS} per run."}
+
+    run = frappe.get_doc({
+        "doctype": "SACCO Job Run",
+        "job_name": "Loan Disbursement Run",
+        "details": json.dumps({"total": len(loans), "approve": cint(approve)})
+    })
+    run.insert(ignore_permissions=True)
+
+    frappe.enqueue(
+        "sacc_app.loan_batch_api.run_loan_disbursement",
+        queue="long",
+        timeout=3600,
+        run=run.name,
+        loans=loans,
+        approve=cint(approve),
+        enqueue_after_commit=True
+    )
+
+    return {
+        "status": "success",
+        "message": f"Disbursement run for {len(loans)} loan(s) queued",
+        "data": {"run_id": run.name, "total": len(loans)}
+    }
+
+
+def run_loan_disbursement(loans, run=None, approve=0):
+    """
+    Background job: validates every loan with a handful of batched queries, then disburses the
+    eligible ones chunk by chunk. A failing chunk is rolled back and reported without stopping the run.
+    """
+    with track_job_run("Loan Disbursement Run", run=run) as job:
+        results = {loan: {"status": "Pending"} for loan in loans}
+        job.details = {"total": len(loans), "approve": cint(approve), "disbursed": 0, "failed": 0,
+            "journal_entries": [], "loans": results}
+
+        eligible = validate_disbursements(loans, results, approve=cint(approve))
+        job.details["failed"] = len(loans) - len(eligible)
+        update_job_progress(job, 5)
+
+        for start in range(0, len(eligible), DISBURSEMENT_CHUNK):
+            chunk = eligible[start:start + DISBURSEMENT_CHUNK]
+            try:
+                pending = lock_pending_loans(chunk)
+                journal_entry = post_disbursements(pending) if pending else None
+                frappe.db.commit()
+            except Exception as e:
+                frappe.db.rollback()
+                frappe.log_error(title="Loan Disbursement Run")
+                job.details["failed"] += len(chunk)
+                for loan in chunk:
+                    results[loan.name] = {"status": "Failed", "message": str(e)}
+            else:
+                job.details["disbursed"] += len(pending)
+                job.details["failed"] += len(chunk) - len(pending)
+                if journal_entry:
+                    job.details["journal_entries"].append(journal_entry)
+                for loan in chunk:
+                    if loan in pending:
+                        results[loan.name] = {"status": "Disbursed", "journal_entry": journal_entry,
+                            "outstanding_balance": loan.outstanding_balance}
+                    else:
+                        results[loan.name] = {"status": "Failed",
+                            "message": f"Loan {loan.name} was disbursed or changed status while the run was validating it"}
+
+            job.rows_affected = job.details["disbursed"]
+            update_job_progress(job, 5 + 95 * (start + len(chunk)) / len(eligible))
+
+
+def validate_disbursements(loan_names, results, approve=0):
+    """
+    Applies the SACCO Loan eligibility rules to every loan from batched lookups of loans,
+    guarantors and their capacity, members and the cached product catalog. Failures are written
+    to `results`; eligible loans are returned with their member and product attached.
+    """
+    loans = {l.name: l for l in frappe.db.get_all("SACCO Loan",
+        filters={"name": ["in", loan_names]},
+        fields=["name", "member", "loan_product", "loan_amount", "repayment_period", "status", "docstatus"])}
+
+    guarantors = {}
+    for g in frappe.db.sql("""
+        SELECT parent, guarantor_member, guarantee_amount, status FROM `tabSACCO Guarantor`
+        WHERE parenttype = 'SACCO Loan' AND parent IN %s
+    """, (tuple(loan_names),), as_dict=True):
+        guarantors.setdefault(g.parent, []).append(g)
+
+    limits = get_guarantee_limits()
+    capacity = get_guarantor_capacity([g.guarantor_member for rows in guarantors.values() for g in rows],
+        limits) if limits.enforce else {}
+
+    members = {m.name: m for m in frappe.db.get_all("SACCO Member",
+        filters={"name": ["in", list({l.member for l in loans.values()})]},
+        fields=MEMBER_FIELDS)} if loans else {}
+
+    products = get_product_catalog()["by_name"]
+    allowed = ("Approved", "Pending Approval") if approve else ("Approved",)
+
+    eligible = []
+    for name in loan_names:
+        loan = loans.get(name)
+        member = members.get(loan.member) if loan else None
+        product = products.get(loan.loan_product) if loan else None
+
+        if not loan:
+            error = f"Loan {name} not found"
+        elif loan.docstatus != 0:
+            error = f"Loan {name} has already been disbursed"
+        elif loan.status not in allowed:
+            error = f"Loan {name} must be '{' or '.join(allowed)}' to be disbursed. Current: {loan.status}"
+        elif not product:
+            error = f"Loan Product {loan.loan_product} not found"
+        else:
+            error = get_eligibility_error(loan, member, product, guarantors.get(name, []), capacity, limits)
+            if not error and not member.savings_account:
+                error = f"Member {loan.member} does not have a linked Savings Account. Please update the member profile."
+
+        if error:
+            results[name] = {"status": "Failed", "message": error}
+            continue
+
+        # Later loans for the same member in this run see this one as active, and later
+        # loans sharing a guarantor see the capacity this one takes up
+        member.active_loan = name
+        for g in guarantors.get(name, []):
+            if g.guarantor_member in capacity and g.status != "Rejected":
+                capacity[g.guarantor_member].free_capacity -= flt(g.guarantee_amount)
+                capacity[g.guarantor_member].active_guarantees += 1
+        loan.member_doc = member
+        loan.product = product
+        eligible.append(loan)
+
+    return eligible
+
+
+def lock_pending_loans(loans):
+    """
+    Locks the chunk's loans until it commits and returns those still draft with the status they
+    were validated with. An overlapping run or a single disbursement of the same loan waits on
+    the lock, then finds the loan submitted.
+    """
+    current = {name: (docstatus, status) for name, docstatus, status in frappe.db.sql("""
+        SELECT name, docstatus, status FROM `tabSACCO Loan`
+        WHERE name IN %s
+        ORDER BY name
+        FOR UPDATE
+    """, (tuple(loan.name for loan in loans),))}
+    return [loan for loan in loans if current.get(loan.name) == (0, loan.status)]
+
+
+def post_disbursements(loans):
+    """
+    Disburses a chunk of validated loans: one Journal Entry crediting every member's savings,
+    one bulk insert of installment rows, and direct updates of the loans and members
+    without a per-loan document round-trip.
+    """
+    disbursement_date = getdate(nowdate())
+    now = now_datetime()
+    user = frappe.session.user
+
+    for loan in loans:
+        product = loan.product
+        loan.interest_rate = product.interest_rate
+        loan.interest_period = product.interest_period
+        loan.interest_method = product.interest_method
+        loan.repayment_period = cint(loan.repayment_period) or cint(product.max_repayment_period)
+        loan.quote = amortize(loan.loan_amount, loan.interest_rate, loan.repayment_period,
+            loan.interest_method, loan.interest_period)
+        loan.outstanding_balance = loan.quote["total_repayable"]
+
+    journal_entry = make_disbursement_journal_entry(loans, disbursement_date)
+
+    names = tuple(loan.name for loan in loans)
+    frappe.db.sql("DELETE FROM `tabSACCO Loan Installment` WHERE parenttype = 'SACCO Loan' AND parent IN %s", (names,))
+    frappe.db.bulk_insert("SACCO Loan Installment", fields=INSTALLMENT_FIELDS, values=[
+        (frappe.generate_hash(length=10), now, now, user, user, 1,
+            loan.name, "SACCO Loan", "installments", row["installment_no"],
+            row["installment_no"], add_months(disbursement_date, row["installment_no"]),
+            row["amount"], row["principal"], row["interest"], 0, 0, row["balance_after"], "Pending")
+        for loan in loans
+        for row in loan.quote["schedule"]
+    ])
+
+    for loan in loans:
+        # The guarantor rows are submitted with their loan
+        frappe.db.sql("""
+            UPDATE `tabSACCO Loan` l
+            LEFT JOIN `tabSACCO Guarantor` g ON g.parenttype = 'SACCO Loan' AND g.parent = l.name
+            SET l.docstatus = 1, l.status = 'Active', l.modified = %(now)s, l.modified_by = %(user)s,
+                l.interest_rate = %(interest_rate)s, l.interest_method = %(interest_method)s,
+                l.repayment_period = %(repayment_period)s,
+                l.monthly_installment = %(monthly_installment)s, l.total_interest = %(total_interest)s,
+                l.total_repayable = %(total_repayable)s, l.outstanding_balance = %(total_repayable)s,
+                l.disbursement_entry = %(journal_entry)s, l.next_installment_idx = 1,
+                g.docstatus = 1
+            WHERE l.name = %(name)s AND l.docstatus = 0
+        """, {
+            "name": loan.name, "now": now, "user": user, "journal_entry": journal_entry,
+            "interest_rate": loan.interest_rate, "interest_method": loan.interest_method,
+            "repayment_period": loan.repayment_period,
+            "monthly_installment": loan.quote["monthly_installment"],
+            "total_interest": loan.quote["total_interest"],
+            "total_repayable": loan.quote["total_repayable"]
+        })
+
+    # A loan that did not flip was submitted elsewhere: raise so the entry and balances roll back
+    flipped = frappe.db.count("SACCO Loan", {"name": ["in", names], "docstatus": 1, "disbursement_entry": journal_entry})
+    if flipped != len(loans):
+        frappe.throw(f"Only {flipped} of {len(loans)} loans could be submitted; the chunk was not disbursed.")
+
+    frappe.db.sql("""
+        UPDATE `tabSACCO Member` m
+        INNER JOIN `tabSACCO Loan` l ON l.member = m.name
+        SET m.active_loan = l.name
+        WHERE l.name IN %s
+    """, (names,))
+
+    totals = {}
+    for loan in loans:
+        totals[loan.member] = totals.get(loan.member, 0) + flt(loan.loan_amount)
+    for member, amount in totals.items():
+        # Disbursement credits savings and raises the loan receivable by the same amount
+        update_member_balances(member, savings=amount, loan=amount)
+
+    update_exposure_for_loans(names)
+    # The loans are submitted without their controllers, so their hooks do not run
+    refresh_activity_rollups("Disbursements", [disbursement_date])
+    return journal_entry
+
+
+def make_disbursement_journal_entry(loans, posting_date):
+    """Dr each member's loan account, Cr their savings account, one line pair per loan."""
+    je = frappe.new_doc("Journal Entry")
+    je.posting_date = posting_date
+    je.company = get_default_company()
+    je.voucher_type = "Journal Entry"
+    je.user_remark = f"Batch Loan Disbursement ({len(loans)} loans: {loans[0].name} - {loans[-1].name})"
+
+    for loan in loans:
+        member = loan.member_doc
+        je.append("accounts", {
+            "account": member.ledger_account,
+            "debit_in_account_currency": loan.loan_amount,
+            "credit_in_account_currency": 0,
+            "party_type": "Customer",
+            "party": member.customer_link,
+            "user_remark": f"Loan Disbursement to Savings: {loan.name}"
+        })
+        je.append("accounts", {
+            "account": member.savings_account,
+            "debit_in_account_currency": 0,
+            "credit_in_account_currency": loan.loan_amount,
+            "is_advance": "Yes",
+            "user_remark": f"Loan Disbursement to Savings: {loan.name}"
+        })
+
+    je.save(ignore_permissions=True)
+    je.submit()
+    return je.name
@@ -0,0 +1,232 @@
+import hashlib
+import json
+
+import frappe
+from frappe.utils import add_months, cint, flt, getdate, nowdate
+
+from sacc_app.amortization import amortize, amortize_many
+from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_product_catalog
+
+# Upper bound on amount x period combinations per call
+MAX_QUOTES = 2000
+
+# Simulations are keyed by the loan's modified timestamp, so any change to the loan
+# naturally misses; the TTL only bounds how long abandoned results occupy Redis
+SIMULATION_TTL = 15 * 60
+MAX_EVENTS = 20
+LUMP_SUM_MODES = ("reduce_installment", "reduce_term")
+
+
+@frappe.whitelist(allow_guest=True)
+def get_loan_quotes(loan_product, amounts, periods=None, include_schedule=1):
+    """
+    Prices many loan scenarios for a product in one call without creating loan documents.
+
+    amounts / periods accept a JSON list or a comma-separated string. Periods default to the
+    product's maximum repayment period. Returns one quote per amount x period with the
+    monthly installment, total interest, total repayable and (optionally) the full schedule.
+    """
+    product = get_product_catalog()["by_name"].get(loan_product)
+    if not product:
+        return {"status": "error", "message": f"Loan product {loan_product} not found"}
+
+    amounts = [flt(a) for a in parse_list(amounts)]
+    periods = [cint(p) for p in parse_list(periods)] or [cint(product.max_repayment_period)]
+
+    if not amounts:
+        return {"status": "error", "message": "At least one amount is required"}
+    if len(amounts) * len(periods) > MAX_QUOTES:
+        return {"status": "error", "message": f"Too many scenarios. Maximum is {MAX_QUOTES} per call."}
+
+    quotes = amortize_many(amounts, periods, product.interest_rate, product.interest_method,
+        product.interest_period, with_schedule=cint(include_schedule))
+
+    for quote in quotes:
+        quote["monthly_installment"] = flt(quote["monthly_installment"], 2)
+        quote["total_interest"] = flt(quote["total_interest"], 2)
+        quote["total_repayable"] = flt(quote["total_repayable"], 2)
+        quote["warnings"] = get_product_warnings(product, quote)
+
+    return {
+        "status": "success",
+        "message": f"{len(quotes)} quote(s) generated",
+        "data": {
+            "loan_product": loan_product,
+            "interest_rate": product.interest_rate,
+            "interest_period": product.interest_period,
+            "interest_method": product.interest_method,
+            "quotes": quotes
+        }
+    }
+
+
+def parse_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            return json.loads(value)
+        return [v for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def get_product_warnings(product, quote):
+    warnings = []
+    if product.min_loan_amount and quote["loan_amount"] < flt(product.min_loan_amount):
+        warnings.append(f"Below the minimum loan amount ({product.min_loan_amount})")
+    if product.max_loan_amount and quote["loan_amount"] > flt(product.max_loan_amount):
+        warnings.append(f"Exceeds the maximum loan amount ({product.max_loan_amount})")
+    if product.max_repayment_period and quote["repayment_period"] > cint(product.max_repayment_period):
+        warnings.append(f"Exceeds the maximum repayment period ({product.max_repayment_period} months)")
+    return warnings
+
+
+@frappe.whitelist(allow_guest=True)
+def simulate_loan(loan_id, events=None, include_schedule=1):
+    """
+    Read-only what-if for an active loan. Starts from the remaining principal and unpaid
+    installments and applies hypothetical events in order:
+
+        {"type": "lump_sum", "amount": 5000, "mode": "reduce_installment" | "reduce_term"}
+        {"type": "term_change", "months": 6}            (negative to shorten)
+        {"type": "rate_change", "interest_rate": 1.5}
+
+    Returns the current position, the simulated schedule and the change in total cost.
+    Nothing is saved; results are memoized per loan version and events.
+    """
+    loan = frappe.db.get_value("SACCO Loan", loan_id,
+        ["name", "docstatus", "status", "loan_product", "loan_amount", "interest_rate", "interest_method",
+            "monthly_installment", "outstanding_balance", "principal_paid", "next_installment_idx", "modified"],
+        as_dict=True)
+    if not loan:
+        return {"status": "error", "message": f"Loan {loan_id} not found"}
+    if loan.docstatus != 1 or loan.status not in ("Active", "Defaulted"):
+        return {"status": "error", "message": f"Only disbursed, active loans can be simulated. Current: {loan.status}"}
+
+    try:
+        events = parse_events(events)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    events_hash = hashlib.sha1(json.dumps(events, sort_keys=True).encode()).hexdigest()[:16]
+    key = f"sacc_app:loan_simulation:{loan.name}:{loan.modified}:{events_hash}"
+    result = frappe.cache().get_value(key)
+    cached = result is not None
+    if not cached:
+        result = run_simulation(loan, events)
+        frappe.cache().set_value(key, result, expires_in_sec=SIMULATION_TTL)
+
+    result = dict(result, cached=cached)
+    if not cint(include_schedule):
+        result["simulated"] = {k: v for k, v in result["simulated"].items() if k != "schedule"}
+
+    return {"status": "success", "message": f"Simulated {len(events)} event(s)", "data": result}
+
+
+def parse_events(events):
+    """Validates and normalizes simulation events; raises ValueError with a readable message."""
+    events = parse_list(events) if events else []
+    if len(events) > MAX_EVENTS:
+        raise ValueError(f"Too many events. Maximum is {MAX_EVENTS}.")
+
+    normalized = []
+    for idx, event in enumerate(events, start=1):
+        event = frappe._dict(event) if isinstance(event, dict) else frappe._dict()
+        if event.type == "lump_sum":
+            mode = event.mode or "reduce_installment"
+            if flt(event.amount) <= 0:
+                raise ValueError(f"Event {idx}: lump_sum amount must be greater than zero")
+            if mode not in LUMP_SUM_MODES:
+                raise ValueError(f"Event {idx}: mode must be one of {', '.join(LUMP_SUM_MODES)}")
+            normalized.append({"type": "lump_sum", "amount": flt(event.amount, 2), "mode": mode})
+        elif event.type == "term_change":
+            if not cint(event.months):
+                raise ValueError(f"Event {idx}: term_change months must be a non-zero whole number")
+            normalized.append({"type": "term_change", "months": cint(event.months)})
+        elif event.type == "rate_change":
+            if event.interest_rate is None or flt(event.interest_rate) < 0:
+                raise ValueError(f"Event {idx}: rate_change interest_rate must be zero or more")
+            normalized.append({"type": "rate_change", "interest_rate": flt(event.interest_rate)})
+        else:
+            raise ValueError(f"Event {idx}: type must be lump_sum, term_change or rate_change")
+    return normalized
+
+
+def run_simulation(loan, events):
+    """Re-amortizes the remaining principal after `events`; the loan itself is never touched."""
+    product = get_product_catalog()["by_name"].get(loan.loan_product) or frappe._dict()
+    interest_period = product.interest_period or "Monthly"
+
+    unpaid = frappe.db.sql("""
+        SELECT installment_no, due_date, principal, interest, principal_paid, interest_paid
+        FROM `tabSACCO Loan Installment`
+        WHERE parent = %s AND parenttype = 'SACCO Loan' AND installment_no >= %s AND status != 'Paid'
+        ORDER BY installment_no
+    """, (loan.name, cint(loan.next_installment_idx) or 1), as_dict=True)
+
+    principal_left = max(0, flt(loan.loan_amount) - flt(loan.principal_paid))
+    term = len(unpaid) or 1
+    rate = flt(loan.interest_rate)
+    first_due = getdate(unpaid[0].due_date) if unpaid else getdate(add_months(nowdate(), 1))
+    current = {
+        "remaining_principal": flt(principal_left, 2),
+        "remaining_interest": flt(sum(max(0, flt(r.interest) - flt(r.interest_paid)) for r in unpaid), 2),
+        "outstanding_balance": flt(loan.outstanding_balance, 2),
+        "remaining_term": len(unpaid),
+        "monthly_installment": flt(loan.monthly_installment, 2),
+        "interest_rate": rate,
+        "next_due_date": first_due
+    }
+
+    lump_sums = 0
+    keep_installment = False
+    for event in events:
+        if event["type"] == "lump_sum":
+            amount = min(event["amount"], principal_left)
+            principal_left -= amount
+            lump_sums += amount
+            keep_installment = event["mode"] == "reduce_term"
+        elif event["type"] == "term_change":
+            term = max(1, term + event["months"])
+            keep_installment = False
+        elif event["type"] == "rate_change":
+            rate = event["interest_rate"]
+
+    if keep_installment:
+        # Same installment, fewer months: the shortest term the current installment still covers
+        term = next((n for n in range(1, term + 1)
+            if amortize(principal_left, rate, n, loan.interest_method, interest_period,
+                with_schedule=False)["monthly_installment"] <= flt(loan.monthly_installment) + 0.01), term)
+
+    quote = amortize(principal_left, rate, term, loan.interest_method, interest_period)
+    for row in quote["schedule"]:
+        row["due_date"] = add_months(first_due, row["installment_no"] - 1)
+
+    simulated = {
+        "remaining_principal": flt(principal_left, 2),
+        "lump_sum_total": flt(lump_sums, 2),
+        "remaining_term": term,
+        "monthly_installment": flt(quote["monthly_installment"], 2),
+        "total_interest": flt(quote["total_interest"], 2),
+        "total_repayable": flt(quote["total_repayable"], 2),
+        "interest_rate": rate,
+        "schedule": quote["schedule"]
+    }
+
+    current_cost = flt(current["remaining_principal"] + current["remaining_interest"], 2)
+    simulated_cost = flt(lump_sums + quote["total_repayable"], 2)
+    return {
+        "loan": loan.name,
+        "events": events,
+        "current": current,
+        "simulated": simulated,
+        "impact": {
+            "current_total_cost": current_cost,
+            "simulated_total_cost": simulated_cost,
+            "cost_difference": flt(simulated_cost - current_cost, 2),
+            "interest_difference": flt(simulated["total_interest"] - current["remaining_interest"], 2),
+            "term_difference": term - current["remaining_term"],
+            "installment_difference": flt(simulated["monthly_installment"] - current["monthly_installment"], 2)
+        }
+    }
@@ -221,7 +221,6 @@ def get_member_full_details(member_id):
         return {"status": "error", "message": f"Member {member_id} not found"}
         
     doc = frappe.get_doc("SACCO Member", member_id)
-    doc.get_balances() # Ensure balances are recalculated from GL
     
     # 1. Registration details including images
     member_data = doc.as_dict()
@@ -242,32 +241,22 @@ def get_member_full_details(member_id):
         order_by="creation desc"
     )
     
-    # 4. Detailed Account Information with real-time balances
-    # We fetch balances directly from GL to ensure accuracy
-    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-    
+    # 4. Account Information
+    # Balances are maintained incrementally on submit/cancel; use recalculate_member_balances to repair
     accounts = []
     if doc.savings_account:
-        savings_balance = frappe.db.get_value("GL Entry", 
-            {"account": doc.savings_account, "company": company, "docstatus": 1}, 
-            "sum(credit - debit)") or 0
-            
         accounts.append({
             "account_id": doc.savings_account,
             "label": "Savings Account",
-            "balance": flt(savings_balance),
+            "balance": flt(doc.total_savings),
             "type": "Liability"
         })
         
     if doc.ledger_account:
-        loan_balance = frappe.db.get_value("GL Entry", 
-            {"account": doc.ledger_account, "company": company, "docstatus": 1}, 
-            "sum(debit - credit)") or 0
-            
         accounts.append({
             "account_id": doc.ledger_account,
             "label": "Loan Ledger Account",
-            "balance": flt(loan_balance),
+            "balance": flt(doc.total_loan_outstanding),
             "type": "Asset"
         })
     
@@ -284,3 +273,28 @@ def get_member_full_details(member_id):
             }
         }
     }
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def recalculate_member_balances(member_id=None):
+    """
+    Repair path: re-sums stored member totals from the GL.
+    With a member_id the member is fixed immediately; otherwise all members are rebuilt in the background.
+    """
+    from sacc_app.sacco.doctype.sacco_member.sacco_member import refresh_member_balances
+
+    if member_id:
+        if not frappe.db.exists("SACCO Member", member_id):
+            return {"status": "error", "message": f"Member {member_id} not found"}
+
+        refresh_member_balances([member_id])
+        balances = frappe.db.get_value("SACCO Member", member_id,
+            ["total_savings", "total_loan_outstanding"], as_dict=True)
+        return {"status": "success", "message": "Member balances recalculated", "data": balances}
+
+    frappe.enqueue(
+        "sacc_app.sacco.doctype.sacco_member.sacco_member.refresh_member_balances",
+        members=frappe.db.get_all("SACCO Member", pluck="name"),
+        queue="long",
+        timeout=3600
+    )
+    return {"status": "success", "message": "Balance recalculation for all members queued"}
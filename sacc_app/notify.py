@@ -1,104 +1,283 @@
+import json
+import smtplib
+
 import frappe
 from frappe import _
+from frappe.utils import add_to_date, cint, get_url, now_datetime
+
+OUTBOX = "SACCO Notification Outbox"
+NOTIFICATION_TEMPLATE = "templates/emails/sacco_notification.html"
+
+# Outbox rows rendered and sent per SMTP session
+DISPATCH_BATCH_SIZE = 100
+MAX_ATTEMPTS = 3
+
+# Rows claimed by a dispatcher that died before settling them go back to Pending after this long
+CLAIM_TIMEOUT_MINUTES = 30
+
+# Compiled once per worker process
+_notification_template = None
+
 
 def send_member_email(member_id_or_email, subject, message, template=None, args=None, recipient_name=None):
     """
     Standardizes email delivery to SACCO members or users.
     Supports standard Frappe Email Templates.
+
+    The email is written to the notification outbox in the caller's transaction and
+    delivered by a background dispatcher after commit, so a rolled-back posting sends nothing.
+    """
+    queue_member_emails([{
+        "recipient": member_id_or_email,
+        "subject": subject,
+        "message": message,
+        "template": template,
+        "args": args,
+        "recipient_name": recipient_name
+    }])
+
+
+def queue_member_emails(notifications):
     """
-    if not member_id_or_email:
+    Bulk form of send_member_email: resolves all recipients with batched lookups
+    and writes every outbox row with a single insert.
+    """
+    notifications = [frappe._dict(n) for n in notifications if n.get("recipient")]
+    if not notifications:
         return
 
-    email = None
-    member = None
-    
-    if "@" in member_id_or_email:
-        email = member_id_or_email
-        # Try to find corresponding member
-        member_id = frappe.db.get_value("SACCO Member", {"email": email}, "name")
-        if member_id:
-            member = frappe.get_doc("SACCO Member", member_id)
-    else:
-        if frappe.db.exists("SACCO Member", member_id_or_email):
-            member = frappe.get_doc("SACCO Member", member_id_or_email)
-            email = member.email
-
-    if not email:
+    keys = {n.recipient for n in notifications}
+    emails = [k for k in keys if "@" in k]
+    member_ids = [k for k in keys if "@" not in k]
+
+    fields = ["name", "email", "first_name", "member_name"]
+    members = {}
+    if member_ids:
+        for m in frappe.db.get_all("SACCO Member", filters={"name": ["in", member_ids]}, fields=fields):
+            members[m.name] = m
+    if emails:
+        for m in frappe.db.get_all("SACCO Member", filters={"email": ["in", emails]}, fields=fields):
+            members[m.email] = m
+
+    user_names = {}
+    unmatched = [e for e in emails if e not in members]
+    if unmatched:
+        user_names = dict(frappe.db.get_all("User",
+            filters={"name": ["in", unmatched]}, fields=["name", "first_name"], as_list=True))
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for n in notifications:
+        member = members.get(n.recipient)
+        email = member.email if member else (n.recipient if "@" in n.recipient else None)
+        if not email:
+            continue
+
+        # Standard fallback for name
+        if member:
+            salutation = member.first_name or member.member_name or n.recipient_name or "Member"
+        else:
+            salutation = n.recipient_name or user_names.get(email) or "User"
+
+        values.append((
+            frappe.generate_hash(length=10), now, now, user, user,
+            email, member.name if member else None, salutation, n.subject, "Pending", 0,
+            n.message, n.template, json.dumps(n.args, default=str) if n.args else None
+        ))
+
+    if not values:
         return
-    
+
+    frappe.db.bulk_insert(OUTBOX, fields=[
+        "name", "creation", "modified", "owner", "modified_by",
+        "recipient", "member", "salutation", "subject", "status", "attempts",
+        "message", "template", "template_args"
+    ], values=values)
+
+    # GET requests are not committed by default; outbox rows must still be
+    frappe.local.flags.commit = True
+    schedule_dispatch()
+
+
+def schedule_dispatch():
+    """Enqueues the dispatcher once per transaction, only if it commits."""
+    if frappe.flags.sacc_notification_dispatch_scheduled:
+        return
+    frappe.flags.sacc_notification_dispatch_scheduled = True
+
+    frappe.enqueue(
+        "sacc_app.notify.dispatch_notifications",
+        queue="short",
+        job_id="sacc_app:notification_dispatch",
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+
+
+def dispatch_notifications(batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Background job (also run by the scheduler): sends pending outbox rows oldest first,
+    one SMTP session per batch, committing status after each batch. Each batch is claimed
+    before it is sent, so dispatchers running at the same time never send the same row.
+    """
+    release_stale_claims()
+    while True:
+        rows = claim_batch(batch_size)
+        if not rows:
+            return
+
+        complete = send_batch(rows)
+        frappe.db.commit()
+
+        # Stop on connection trouble or a short batch; the scheduler picks up the rest
+        if not complete or len(rows) < batch_size:
+            return
+
+
+def claim_batch(batch_size):
+    """
+    Marks the oldest pending rows Sending and commits, so they are this dispatcher's alone.
+    Rows another dispatcher is claiming at the same moment are skipped, not waited for.
+    """
+    names = frappe.db.sql_list(f"""
+        SELECT name FROM `tab{OUTBOX}`
+        WHERE status = 'Pending'
+        ORDER BY creation
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    """, (batch_size,))
+    if not names:
+        frappe.db.commit()
+        return []
+
+    frappe.db.sql(f"""
+        UPDATE `tab{OUTBOX}` SET status = 'Sending', modified = %s WHERE name IN %s
+    """, (now_datetime(), tuple(names)))
+    frappe.db.commit()
+
+    return frappe.db.get_all(OUTBOX,
+        filters={"name": ["in", names]},
+        fields=["name", "recipient", "member", "salutation", "subject", "message",
+            "template", "template_args", "attempts"],
+        order_by="creation asc")
+
+
+def release_stale_claims():
+    frappe.db.sql(f"""
+        UPDATE `tab{OUTBOX}` SET status = 'Pending'
+        WHERE status = 'Sending' AND modified < %s
+    """, (add_to_date(now_datetime(), minutes=-CLAIM_TIMEOUT_MINUTES),))
+    frappe.db.commit()
+
+
+def send_batch(rows):
+    """Returns False when delivery stopped early and remaining rows were left pending."""
+    context = get_branding_context()
+    sent, failed = [], {}
+    complete = True
+
+    if frappe.flags.mute_emails or frappe.flags.in_test:
+        update_outbox(rows, [r.name for r in rows], failed)
+        return True
+
+    from frappe.email.doctype.email_account.email_account import EmailAccount
+    from frappe.email.email_body import get_email
+
+    email_account = EmailAccount.find_outgoing(_raise_error=False)
+    if not email_account:
+        update_outbox(rows, sent, failed)
+        return False
+
+    smtp = email_account.get_smtp_server()
+    try:
+        for row in rows:
+            try:
+                subject, html = render_notification(row, context)
+                email = get_email([row.recipient], sender=email_account.default_sender,
+                    subject=subject, formatted=html, email_account=email_account)
+                smtp.session.sendmail(email_account.email_id, [row.recipient], email.as_string())
+                sent.append(row.name)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError):
+                complete = False
+                break
+            except Exception as e:
+                failed[row.name] = str(e)
+    finally:
+        smtp.quit()
+
+    update_outbox(rows, sent, failed)
+    return complete
+
+
+def update_outbox(rows, sent, failed):
+    """Settles a claimed batch: sent rows, failed rows by attempts, and the rest back to Pending."""
+    if sent:
+        frappe.db.sql(f"""
+            UPDATE `tab{OUTBOX}`
+            SET status = 'Sent', sent_on = %s, attempts = attempts + 1, error = NULL
+            WHERE name IN %s
+        """, (now_datetime(), tuple(sent)))
+
+    attempts = {r.name: cint(r.attempts) + 1 for r in rows}
+    for name, error in failed.items():
+        frappe.db.set_value(OUTBOX, name, {
+            "status": "Failed" if attempts[name] >= MAX_ATTEMPTS else "Pending",
+            "attempts": attempts[name],
+            "error": error
+        }, update_modified=False)
+
+    # Left unsent when delivery stopped early
+    settled = set(sent) | set(failed)
+    unsent = [r.name for r in rows if r.name not in settled]
+    if unsent:
+        frappe.db.sql(f"""
+            UPDATE `tab{OUTBOX}` SET status = 'Pending' WHERE name IN %s AND status = 'Sending'
+        """, (tuple(unsent),))
+
+
+def get_branding_context():
+    from sacc_app.account_map import get_default_company
+
     # Get Company Name for branding
-    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+    company = get_default_company()
     company_name = frappe.db.get_value("Company", company, "company_name") or company or "SACCO MANAGEMENT"
-    
-    # Standard fallback for name
-    salutation_name = recipient_name or "Member"
-    if member:
-        salutation_name = member.first_name or member.member_name or salutation_name
-    elif not recipient_name:
-        # Try to find user name
-        salutation_name = frappe.db.get_value("User", email, "first_name") or "User"
-        
-    if template:
+
+    # Portal URL (Strip port if present for production-like URL)
+    site_url = get_url()
+    if ":8000" in site_url:
+        site_url = site_url.replace(":8000", "")
+
+    return {"company_name": company_name, "site_url": site_url, "year": now_datetime().year}
+
+
+def get_notification_template():
+    global _notification_template
+    if _notification_template is None:
+        _notification_template = frappe.get_jenv().get_template(NOTIFICATION_TEMPLATE)
+    return _notification_template
+
+
+def render_notification(row, context):
+    """Returns (subject, html) for an outbox row wrapped in the branded template."""
+    subject, message = row.subject, row.message
+
+    if row.template:
         # If a template is provided, use Frappe's rendering logic
         from frappe.email.doctype.email_template.email_template import get_email_template
-        
+
         email_args = {
-            "first_name": salutation_name,
-            "company_name": company_name
+            "first_name": row.salutation,
+            "company_name": context["company_name"]
         }
-        if member:
-            email_args["doc"] = member
-        if args:
-            email_args.update(args)
-            
-        template_data = get_email_template(template, email_args)
+        if row.member:
+            email_args["doc"] = frappe.get_doc("SACCO Member", row.member)
+        if row.template_args:
+            email_args.update(json.loads(row.template_args))
+
+        template_data = get_email_template(row.template, email_args)
         subject = template_data.get("subject", subject)
         message = template_data.get("message", message)
 
-    # Portal URL (Strip port if present for production-like URL)
-    from frappe.utils import get_url
-    site_url = get_url()
-    if ":8000" in site_url:
-        site_url = site_url.replace(":8000", "")
-    
-    # Standard header/footer for brand consistency
-    full_message = f"""
-    <div style="margin:0;padding:0;font-family:'Segoe UI',Tahoma,Geneva,Verdana,sans-serif;background-color:#f4f7f9;">
-        <div style="max-width:600px;margin:20px auto;background-color:#ffffff;border-radius:8px;overflow:hidden;box-shadow:0 4px 10px rgba(0,0,0,0.05);">
-            <!-- Header -->
-            <div style="background: linear-gradient(135deg, #1a73e8 0%, #0d47a1 100%); padding: 30px 20px; text-align: center;">
-                <h1 style="color: #ffffff; margin: 0; font-size: 24px; font-weight: 600; letter-spacing: 1px;">{company_name.upper()}</h1>
-            </div>
-            
-            <!-- Content -->
-            <div style="padding: 40px 30px; color: #3c4043; line-height: 1.6;">
-                <h2 style="color: #1a73e8; margin-top: 0;">Hello, {salutation_name}!</h2>
-                <div style="font-size: 16px;">
-                    {message}
-                </div>
-                
-                <!-- Optional CTA -->
-                <div style="margin-top: 30px; text-align: center;">
-                    <a href="{site_url}" style="background-color: #1a73e8; color: #ffffff; padding: 12px 25px; text-decoration: none; border-radius: 5px; font-weight: 500; display: inline-block;">Login to Portal</a>
-                </div>
-            </div>
-            
-            <!-- Footer -->
-            <div style="background-color: #f8f9fa; padding: 20px; text-align: center; border-top: 1px solid #e8eaed;">
-                <p style="margin: 0; color: #70757a; font-size: 14px;">
-                    &copy; 2026 {company_name}. All rights reserved.
-                </p>
-                <p style="margin: 5px 0 0; color: #70757a; font-size: 12px;">
-                    This is an automated notification regarding your account.
-                </p>
-            </div>
-        </div>
-    </div>
-    """
-    
-    frappe.sendmail(
-        recipients=[email],
-        subject=subject,
-        message=full_message,
-        delayed=False # Send immediately for financial/auth alerts
-    )
+    html = get_notification_template().render(dict(context, salutation=row.salutation, message=message or ""))
+    return subject, html
@@ -0,0 +1,6 @@
+from sacc_app.ledger import rebuild_account_balances
+
+
+def execute():
+	"""Builds SACCO Account Daily Balance from the existing GL and starts the catch-up watermark."""
+	rebuild_account_balances()
@@ -0,0 +1,6 @@
+from sacc_app.rollups import rebuild_activity_rollups
+
+
+def execute():
+	"""Fills SACCO Activity Rollup from the savings, loans, repayments, welfare and expenses already posted."""
+	rebuild_activity_rollups()
\ No newline at end of file
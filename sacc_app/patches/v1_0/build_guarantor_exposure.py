@@ -0,0 +1,6 @@
+from sacc_app.guarantors import rebuild_guarantor_exposure
+
+
+def execute():
+	"""Fills SACCO Guarantor Exposure from the guarantors of existing loans."""
+	rebuild_guarantor_exposure()
@@ -0,0 +1,6 @@
+from sacc_app.transaction_feed import rebuild_transaction_feed
+
+
+def execute():
+	"""Fills SACCO Transaction Feed from the Journal Entries and Payment Entries already in the GL."""
+	rebuild_transaction_feed()
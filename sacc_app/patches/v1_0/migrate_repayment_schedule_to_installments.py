@@ -0,0 +1,67 @@
+import json
+
+import frappe
+from frappe.utils import flt, getdate, now_datetime
+
+
+def execute():
+	"""
+	Moves the JSON repayment_schedule of existing loans into SACCO Loan Installment rows.
+	Amounts already paid on the loan are applied to installments oldest first.
+	"""
+	if not frappe.db.has_column("SACCO Loan", "repayment_schedule"):
+		return
+
+	migrated = set(frappe.db.sql_list("""
+		SELECT DISTINCT parent FROM `tabSACCO Loan Installment` WHERE parenttype = 'SACCO Loan'
+	"""))
+
+	loans = frappe.db.sql("""
+		SELECT name, repayment_schedule, principal_paid, interest_paid
+		FROM `tabSACCO Loan`
+		WHERE IFNULL(repayment_schedule, '') != ''
+	""", as_dict=True)
+
+	now = now_datetime()
+	fields = [
+		"name", "creation", "modified", "owner", "modified_by", "docstatus",
+		"parent", "parenttype", "parentfield", "idx",
+		"installment_no", "due_date", "amount", "principal", "interest",
+		"principal_paid", "interest_paid", "balance_after", "status"
+	]
+
+	for loan in loans:
+		if loan.name in migrated:
+			continue
+		try:
+			schedule = json.loads(loan.repayment_schedule)
+		except ValueError:
+			continue
+
+		docstatus = frappe.db.get_value("SACCO Loan", loan.name, "docstatus")
+		principal_left, interest_left = flt(loan.principal_paid), flt(loan.interest_paid)
+		values = []
+
+		for idx, entry in enumerate(schedule, start=1):
+			principal, interest = flt(entry.get("principal")), flt(entry.get("interest"))
+			principal_paid = min(principal, principal_left)
+			interest_paid = min(interest, interest_left)
+			principal_left -= principal_paid
+			interest_left -= interest_paid
+
+			if principal_paid >= principal - 0.01 and interest_paid >= interest - 0.01:
+				status = "Paid"
+			elif principal_paid or interest_paid:
+				status = "Partially Paid"
+			else:
+				status = "Pending"
+
+			values.append((
+				frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", docstatus,
+				loan.name, "SACCO Loan", "installments", idx,
+				idx, getdate(entry.get("payment_date")), flt(entry.get("amount")), principal, interest,
+				principal_paid, interest_paid, flt(entry.get("balance_after")), status
+			))
+
+		if values:
+			frappe.db.bulk_insert("SACCO Loan Installment", fields=fields, values=values)
@@ -0,0 +1,21 @@
+import frappe
+
+
+def execute():
+	"""
+	Seeds each installment's accrued interest. Installments already due accrued in full; the
+	current one holds the loan's accrued balance on top of what its repayments settled.
+	"""
+	frappe.db.sql("""
+		UPDATE `tabSACCO Loan Installment` inst
+		INNER JOIN `tabSACCO Loan` loan ON loan.name = inst.parent AND inst.parenttype = 'SACCO Loan'
+		LEFT JOIN `tabSACCO Loan Installment` prev ON prev.parent = inst.parent AND prev.parenttype = 'SACCO Loan'
+			AND prev.installment_no = inst.installment_no - 1
+		SET inst.interest_accrued = CASE
+			WHEN inst.due_date < CURDATE() THEN inst.interest
+			WHEN IFNULL(prev.due_date, DATE_SUB(inst.due_date, INTERVAL 1 MONTH)) < CURDATE()
+				THEN LEAST(inst.interest, inst.interest_paid + loan.accrued_interest)
+			ELSE 0
+		END
+		WHERE loan.docstatus = 1
+	""")
@@ -0,0 +1,28 @@
+import frappe
+
+from sacc_app.rollups import refresh_activity_rollups
+
+DISBURSEMENT_REMARK = "Loan Disbursement to Savings: "
+
+
+def execute():
+	"""
+	Links loans disbursed before disbursement_entry was stored to their entry, found by its
+	remark as SACCO Loan.on_cancel does, and re-sums the disbursement rollups of those days.
+	"""
+	entries = frappe.db.sql("""
+		SELECT l.name, je.name AS journal_entry, je.posting_date
+		FROM `tabSACCO Loan` l
+		INNER JOIN (
+			SELECT name, posting_date, SUBSTRING(user_remark, %(offset)s) AS loan
+			FROM `tabJournal Entry`
+			WHERE docstatus = 1 AND user_remark LIKE %(pattern)s
+		) je ON je.loan = l.name
+		WHERE l.docstatus = 1 AND IFNULL(l.disbursement_entry, '') = ''
+	""", {"offset": len(DISBURSEMENT_REMARK) + 1, "pattern": f"{DISBURSEMENT_REMARK}%"}, as_dict=True)
+
+	for row in entries:
+		frappe.db.set_value("SACCO Loan", row.name, "disbursement_entry", row.journal_entry, update_modified=False)
+
+	# The rollups may already have been built without these loans
+	refresh_activity_rollups("Disbursements", [row.posting_date for row in entries])
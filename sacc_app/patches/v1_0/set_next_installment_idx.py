@@ -0,0 +1,16 @@
+import frappe
+
+
+def execute():
+	"""Points each loan's allocation cursor at its oldest installment not yet fully paid."""
+	frappe.db.sql("""
+		UPDATE `tabSACCO Loan` loan
+		INNER JOIN (
+			SELECT parent,
+				IFNULL(MIN(CASE WHEN status != 'Paid' THEN installment_no END), MAX(installment_no) + 1) AS next_idx
+			FROM `tabSACCO Loan Installment`
+			WHERE parenttype = 'SACCO Loan'
+			GROUP BY parent
+		) inst ON inst.parent = loan.name
+		SET loan.next_installment_idx = inst.next_idx
+	""")
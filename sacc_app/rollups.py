@@ -0,0 +1,234 @@
+"""
+Activity rollups.
+
+SACCO Activity Rollup holds the amount and count of each kind of activity per day and per
+month: savings deposits and withdrawals, loan repayments and disbursements, welfare
+contributions and withdrawals, and expenses by expense account. When a document is submitted
+or cancelled the days it touches are re-summed from its source table and their months from
+those days, so a trend over any range is one grouped read of a few rollup rows instead of a
+scan of the savings, loan and GL tables per period shown.
+"""
+
+import frappe
+from frappe.utils import add_days, add_months, flt, get_first_day, get_last_day, getdate
+
+from sacc_app.jobs import track_job_run
+
+# Per metric: the query summing its source per day, and the date column `{days}` filters on.
+# Category and company are never NULL, so every bucket has exactly one row under the unique key.
+METRIC_SOURCES = {
+	"Deposits": ("""
+		SELECT posting_date AS period_start, '' AS category, '' AS company,
+			SUM(amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Savings`
+		WHERE docstatus = 1 AND type = 'Deposit' AND {days}
+		GROUP BY posting_date
+	""", "posting_date"),
+	"Withdrawals": ("""
+		SELECT posting_date AS period_start, '' AS category, '' AS company,
+			SUM(amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Savings`
+		WHERE docstatus = 1 AND type = 'Withdrawal' AND {days}
+		GROUP BY posting_date
+	""", "posting_date"),
+	"Repayments": ("""
+		SELECT payment_date AS period_start, '' AS category, '' AS company,
+			SUM(payment_amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Loan Repayment`
+		WHERE docstatus = 1 AND {days}
+		GROUP BY payment_date
+	""", "payment_date"),
+	# A loan is disbursed on the posting date of its disbursement entry
+	"Disbursements": ("""
+		SELECT je.posting_date AS period_start, '' AS category, '' AS company,
+			SUM(l.loan_amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Loan` l
+		INNER JOIN `tabJournal Entry` je ON je.name = l.disbursement_entry
+		WHERE l.docstatus = 1 AND {days}
+		GROUP BY je.posting_date
+	""", "je.posting_date"),
+	"Welfare Contributions": ("""
+		SELECT posting_date AS period_start, '' AS category, '' AS company,
+			SUM(contribution_amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Welfare`
+		WHERE docstatus = 1 AND type = 'Contribution' AND {days}
+		GROUP BY posting_date
+	""", "posting_date"),
+	"Welfare Withdrawals": ("""
+		SELECT posting_date AS period_start, '' AS category, '' AS company,
+			SUM(contribution_amount) AS amount, COUNT(*) AS entry_count
+		FROM `tabSACCO Welfare`
+		WHERE docstatus = 1 AND type = 'Withdrawal' AND {days}
+		GROUP BY posting_date
+	""", "posting_date"),
+	"Expenses": ("""
+		SELECT gle.posting_date AS period_start, gle.account AS category, gle.company,
+			SUM(gle.debit) - SUM(gle.credit) AS amount, COUNT(DISTINCT gle.voucher_no) AS entry_count
+		FROM `tabGL Entry` gle
+		INNER JOIN `tabAccount` acc ON acc.name = gle.account
+		WHERE gle.is_cancelled = 0 AND acc.root_type = 'Expense' AND {days}
+		GROUP BY gle.posting_date, gle.account, gle.company
+	""", "gle.posting_date")
+}
+
+# A metric's months, summed from its day rows
+MONTH_SOURCE = """
+	SELECT DATE_FORMAT(period_start, '%%Y-%%m-01') AS period_start, category, company,
+		SUM(amount) AS amount, SUM(entry_count) AS entry_count
+	FROM `tabSACCO Activity Rollup`
+	WHERE period_type = 'Day' AND metric = %(metric)s AND {days}
+	GROUP BY DATE_FORMAT(period_start, '%%Y-%%m-01'), category, company
+"""
+
+# Per granularity: the rollup rows it reads, the SQL that maps their period_start to the start of
+# the bucket, and the step to the next bucket
+GRANULARITIES = {
+	"day": ("Day", "period_start", lambda d: add_days(d, 1)),
+	"week": ("Day", "DATE_SUB(period_start, INTERVAL WEEKDAY(period_start) DAY)", lambda d: add_days(d, 7)),
+	"month": ("Month", "period_start", lambda d: add_months(d, 1)),
+	"quarter": ("Month", "MAKEDATE(YEAR(period_start), 1) + INTERVAL (QUARTER(period_start) - 1) QUARTER", lambda d: add_months(d, 3)),
+	"year": ("Month", "MAKEDATE(YEAR(period_start), 1)", lambda d: add_months(d, 12))
+}
+
+# The metric each submittable document feeds; savings and welfare split on their type
+DOCUMENT_METRICS = {
+	"SACCO Savings": {"Deposit": "Deposits", "Withdrawal": "Withdrawals"},
+	"SACCO Welfare": {"Contribution": "Welfare Contributions", "Withdrawal": "Welfare Withdrawals"},
+	"SACCO Loan Repayment": "Repayments",
+	"SACCO Loan": "Disbursements"
+}
+
+
+def update_activity_rollups(doc, method=None):
+	"""doc_events hook on submit and cancel of the documents behind each metric."""
+	if doc.doctype in ("Journal Entry", "Payment Entry"):
+		# Cancelling keeps the original posting dates, so the same days are re-summed either way
+		days = frappe.db.sql_list("""
+			SELECT DISTINCT gle.posting_date
+			FROM `tabGL Entry` gle
+			INNER JOIN `tabAccount` acc ON acc.name = gle.account
+			WHERE gle.voucher_type = %s AND gle.voucher_no = %s AND acc.root_type = 'Expense'
+		""", (doc.doctype, doc.name))
+		refresh_activity_rollups("Expenses", days)
+		return
+
+	metric = DOCUMENT_METRICS.get(doc.doctype)
+	if isinstance(metric, dict):
+		metric = metric.get(doc.type)
+	if not metric:
+		return
+
+	if doc.doctype == "SACCO Loan":
+		day = frappe.db.get_value("Journal Entry", doc.disbursement_entry, "posting_date") if doc.disbursement_entry else None
+	elif doc.doctype == "SACCO Loan Repayment":
+		day = doc.payment_date
+	else:
+		day = doc.posting_date
+	refresh_activity_rollups(metric, [day])
+
+
+def refresh_activity_rollups(metric, days):
+	"""Re-sums `metric` on the given days from its source, then the months they fall in."""
+	days = tuple({getdate(day) for day in days if day})
+	if not days:
+		return
+
+	source, day_column = METRIC_SOURCES[metric]
+	values = {"metric": metric, "days": days}
+	# Days left with nothing on them (everything cancelled) keep their rows at zero
+	frappe.db.sql("""
+		UPDATE `tabSACCO Activity Rollup` SET amount = 0, entry_count = 0
+		WHERE period_type = 'Day' AND metric = %(metric)s AND period_start IN %(days)s
+	""", values)
+	insert_rollups("Day", metric, source.format(days=f"{day_column} IN %(days)s"), values)
+
+	values.update(from_date=get_first_day(min(days)), to_date=get_last_day(max(days)))
+	frappe.db.sql("""
+		UPDATE `tabSACCO Activity Rollup` SET amount = 0, entry_count = 0
+		WHERE period_type = 'Month' AND metric = %(metric)s AND period_start BETWEEN %(from_date)s AND %(to_date)s
+	""", values)
+	insert_rollups("Month", metric, MONTH_SOURCE.format(days="period_start BETWEEN %(from_date)s AND %(to_date)s"), values)
+
+
+def insert_rollups(period_type, metric, source, values):
+	"""Upserts the rows of `source` as `period_type` buckets of `metric`; returns the rows written."""
+	frappe.db.sql(f"""
+		INSERT INTO `tabSACCO Activity Rollup` (
+			name, creation, modified, owner, modified_by, docstatus, idx,
+			period_type, period_start, metric, category, company, amount, entry_count
+		)
+		SELECT
+			SUBSTRING(SHA1(CONCAT_WS('|', %(period_type)s, src.period_start, %(metric)s, src.category, src.company)), 1, 20),
+			NOW(), NOW(), 'Administrator', 'Administrator', 0, 0,
+			%(period_type)s, src.period_start, %(metric)s, src.category, src.company, src.amount, src.entry_count
+		FROM ({source}) src
+		ON DUPLICATE KEY UPDATE
+			modified = VALUES(modified),
+			amount = VALUES(amount),
+			entry_count = VALUES(entry_count)
+	""", dict(values, period_type=period_type, metric=metric))
+	return frappe.db._cursor.rowcount
+
+
+def get_activity_series(metrics, granularity, from_date, to_date, category=None, company=None):
+	"""
+	[{period, <metric>: {amount, count}, ...}] for every bucket from the one holding `from_date`
+	to the one holding `to_date`, with zeros for buckets without activity. One grouped read of
+	the day rows (day, week) or month rows (month, quarter, year).
+	"""
+	period_type, bucket, step = GRANULARITIES[granularity]
+	from_date = get_bucket_start(granularity, from_date)
+	to_date = getdate(to_date)
+
+	conditions = ["period_type = %(period_type)s", "metric IN %(metrics)s", "period_start BETWEEN %(from_date)s AND %(to_date)s"]
+	if category:
+		conditions.append("category = %(category)s")
+	if company:
+		# Member activity is not tied to a company
+		conditions.append("company IN ('', %(company)s)")
+
+	totals = {(getdate(period), metric): (amount, count) for period, metric, amount, count in frappe.db.sql(f"""
+		SELECT {bucket} AS period, metric, SUM(amount), SUM(entry_count)
+		FROM `tabSACCO Activity Rollup`
+		WHERE {" AND ".join(conditions)}
+		GROUP BY period, metric
+	""", {"period_type": period_type, "metrics": tuple(metrics), "from_date": from_date, "to_date": to_date,
+		"category": category, "company": company})}
+
+	series, period = [], from_date
+	while period <= to_date:
+		row = {"period": str(period)}
+		for metric in metrics:
+			amount, count = totals.get((period, metric), (0, 0))
+			row[metric] = {"amount": flt(amount, 2), "count": int(count or 0)}
+		series.append(row)
+		period = getdate(step(period))
+	return series
+
+
+def get_bucket_start(granularity, date):
+	date = getdate(date)
+	if granularity == "week":
+		return add_days(date, -date.weekday())
+	if granularity == "month":
+		return get_first_day(date)
+	if granularity == "quarter":
+		return date.replace(month=3 * ((date.month - 1) // 3) + 1, day=1)
+	if granularity == "year":
+		return date.replace(month=1, day=1)
+	return date
+
+
+def rebuild_activity_rollups():
+	"""
+	Refills every day and month bucket from the source tables. Run after restoring data or
+	reposting ledgers: bench execute sacc_app.rollups.rebuild_activity_rollups
+	"""
+	with track_job_run("Activity Rollup Rebuild") as run:
+		frappe.db.sql("DELETE FROM `tabSACCO Activity Rollup`")
+		rows = 0
+		for metric, (source, _) in METRIC_SOURCES.items():
+			rows += insert_rollups("Day", metric, source.format(days="1=1"), {})
+		for metric in METRIC_SOURCES:
+			rows += insert_rollups("Month", metric, MONTH_SOURCE.format(days="1=1"), {})
+		run.rows_affected = rows
@@ -0,0 +1,13 @@
+# Copyright (c) 2024, SACCO Team and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SACCOAccountDailyBalance(Document):
+	pass
+
+
+def on_doctype_update():
+	# One row per account per day; also serves the latest-snapshot-on-or-before lookups
+	frappe.db.add_unique("SACCO Account Daily Balance", ["account", "posting_date"], constraint_name="account_posting_date")
@@ -0,0 +1,14 @@
+# Copyright (c) 2024, SACCO Team and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SACCOActivityRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	# One row per bucket; also serves the series reads by period type, metric and date range
+	frappe.db.add_unique("SACCO Activity Rollup", ["period_type", "metric", "period_start", "category", "company"],
+		constraint_name="activity_bucket")
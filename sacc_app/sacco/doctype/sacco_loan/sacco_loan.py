@@ -3,48 +3,31 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import flt, nowdate, add_months
+from frappe.utils import cint, flt, getdate, nowdate, add_months
+from sacc_app.account_map import get_default_company
+from sacc_app.amortization import amortize
+from sacc_app.guarantors import (get_guarantee_limits, get_guarantor_capacity, get_guarantor_error,
+	update_exposure_for_loans)
+from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import get_loan_product, get_product_catalog
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+from sacc_app.utils import count_journal_entry_links
 
 class SACCOLoan(Document):
 	def validate(self):
 		self.validate_eligibility()
 		self.calculate_terms()
 		self.calculate_totals()
-		self.generate_schedule()
 
 	def validate_eligibility(self):
-		# Check member active
-		member = frappe.get_doc("SACCO Member", self.member)
-		if member.status != "Active":
-			frappe.throw("Member is not Active.")
-		if not member.loan_eligible:
-			frappe.throw("Member is not eligible for loans yet (3 months savings rule).")
-		if not member.registration_fee_paid:
-			frappe.throw("Registration fee not paid.")
-		if member.active_loan:
-			# Only Table Banking might allow parallel loans, but usually better to stick to 1 unless specified.
-			# Logic check:
-			product = frappe.get_doc("SACCO Loan Product", self.loan_product)
-			if product.product_name != "Table Banking":
-				frappe.throw(f"Member already has an active loan: {member.active_loan}")
-
-		# Validate Amounts
-		product = frappe.get_doc("SACCO Loan Product", self.loan_product)
-
-		# Validate Guarantors
-		if product.requires_guarantor:
-			min_g = getattr(product, "min_guarantors", 0)
-			if len(self.guarantors) < min_g:
-				frappe.throw(f"Loan product '{self.loan_product}' requires at least {min_g} guarantors. Provided: {len(self.guarantors)}")
-
-		if product.min_loan_amount and self.loan_amount < product.min_loan_amount:
-			frappe.throw(f"Loan amount is below the minimum allowed ({product.min_loan_amount}) for '{self.loan_product}'.")
-		if product.max_loan_amount and self.loan_amount > product.max_loan_amount:
-			frappe.throw(f"Loan amount exceeds the maximum allowed ({product.max_loan_amount}) for '{self.loan_product}'.")
+		member = frappe.db.get_value("SACCO Member", self.member,
+			["name", "status", "loan_eligible", "registration_fee_paid", "active_loan"], as_dict=True)
+		error = get_eligibility_error(self, member, get_loan_product(self.loan_product), self.guarantors)
+		if error:
+			frappe.throw(error)
 
 	def calculate_terms(self):
 		# Now fetched from Product
-		product = frappe.get_doc("SACCO Loan Product", self.loan_product)
+		product = get_loan_product(self.loan_product)
 		self.interest_rate = product.interest_rate
 		self.interest_period = product.interest_period
 		self.interest_method = product.interest_method
@@ -52,92 +35,39 @@ class SACCOLoan(Document):
 			self.repayment_period = product.max_repayment_period # Use max as default if not specified
 
 	def calculate_totals(self):
-		product = frappe.get_doc("SACCO Loan Product", self.loan_product)
-		
-		# Portion Ratios & Method Specific Calculation
-		if self.interest_method == "Reducing Balance":
-			# EMI Formula: [P * r * (1+r)^n] / [(1+r)^n - 1]
-			# Convert rate based on period
-			if product.interest_period == "Monthly":
-				r = (flt(self.interest_rate) / 100.0)
-			else:
-				r = (flt(self.interest_rate) / 100.0) / 12.0
-				
-			n = flt(self.repayment_period)
-			if r > 0 and n > 0:
-				self.monthly_installment = (flt(self.loan_amount) * r * ((1 + r) ** n)) / (((1 + r) ** n) - 1)
-			elif n > 0:
-				self.monthly_installment = flt(self.loan_amount) / n
-			else:
-				self.monthly_installment = 0
-				
-			self.total_repayable = self.monthly_installment * n
-			self.total_interest = self.total_repayable - flt(self.loan_amount)
-		else:
-			# Flat Rate (Current Logic)
-			if product.interest_period == "Monthly":
-				# Simple Interest: Amount * Rate * Months
-				self.total_interest = flt(self.loan_amount) * (flt(self.interest_rate) / 100.0) * flt(self.repayment_period)
-			else:
-				# Annual Interest: Amount * Rate * (Months/12)
-				self.total_interest = flt(self.loan_amount) * (flt(self.interest_rate) / 100.0) * (flt(self.repayment_period) / 12.0)
-				
-			self.total_repayable = flt(self.loan_amount) + self.total_interest
-			if self.repayment_period > 0:
-				self.monthly_installment = self.total_repayable / self.repayment_period
-			else:
-				self.monthly_installment = 0
+		quote = self.get_quote(with_schedule=False)
+		self.monthly_installment = quote["monthly_installment"]
+		self.total_interest = quote["total_interest"]
+		self.total_repayable = quote["total_repayable"]
 		
 		if self.is_new() or self.outstanding_balance == 0:
 			self.outstanding_balance = self.total_repayable
 
-	def generate_schedule(self):
-		# Generate a simple JSON schedule
-		schedule = []
-		start_date = nowdate()
-		balance = flt(self.total_repayable)
-		total_rep = flt(self.total_repayable)
-		
-		# Portion Ratios
-		interest_ratio = flt(self.total_interest) / total_rep if total_rep > 0 else 0
-		principal_ratio = flt(self.loan_amount) / total_rep if total_rep > 0 else 1
+	def get_quote(self, with_schedule=True):
+		return amortize(self.loan_amount, self.interest_rate, self.repayment_period,
+			self.interest_method, self.interest_period, with_schedule=with_schedule)
 
-		curr_balance = flt(self.loan_amount) # For Reducing Balance tracking
-		
-		# Rate for reducing balance
-		if self.interest_method == "Reducing Balance":
-			if self.interest_period == "Monthly":
-				r = (flt(self.interest_rate) / 100.0)
-			else:
-				r = (flt(self.interest_rate) / 100.0) / 12.0
-		else:
-			r = 0
-
-		for i in range(1, int(self.repayment_period) + 1):
-			date = add_months(start_date, i)
-			amt = flt(self.monthly_installment)
-			
-			if self.interest_method == "Reducing Balance":
-				i_portion = curr_balance * r
-				p_portion = amt - i_portion
-				curr_balance -= p_portion
-			else:
-				# Flat Rate: Proportional Split
-				p_portion = amt * principal_ratio
-				i_portion = amt * interest_ratio
-			
-			balance -= amt
-			schedule.append({
-				"payment_date": date,
-				"amount": round(amt, 2),
-				"principal": round(p_portion, 2),
-				"interest": round(i_portion, 2),
-				"principal_to_be_demanded": round(p_portion, 2),
-				"interest_to_be_demanded": round(i_portion, 2),
-				"balance_after": max(0, round(balance, 2))
-			})
-		import json
-		self.repayment_schedule = json.dumps(schedule, indent=4, default=str)
+	def get_schedule_rows(self, start_date=None):
+		"""Installment rows for this loan's terms, the first falling due a month after start_date."""
+		return make_schedule_rows(self.get_quote()["schedule"], start_date)
+
+	def generate_schedule(self, start_date=None):
+		self.set("installments", [])
+		for row in self.get_schedule_rows(start_date):
+			self.append("installments", row)
+		self.next_installment_idx = 1
+
+	def get_repayment_schedule(self):
+		"""Stored installments once disbursed, otherwise a preview from today."""
+		if self.get("installments"):
+			return [format_installment(row) for row in self.installments]
+		# The interest period is not stored on the loan; a loaded draft takes it from its product
+		self.calculate_terms()
+		return [format_installment(row) for row in self.get_schedule_rows()]
+
+	def before_submit(self):
+		# The schedule is fixed once, from the disbursement date
+		self.generate_schedule(nowdate())
 
 	def on_submit(self):
 		if self.status != "Approved":
@@ -146,14 +76,31 @@ class SACCOLoan(Document):
 		self.make_disbursement_entry()
 		self.update_member_status()
 		
-		# Refresh balances immediately
-		member = frappe.get_doc("SACCO Member", self.member)
-		member.get_balances()
+		# Disbursement credits savings and raises the loan receivable by the same amount
+		update_member_balances(self.member, savings=self.loan_amount, loan=self.loan_amount)
 		
 		self.status = "Active"
 		self.db_set("status", "Active")
+		update_exposure_for_loans([self.name])
 
-	def make_disbursement_entry(self):
+	def on_cancel(self):
+		# Submitted repayments block cancellation (linked documents), so only the disbursement is reversed
+		# Batch disbursement runs share one entry across loans, so those get a reversing entry
+		journal_entry = self.disbursement_entry or frappe.db.get_value("Journal Entry",
+			{"user_remark": f"Loan Disbursement to Savings: {self.name}", "docstatus": 1})
+		if journal_entry and count_journal_entry_links(journal_entry) > 1:
+			self.make_disbursement_entry(cancel=True)
+		elif journal_entry and frappe.db.get_value("Journal Entry", journal_entry, "docstatus") == 1:
+			frappe.get_doc("Journal Entry", journal_entry).cancel()
+
+		update_member_balances(self.member, savings=-flt(self.loan_amount), loan=-flt(self.loan_amount))
+
+		if frappe.db.get_value("SACCO Member", self.member, "active_loan") == self.name:
+			frappe.db.set_value("SACCO Member", self.member, "active_loan", None)
+
+		update_exposure_for_loans([self.name])
+
+	def make_disbursement_entry(self, cancel=False):
 		member = frappe.get_doc("SACCO Member", self.member)
 		if not member.savings_account:
 			frappe.throw(f"Member {self.member} does not have a linked Savings Account. Please update the member profile.")
@@ -161,19 +108,20 @@ class SACCOLoan(Document):
 		# Debit: Member Loan Account (Receivable UP)
 		# Credit: Member Savings Account (Liability UP)
 		
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+		company = get_default_company()
 		
 		je = frappe.new_doc("Journal Entry")
 		je.posting_date = nowdate()
 		je.company = company
 		je.voucher_type = "Journal Entry"
-		je.user_remark = f"Loan Disbursement to Savings: {self.name}"
+		je.user_remark = f"Loan Disbursement {'Reversal' if cancel else 'to Savings'}: {self.name}"
+		debit, credit = (0, self.loan_amount) if cancel else (self.loan_amount, 0)
 
 		# Dr Member Loan Account (Receivable)
 		je.append("accounts", {
 			"account": member.ledger_account,
-			"debit_in_account_currency": self.loan_amount,
-			"credit_in_account_currency": 0,
+			"debit_in_account_currency": debit,
+			"credit_in_account_currency": credit,
 			"party_type": "Customer",
 			"party": member.customer_link
 		})
@@ -181,13 +129,15 @@ class SACCOLoan(Document):
 		# Cr Member Savings Account (Liability/Payable)
 		je.append("accounts", {
 			"account": member.savings_account,
-			"debit_in_account_currency": 0,
-			"credit_in_account_currency": self.loan_amount,
+			"debit_in_account_currency": credit,
+			"credit_in_account_currency": debit,
 			"is_advance": "Yes"
 		})
 		
 		je.save()
 		je.submit()
+		if not cancel:
+			self.db_set("disbursement_entry", je.name)
 
 	def update_member_status(self):
 		frappe.db.set_value("SACCO Member", self.member, "active_loan", self.name)
@@ -196,53 +146,124 @@ class SACCOLoan(Document):
 		if self.status == "Defaulted":
 			return
 
-		# 1. Update Status
-		self.db_set("status", "Defaulted")
-		
-		# 2. Create Defaulter Record
-		defaulter = frappe.get_doc({
-			"doctype": "SACCO Defaulter",
-			"member": self.member,
-			"loan": self.name,
-			"overdue_amount": self.outstanding_balance, # Assuming full outstanding is now overdue
-			"days_overdue": 0, # Should be calculated based on schedule vs now
-			"status": "New Default"
-		})
-		defaulter.insert(ignore_permissions=True)
-		
-		# 3. Notify Guarantors
-		for g in self.guarantors:
-			# Fetch Guarantor email/phone
-			guarantor_doc = frappe.get_doc("SACCO Member", g.guarantor_member)
-			
-			# Send notification
-			from sacc_app.notify import send_member_email
-			send_member_email(guarantor_doc.name, "Loan Default Notice", message)
-			
+		# Status, defaulter record (with the real days overdue) and guarantor notices in one pass
+		from sacc_app.arrears import default_loans, get_live_arrears
+		default_loans(get_live_arrears([self.name]))
+		self.status = "Defaulted"
+
 	def update_demanded_amounts(self):
 		"""
-		Checks the schedule and updates total_principal_demanded and total_interest_demanded
-		based on the current date.
+		Updates total_principal_demanded and total_interest_demanded from the
+		installments due by the current date.
 		"""
-		if not self.repayment_schedule:
-			return
-
-		import json
-		try:
-			schedule = json.loads(self.repayment_schedule)
-		except:
-			return
-
-		today = nowdate()
-		total_p = 0
-		total_i = 0
-		
-		# Sum up what's due by today
-		for entry in schedule:
-			if entry.get("payment_date") <= today:
-				total_p += flt(entry.get("principal_to_be_demanded", 0))
-				total_i += flt(entry.get("interest_to_be_demanded", 0))
+		total_p, total_i = frappe.db.sql("""
+			SELECT IFNULL(SUM(principal), 0), IFNULL(SUM(interest), 0)
+			FROM `tabSACCO Loan Installment`
+			WHERE parent = %s AND parenttype = 'SACCO Loan' AND due_date <= %s
+		""", (self.name, nowdate()))[0]
 		
 		self.db_set("total_principal_demanded", total_p)
 		self.db_set("total_interest_demanded", total_i)
 		self.reload() # Refresh local doc values
+
+
+def get_eligibility_error(loan, member, product, guarantors, capacity=None, limits=None):
+	"""
+	Loan eligibility rules shared by validate and the batch disbursement run.
+	Returns the first failing rule as a message, or None when the loan is eligible.
+	Guarantor capacity comes from the exposure index; the batch run passes `capacity`
+	and `limits` looked up once for all its loans.
+	"""
+	# Check member active
+	if not member:
+		return f"Member {loan.member} not found."
+	if member.status != "Active":
+		return "Member is not Active."
+	if not member.loan_eligible:
+		return "Member is not eligible for loans yet (3 months savings rule)."
+	if not member.registration_fee_paid:
+		return "Registration fee not paid."
+	if member.active_loan:
+		# Only Table Banking might allow parallel loans, but usually better to stick to 1 unless specified.
+		if product.product_name != "Table Banking":
+			return f"Member already has an active loan: {member.active_loan}"
+
+	# Validate Guarantors
+	if product.requires_guarantor:
+		min_g = product.min_guarantors or 0
+		if len(guarantors) < min_g:
+			return f"Loan product '{loan.loan_product}' requires at least {min_g} guarantors. Provided: {len(guarantors)}"
+
+	limits = limits or get_guarantee_limits()
+	if guarantors and limits.enforce:
+		if capacity is None:
+			capacity = get_guarantor_capacity([g.guarantor_member for g in guarantors], limits)
+		error = get_guarantor_error(guarantors, capacity, limits)
+		if error:
+			return error
+
+	# Validate Amounts
+	if product.min_loan_amount and loan.loan_amount < product.min_loan_amount:
+		return f"Loan amount is below the minimum allowed ({product.min_loan_amount}) for '{loan.loan_product}'."
+	if product.max_loan_amount and loan.loan_amount > product.max_loan_amount:
+		return f"Loan amount exceeds the maximum allowed ({product.max_loan_amount}) for '{loan.loan_product}'."
+
+def format_installment(row):
+	"""API shape of an installment; keeps the keys of the former JSON schedule."""
+	return {
+		"installment_no": row.installment_no,
+		"payment_date": str(row.due_date),
+		"amount": flt(row.amount),
+		"principal": flt(row.principal),
+		"interest": flt(row.interest),
+		"principal_to_be_demanded": flt(row.principal),
+		"interest_to_be_demanded": flt(row.interest),
+		"principal_paid": flt(row.principal_paid),
+		"interest_paid": flt(row.interest_paid),
+		"balance_after": flt(row.balance_after),
+		"status": row.status
+	}
+
+
+def get_repayment_schedules(loans):
+	"""
+	Schedules for many loans in one query: {loan: [installments]}.
+	Drafts without stored installments get a preview.
+	"""
+	loans = list(loans or [])
+	schedules = {loan: [] for loan in loans}
+	if not loans:
+		return schedules
+
+	for row in frappe.db.get_all("SACCO Loan Installment",
+		filters={"parent": ["in", loans], "parenttype": "SACCO Loan"},
+		fields=["parent", "installment_no", "due_date", "amount", "principal", "interest",
+			"principal_paid", "interest_paid", "balance_after", "status"],
+		order_by="parent, installment_no"):
+		schedules[row.parent].append(format_installment(row))
+
+	drafts = [loan for loan in loans if not schedules[loan]]
+	if drafts:
+		# Previews take their terms from the cached product catalog, as calculate_terms does
+		products = get_product_catalog()["by_name"]
+		for loan in frappe.db.get_all("SACCO Loan", filters={"name": ["in", drafts]},
+			fields=["name", "loan_product", "loan_amount", "repayment_period"]):
+			product = products.get(loan.loan_product)
+			if not product:
+				continue
+			quote = amortize(loan.loan_amount, product.interest_rate,
+				cint(loan.repayment_period) or cint(product.max_repayment_period),
+				product.interest_method, product.interest_period)
+			schedules[loan.name] = [format_installment(row) for row in make_schedule_rows(quote["schedule"])]
+
+	return schedules
+
+
+def make_schedule_rows(schedule, start_date=None):
+	"""Pending installment rows for an amortization schedule, the first due a month after start_date."""
+	start_date = start_date or nowdate()
+	return [
+		frappe._dict(row, due_date=getdate(add_months(start_date, row["installment_no"])),
+			principal_paid=0, interest_paid=0, status="Pending")
+		for row in schedule
+	]
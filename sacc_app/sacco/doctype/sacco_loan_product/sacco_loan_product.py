@@ -3,6 +3,46 @@
 
 import frappe
 from frappe.model.document import Document
+from sacc_app.cache import clear_cached_value_on_commit, get_cached_value
+
+PRODUCT_CATALOG_KEY = "sacc_app:loan_product_catalog"
+
+PRODUCT_FIELDS = [
+	"name", "product_name", "interest_rate", "interest_period", "interest_method",
+	"max_repayment_period", "min_loan_amount", "max_loan_amount",
+	"requires_guarantor", "min_guarantors", "description"
+]
 
 class SACCOLoanProduct(Document):
-	pass
+	def on_update(self):
+		clear_product_catalog()
+
+	def on_trash(self):
+		clear_product_catalog()
+
+	def after_rename(self, old, new, merge=False):
+		clear_product_catalog()
+
+
+def get_product_catalog():
+	"""
+	All loan products, cached in Redis and per worker: {"products": [...], "by_name": {...}}.
+	Treat the returned rows as read-only; they are shared across requests.
+	"""
+	return get_cached_value(PRODUCT_CATALOG_KEY, build_product_catalog)
+
+
+def build_product_catalog():
+	products = frappe.db.get_all("SACCO Loan Product", fields=PRODUCT_FIELDS, order_by="modified desc")
+	return {"products": products, "by_name": {p.name: p for p in products}}
+
+
+def get_loan_product(product_name):
+	product = get_product_catalog()["by_name"].get(product_name)
+	if not product:
+		frappe.throw(f"Loan Product {product_name} not found", frappe.DoesNotExistError)
+	return product
+
+
+def clear_product_catalog():
+	clear_cached_value_on_commit(PRODUCT_CATALOG_KEY)
@@ -4,7 +4,12 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
+from sacc_app.account_map import get_account_map, get_payment_account
+from sacc_app.accrual import adjust_accrued_interest, settle_accrued_interest
+from sacc_app.allocation import allocate_payment, reverse_allocation
 from sacc_app.notify import send_member_email
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+from sacc_app.utils import count_journal_entry_links
 
 class SACCOLoanRepayment(Document):
 	def validate(self):
@@ -24,69 +29,68 @@ class SACCOLoanRepayment(Document):
 
 	def on_submit(self):
 		self.process_payment()
+		update_member_balances(self.member, savings=-self.get_savings_debit(), loan=-flt(self.principal_portion))
 		
 		# Send Repayment Notification
 		send_member_email(self.member, "Loan Repayment Received", 
 			f"Your loan <b>{self.loan}</b> has been <b>debited</b> with <b>{self.payment_amount}</b>. "
 			f"Current Outstanding Balance: <b>{frappe.db.get_value('SACCO Loan', self.loan, 'outstanding_balance')}</b>.")
 
+	def on_cancel(self):
+		self.reverse_payment()
+		update_member_balances(self.member, savings=self.get_savings_debit(), loan=flt(self.principal_portion))
+
+	def get_savings_debit(self):
+		return flt(self.payment_amount) if self.payment_mode == "Savings" else 0
+
 
 	def process_payment(self):
-		loan = frappe.get_doc("SACCO Loan", self.loan)
-		
-		# 1. Calculate Balanced Split (Proportional to Total)
-		# This ensures both principal and interest are reduced with every payment.
-		total_rep = flt(loan.total_repayable)
-		if total_rep > 0:
-			interest_ratio = flt(loan.total_interest) / total_rep
-			principal_ratio = flt(loan.loan_amount) / total_rep
-			
-			interest_portion = flt(self.payment_amount) * interest_ratio
-			principal_portion = flt(self.payment_amount) * principal_ratio
-			
-			# Cap interest portion if it exceeds remaining due
-			rem_int = max(0, flt(loan.total_interest) - flt(loan.interest_paid))
-			if interest_portion > rem_int:
-				interest_portion = rem_int
-				principal_portion = flt(self.payment_amount) - interest_portion
-		else:
-			interest_portion = 0
-			principal_portion = self.payment_amount
-		
-		# 2. Update Loan record
-		loan.interest_paid = flt(loan.interest_paid) + interest_portion
-		loan.principal_paid = flt(loan.principal_paid) + principal_portion
-		loan.outstanding_balance = flt(loan.outstanding_balance) - flt(self.payment_amount)
-		
-		if loan.outstanding_balance <= 0:
-			loan.status = "Completed"
-			loan.outstanding_balance = 0
-			# Clear member active loan
-			frappe.db.set_value("SACCO Member", loan.member, "active_loan", None)
-		
-		loan.save(ignore_permissions=True)
+		# Oldest unpaid installments first, each settled in the configured component order
+		paid = allocate_payment(self.loan, self.payment_amount)
+		accrued = settle_accrued_interest([(self.loan, paid["interest"])])[0]
 
-		# 3. Create Journal Entry
-		self.create_journal_entry(loan, principal_portion, interest_portion)
+		self.db_set({
+			"principal_portion": paid["principal"],
+			"interest_portion": paid["interest"],
+			"penalty_portion": paid["penalty"],
+			"accrued_interest_portion": accrued
+		})
+		self.create_journal_entry(None, paid["principal"], paid["interest"], paid["penalty"], accrued_portion=accrued)
+
+	def reverse_payment(self):
+		reverse_allocation(self.loan, {
+			"principal": flt(self.principal_portion),
+			"interest": flt(self.interest_portion),
+			"penalty": flt(self.penalty_portion)
+		})
+		adjust_accrued_interest(self.loan, flt(self.accrued_interest_portion))
 
-	def create_journal_entry(self, loan, principal_portion, interest_portion):
+		# Check-off remittances share one entry, so those get a reversing entry
+		journal_entry = self.journal_entry or frappe.db.get_value("Journal Entry",
+			{"user_remark": ["like", f"%(Ref: {self.name})%"], "docstatus": 1})
+		if journal_entry and count_journal_entry_links(journal_entry) > 1:
+			self.create_journal_entry(None, flt(self.principal_portion), flt(self.interest_portion),
+				flt(self.penalty_portion), accrued_portion=flt(self.accrued_interest_portion), cancel=True)
+		elif journal_entry and frappe.db.get_value("Journal Entry", journal_entry, "docstatus") == 1:
+			frappe.get_doc("Journal Entry", journal_entry).cancel()
+
+	def create_journal_entry(self, loan, principal_portion, interest_portion, penalty_portion=0, accrued_portion=0, cancel=False):
 		member = frappe.get_doc("SACCO Member", self.member)
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+		accounts = get_account_map()
+		company = accounts.company
 		
-		cash_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company})
-		if not cash_account:
-			cash_account = frappe.db.get_value("Account", {"root_type": "Asset", "is_group": 0, "company": company})
-			
-		income_account = frappe.db.get_value("Account", {"account_name": "SACCO Interest Income", "company": company})
-		if not income_account:
-			# Fallback
-			income_account = frappe.db.get_value("Account", {"root_type": "Income", "is_group": 0, "company": company})
+		cash_account = get_payment_account(self.payment_mode, company)
+		income_account = accounts.interest_income
 
 		je = frappe.new_doc("Journal Entry")
 		je.posting_date = self.payment_date
 		je.company = company
 		je.voucher_type = "Journal Entry"
-		je.user_remark = f"Loan Repayment: {self.loan} (Ref: {self.name}) (Principal: {principal_portion}, Interest: {interest_portion})"
+		je.user_remark = f"Loan Repayment{' Reversal' if cancel else ''}: {self.loan} (Ref: {self.name}) (Principal: {principal_portion}, Interest: {interest_portion}, Penalty: {penalty_portion})"
+
+		# A reversal swaps every debit and credit
+		dr, cr = ("credit_in_account_currency", "debit_in_account_currency") if cancel else \
+			("debit_in_account_currency", "credit_in_account_currency")
 
 		# Dr Cash or Savings Account (Total Payment)
 		debit_account = cash_account
@@ -95,28 +99,47 @@ class SACCOLoanRepayment(Document):
 
 		je.append("accounts", {
 			"account": debit_account,
-			"debit_in_account_currency": self.payment_amount,
-			"credit_in_account_currency": 0
+			dr: self.payment_amount,
+			cr: 0
 		})
 		
 		# Cr Member Ledger (Principal Reduction Portion)
 		if principal_portion > 0:
 			je.append("accounts", {
 				"account": member.ledger_account,
-				"debit_in_account_currency": 0,
-				"credit_in_account_currency": principal_portion,
+				dr: 0,
+				cr: principal_portion,
 				"party_type": "Customer",
 				"party": member.customer_link
 			})
 			
-		# Cr SACCO Interest Income (Interest Portion)
-		if interest_portion > 0:
+		# Cr SACCO Interest Receivable (Interest already accrued)
+		if accrued_portion > 0:
+			je.append("accounts", {
+				"account": accounts.interest_receivable,
+				dr: 0,
+				cr: accrued_portion
+			})
+
+		# Cr SACCO Interest Income (Interest not yet accrued)
+		if interest_portion - accrued_portion > 0:
+			je.append("accounts", {
+				"account": income_account,
+				dr: 0,
+				cr: flt(interest_portion - accrued_portion, 2)
+			})
+
+		# Cr SACCO Interest Income (Penalty Portion)
+		if penalty_portion > 0:
 			je.append("accounts", {
 				"account": income_account,
-				"debit_in_account_currency": 0,
-				"credit_in_account_currency": interest_portion
+				dr: 0,
+				cr: penalty_portion,
+				"user_remark": f"Loan Penalty: {self.loan}"
 			})
 		
 		je.save(ignore_permissions=True)
 		je.submit()
+		if not cancel:
+			self.db_set("journal_entry", je.name)
 
@@ -4,13 +4,13 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
+from sacc_app.account_map import get_account_map, get_default_company
 from sacc_app.notify import send_member_email
 
 class SACCOMember(Document):
 	def validate(self):
 		self.member_name = f"{self.first_name} {self.last_name}"
 		self.validate_unique_email()
-		self.get_balances()
 	
 	def validate_unique_email(self):
 		"""Validate that email is unique across all members"""
@@ -43,37 +43,20 @@ class SACCOMember(Document):
 				title="Duplicate Email"
 			)
 
-	def onload(self):
-		self.get_balances()
-
-	def get_balances(self):
-		if not self.savings_account and not self.ledger_account:
+	def recalculate_balances(self):
+		"""
+		Repair path: re-sums the member's savings and loan accounts from the GL.
+		Day-to-day postings maintain the totals incrementally via update_member_balances.
+		"""
+		if not self.name:
 			return 0, 0
 
-		# 1. Savings Balance = Sum(Credit) - Sum(Debit)
-		if self.savings_account:
-			self.total_savings = flt(frappe.db.sql("""
-				SELECT sum(credit) - sum(debit)
-				FROM `tabGL Entry`
-				WHERE account = %s AND is_cancelled = 0
-			""", (self.savings_account,))[0][0])
-		
-		# 2. Loan Outstanding = Sum(Debit) - Sum(Credit)
-		if self.ledger_account:
-			self.total_loan_outstanding = flt(frappe.db.sql("""
-				SELECT sum(debit) - sum(credit)
-				FROM `tabGL Entry`
-				WHERE account = %s AND is_cancelled = 0
-			""", (self.ledger_account,))[0][0])
-		
-		# Update values in DB without triggering hooks
-		if self.name:
-			frappe.db.set_value("SACCO Member", self.name, {
-				"total_savings": self.total_savings,
-				"total_loan_outstanding": self.total_loan_outstanding
-			}, update_modified=False)
-		
+		refresh_member_balances([self.name])
+		self.total_savings, self.total_loan_outstanding = frappe.db.get_value(
+			"SACCO Member", self.name, ["total_savings", "total_loan_outstanding"])
+
 		return self.total_savings, self.total_loan_outstanding
+
 	def after_insert(self):
 		self.create_customer()
 		self.create_registration_invoice()
@@ -141,12 +124,12 @@ class SACCOMember(Document):
 			self.db_set("savings_account", account.name)
 
 	def create_ledger_account(self, customer_name):
-		# For simplicity getting default company
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+		accounts = get_account_map()
+		company = accounts.company
 		
 		# 1. Handle Loan Account (Receivable)
 		parent_loan_name = "SACCO Members Accounts"
-		parent_loan = frappe.db.get_value("Account", {"account_name": parent_loan_name, "company": company})
+		parent_loan = accounts.member_loans_parent
 		
 		if not parent_loan:
 			ar_root = frappe.db.get_value("Account", {"account_type": "Receivable", "is_group": 1, "company": company})
@@ -164,7 +147,7 @@ class SACCOMember(Document):
 		
 		# 2. Handle Savings Account (Liability)
 		parent_savings_name = "SACCO Member Savings"
-		parent_savings = frappe.db.get_value("Account", {"account_name": parent_savings_name, "company": company})
+		parent_savings = accounts.member_savings_parent
 		
 		if not parent_savings:
 			liab_root = frappe.db.get_value("Account", {"root_type": "Liability", "is_group": 1, "company": company})
@@ -226,7 +209,7 @@ class SACCOMember(Document):
 			# For now just use it.
 			pass
 			
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+		company = get_default_company()
 		
 		si = frappe.get_doc({
 			"doctype": "Sales Invoice",
@@ -251,3 +234,49 @@ class SACCOMember(Document):
             
 		frappe.msgprint(f"Registration Invoice {si.name} created. Please pay to activate membership.")
 
+
+def update_member_balances(member, savings=0, loan=0):
+	"""
+	Applies a posting to the stored member totals as a delta, in the same transaction
+	as the posting itself. Positive savings = member liability up, positive loan = receivable up.
+	"""
+	savings, loan = flt(savings, 2), flt(loan, 2)
+	if not member or not (savings or loan):
+		return
+
+	frappe.db.sql("""
+		UPDATE `tabSACCO Member`
+		SET total_savings = IFNULL(total_savings, 0) + %s,
+			total_loan_outstanding = IFNULL(total_loan_outstanding, 0) + %s
+		WHERE name = %s
+	""", (savings, loan, member))
+
+
+def refresh_member_balances(members):
+	"""
+	Repair path: recomputes total_savings / total_loan_outstanding for many members
+	from the GL, using one grouped query per chunk instead of two SUM scans per member.
+	"""
+	members = list(members or [])
+	for start in range(0, len(members), 1000):
+		rows = frappe.db.get_all("SACCO Member",
+			filters={"name": ["in", members[start:start + 1000]]},
+			fields=["name", "savings_account", "ledger_account"])
+		accounts = [a for r in rows for a in (r.savings_account, r.ledger_account) if a]
+
+		# Net (credit - debit) per account; loan balances are the negation
+		balances = {}
+		if accounts:
+			balances = dict(frappe.db.sql("""
+				SELECT account, SUM(credit) - SUM(debit)
+				FROM `tabGL Entry`
+				WHERE account IN %s AND is_cancelled = 0
+				GROUP BY account
+			""", (tuple(accounts),)))
+
+		for r in rows:
+			frappe.db.set_value("SACCO Member", r.name, {
+				"total_savings": flt(balances.get(r.savings_account)),
+				"total_loan_outstanding": 0 - flt(balances.get(r.ledger_account))
+			}, update_modified=False)
+
@@ -4,7 +4,10 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
+from sacc_app.account_map import get_account_map, get_payment_account
 from sacc_app.notify import send_member_email
+from sacc_app.sacco.doctype.sacco_member.sacco_member import update_member_balances
+from sacc_app.utils import count_journal_entry_links
 
 class SACCOSavings(Document):
 	def validate(self):
@@ -15,7 +18,7 @@ class SACCOSavings(Document):
 
 	def on_submit(self):
 		self.make_gl_entries()
-		self.update_member_savings()
+		update_member_balances(self.member, savings=self.get_savings_delta())
 		
 		# Send Notification
 		subject = "Savings Deposit Received" if self.type == "Deposit" else "Savings Withdrawal Recorded"
@@ -27,8 +30,22 @@ class SACCOSavings(Document):
 
 
 	def on_cancel(self):
-		self.make_gl_entries(cancel=True)
-		self.update_member_savings()
+		self.reverse_gl_entries()
+		update_member_balances(self.member, savings=-self.get_savings_delta())
+
+	def get_savings_delta(self):
+		return flt(self.amount) if self.type == "Deposit" else -flt(self.amount)
+
+	def reverse_gl_entries(self):
+		# Cancel our own Journal Entry; bulk deposits and check-off remittances share one, so those get a reversing entry
+		journal_entry = self.journal_entry or frappe.db.get_value("Journal Entry",
+			{"user_remark": ["like", f"%(Ref: {self.name})"], "docstatus": 1})
+
+		if journal_entry and count_journal_entry_links(journal_entry) <= 1:
+			if frappe.db.get_value("Journal Entry", journal_entry, "docstatus") == 1:
+				frappe.get_doc("Journal Entry", journal_entry).cancel()
+		else:
+			self.make_gl_entries(cancel=True)
 
 	def make_gl_entries(self, cancel=False):
 		# Dr Cash/Bank
@@ -45,13 +62,9 @@ class SACCOSavings(Document):
 			
 		member_account = member.savings_account
 		
-		# Get Cash/Bank Account - simplified for now, usually based on Mode of Payment
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-		cash_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company})
-		
-		if not cash_account:
-			# Fallback
-			cash_account = frappe.db.get_value("Account", {"is_group": 0, "root_type": "Asset", "company": company})
+		# Get Cash/Bank Account based on Mode of Payment
+		company = get_account_map().company
+		cash_account = get_payment_account(self.payment_mode, company)
 
 		if not cash_account:
 			frappe.throw("No Cash/Bank Account found. Please set up Chart of Accounts.")
@@ -65,10 +78,13 @@ class SACCOSavings(Document):
 			je.cheque_no = self.reference_number
 			je.cheque_date = self.posting_date
 		je.user_remark = f"Savings {self.type} for {self.member} (Ref: {self.name})"
+		if cancel:
+			je.user_remark = f"Reversal of {je.user_remark}"
 		
 		amount = flt(self.amount)
 		
-		if self.type == "Deposit":
+		# A reversal posts the opposite legs
+		if (self.type == "Deposit") != cancel:
 			# Dr Cash/Bank, Cr Member Savings (Liability UP)
 			je.append("accounts", {
 				"account": cash_account,
@@ -101,11 +117,5 @@ class SACCOSavings(Document):
 		je.save()
 		je.submit()
 		
-		if cancel:
-			je.cancel()
-
-	def update_member_savings(self):
-		# Calculate total savings for member using central logic (GL based)
-		member = frappe.get_doc("SACCO Member", self.member)
-		member.get_balances()
-		frappe.db.commit() # Ensure persisted for tests
+		if not cancel:
+			self.db_set("journal_entry", je.name)
@@ -2,4 +2,23 @@ import frappe
 from frappe.model.document import Document
 
 class SACCOSettings(Document):
-	pass
+	def validate(self):
+		for fieldname in ("reminder_days_before_due", "reminder_days_overdue"):
+			self.set(fieldname, ",".join(str(d) for d in parse_day_offsets(self.get(fieldname), self.meta.get_label(fieldname))))
+
+		from sacc_app.allocation import parse_allocation_order
+		self.repayment_allocation_order = ", ".join(c.title() for c in parse_allocation_order(self.repayment_allocation_order))
+
+
+def parse_day_offsets(value, label="Reminder days"):
+	"""'7, 3,1' -> [7, 3, 1]; rejects anything that isn't a non-negative whole number."""
+	days = []
+	for part in (value or "").split(","):
+		part = part.strip()
+		if not part:
+			continue
+		if not part.isdigit():
+			frappe.throw(f"{label} must be comma-separated whole numbers of days. Invalid value: '{part}'")
+		if int(part) not in days:
+			days.append(int(part))
+	return days
@@ -3,6 +3,7 @@
 
 import frappe
 from frappe.model.document import Document
+from sacc_app.account_map import get_account_map
 
 class SACCOShares(Document):
 	def validate(self):
@@ -16,15 +17,10 @@ class SACCOShares(Document):
 		# Dr Cash
 		# Cr Share Capital
 		
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-		cash_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company})
-		if not cash_account:
-			cash_account = frappe.db.get_value("Account", {"is_group": 0, "root_type": "Asset", "company": company})
-			
-		share_capital = frappe.db.get_value("Account", {"account_name": "Share Capital Account", "company": company})
-		if not share_capital:
-			# Find any Equity account
-			share_capital = frappe.db.get_value("Account", {"root_type": "Equity", "is_group": 0, "company": company})
+		accounts = get_account_map()
+		company = accounts.company
+		cash_account = accounts.cash
+		share_capital = accounts.share_capital
 
 		je = frappe.new_doc("Journal Entry")
 		je.posting_date = self.posting_date
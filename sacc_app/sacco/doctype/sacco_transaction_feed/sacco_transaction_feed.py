@@ -0,0 +1,15 @@
+# Copyright (c) 2024, SACCO Team and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+class SACCOTransactionFeed(Document):
+	pass
+
+
+def on_doctype_update():
+	# Newest-first listing per company, optionally narrowed by category or status
+	frappe.db.add_index("SACCO Transaction Feed", ["company", "posting_date", "posted_on"])
+	frappe.db.add_index("SACCO Transaction Feed", ["category", "posting_date"])
+	frappe.db.add_index("SACCO Transaction Feed", ["status", "posting_date"])
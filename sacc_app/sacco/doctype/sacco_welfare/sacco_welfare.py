@@ -4,6 +4,7 @@
 import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
+from sacc_app.account_map import get_account_map
 
 class SACCOWelfare(Document):
 	def validate(self):
@@ -41,14 +42,10 @@ class SACCOWelfare(Document):
 		frappe.db.set_value("SACCO Welfare Claim", self.welfare_claim, "total_collected", total)
 
 	def make_gl_entries(self):
-		company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
-		cash_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company})
-		if not cash_account:
-			cash_account = frappe.db.get_value("Account", {"is_group": 0, "root_type": "Asset", "company": company})
-		
-		welfare_fund = frappe.db.get_value("Account", {"account_name": "Welfare Fund Account", "company": company})
-		if not welfare_fund:
-			welfare_fund = frappe.db.get_value("Account", {"root_type": "Liability", "is_group": 0, "company": company})
+		accounts = get_account_map()
+		company = accounts.company
+		cash_account = accounts.cash
+		welfare_fund = accounts.welfare_fund
 
 		je = frappe.new_doc("Journal Entry")
 		je.posting_date = self.posting_date
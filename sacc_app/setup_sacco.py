@@ -30,6 +30,19 @@ def create_accounts():
 				"account_type": "Income Account"
 			}).insert(ignore_permissions=True)
 
+	# 2. Interest Receivable Account (daily accruals)
+	if not frappe.db.exists("Account", {"account_name": "SACCO Interest Receivable", "company": company}):
+		asset_root = frappe.db.get_value("Account", {"root_type": "Asset", "is_group": 1, "company": company})
+		if asset_root:
+			frappe.get_doc({
+				"doctype": "Account",
+				"account_name": "SACCO Interest Receivable",
+				"parent_account": asset_root,
+				"company": company,
+				"root_type": "Asset",
+				"is_group": 0
+			}).insert(ignore_permissions=True)
+
 def setup_permissions():
 	# Example: SACCO Member can Read their own Member Doc
 	# This requires Script Manager or Custom DocPerms usually defined in the doctype.json 
@@ -0,0 +1,291 @@
+"""
+Member statement runs.
+
+A run splits the membership into SACCO Statement Chunks and queues one background job per
+chunk, so statements are generated by as many workers as the long queue has. Each chunk loads
+its members' savings, loans, repayments and welfare with a handful of set-based queries,
+renders every statement from the compiled template and attaches it to the member as a private
+File. The statement's file name is fixed by member and period, so a re-queued chunk skips the
+members already done; resuming a run re-queues only its unfinished chunks.
+"""
+
+import json
+
+import frappe
+from frappe.utils import add_days, cint, flt, get_first_day, get_last_day, getdate, now_datetime, nowdate
+
+from sacc_app.ledger import get_balances_as_of
+from sacc_app.notify import get_branding_context
+
+STATEMENT_TEMPLATE = "templates/statements/member_statement.html"
+STATEMENT_FORMATS = ("html", "pdf")
+
+# Members per background job, and statements per commit within it
+STATEMENT_CHUNK = 500
+STATEMENT_COMMIT = 50
+
+# Compiled once per worker process
+_statement_template = None
+
+
+def start_statement_run(from_date, to_date, format="html", members=None):
+	"""
+	Creates the run and its chunks and queues a job per chunk; returns the SACCO Job Run name.
+	`members` defaults to every member with a savings account.
+	"""
+	if members is None:
+		members = frappe.db.sql_list("""
+			SELECT name FROM `tabSACCO Member`
+			WHERE IFNULL(savings_account, '') != ''
+			ORDER BY name
+		""")
+
+	chunks = [members[start:start + STATEMENT_CHUNK] for start in range(0, len(members), STATEMENT_CHUNK)]
+	run = frappe.get_doc({
+		"doctype": "SACCO Job Run",
+		"job_name": "Member Statement Run",
+		"status": "Running" if chunks else "Completed",
+		"started_at": now_datetime(),
+		"details": json.dumps({"from_date": str(from_date), "to_date": str(to_date), "format": format,
+			"members": len(members), "chunks": len(chunks), "completed_chunks": 0, "failed_chunks": 0})
+	})
+	run.insert(ignore_permissions=True)
+
+	for chunk_no, chunk in enumerate(chunks, start=1):
+		frappe.get_doc({
+			"doctype": "SACCO Statement Chunk",
+			"job_run": run.name,
+			"chunk_no": chunk_no,
+			"member_count": len(chunk),
+			"members": json.dumps(chunk)
+		}).insert(ignore_permissions=True)
+
+	queue_statement_chunks(run.name)
+	return run.name
+
+
+def start_monthly_statement_run():
+	"""Monthly task: statements for the month just ended, when enabled in SACCO Settings."""
+	if not cint(frappe.db.get_single_value("SACCO Settings", "monthly_member_statements")):
+		return
+
+	last_month = add_days(get_first_day(nowdate()), -1)
+	format = (frappe.db.get_single_value("SACCO Settings", "statement_format") or "HTML").lower()
+	start_statement_run(get_first_day(last_month), get_last_day(last_month), format)
+
+
+def resume_statement_run(run):
+	"""Re-queues every chunk of `run` that has not completed. Returns the number queued."""
+	queued = queue_statement_chunks(run)
+	if queued:
+		frappe.db.set_value("SACCO Job Run", run, {"status": "Running", "finished_at": None, "error": None})
+	return queued
+
+
+def queue_statement_chunks(run):
+	chunks = frappe.db.sql_list("""
+		SELECT name FROM `tabSACCO Statement Chunk`
+		WHERE job_run = %s AND status != 'Completed'
+		ORDER BY chunk_no
+	""", (run,))
+	for chunk in chunks:
+		# One job per chunk at a time: re-queuing a chunk that is still running is a no-op
+		frappe.enqueue(
+			"sacc_app.statements.run_statement_chunk",
+			queue="long",
+			timeout=3600,
+			job_id=f"sacco_statement_chunk::{chunk}",
+			deduplicate=True,
+			chunk=chunk,
+			enqueue_after_commit=True
+		)
+	return len(chunks)
+
+
+def run_statement_chunk(chunk):
+	"""Background job: generates the statements of one chunk, then updates the run's progress."""
+	chunk = frappe.get_doc("SACCO Statement Chunk", chunk)
+	if chunk.status == "Completed":
+		return
+
+	params = frappe._dict(json.loads(frappe.db.get_value("SACCO Job Run", chunk.job_run, "details") or "{}"))
+	chunk.db_set({"status": "Running", "attempts": cint(chunk.attempts) + 1, "error": None})
+	frappe.db.commit()
+
+	try:
+		generated = generate_statements(json.loads(chunk.members or "[]"), params.from_date, params.to_date, params.format)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title="Member Statement Run")
+		chunk.db_set({"status": "Failed", "finished_at": now_datetime(), "error": frappe.get_traceback()})
+	else:
+		chunk.db_set({"status": "Completed", "finished_at": now_datetime(), "statements": generated})
+	frappe.db.commit()
+
+	update_run_progress(chunk.job_run)
+	frappe.db.commit()
+
+
+def update_run_progress(run):
+	"""Recomputes the run's progress from its chunks; the last chunk to finish closes the run."""
+	# Serializes chunks finishing at the same time
+	details = frappe.db.sql("SELECT details FROM `tabSACCO Job Run` WHERE name = %s FOR UPDATE", (run,))[0][0]
+	counts = {status: (count, cint(statements)) for status, count, statements in frappe.db.sql("""
+		SELECT status, COUNT(*), SUM(statements) FROM `tabSACCO Statement Chunk`
+		WHERE job_run = %s GROUP BY status
+	""", (run,))}
+
+	total = sum(count for count, _ in counts.values())
+	completed = counts.get("Completed", (0, 0))[0]
+	failed = counts.get("Failed", (0, 0))[0]
+	details = dict(json.loads(details or "{}"), completed_chunks=completed, failed_chunks=failed)
+
+	values = {
+		"progress": 100 * (completed + failed) / total if total else 100,
+		"rows_affected": sum(statements for _, statements in counts.values()),
+		"details": json.dumps(details)
+	}
+	if completed + failed == total:
+		started_at = frappe.db.get_value("SACCO Job Run", run, "started_at")
+		values.update(
+			status="Failed" if failed else "Completed",
+			finished_at=now_datetime(),
+			duration=(now_datetime() - started_at).total_seconds() if started_at else 0,
+			error=f"{failed} of {total} chunks failed. Resume the run to retry them." if failed else None
+		)
+	frappe.db.set_value("SACCO Job Run", run, values, update_modified=False)
+
+
+def generate_statements(members, from_date, to_date, format="html"):
+	"""Renders and stores the statements of `members` not yet generated for the period. Returns the count generated."""
+	from_date, to_date = getdate(from_date), getdate(to_date)
+	done = set(frappe.db.sql_list("""
+		SELECT attached_to_name FROM `tabFile`
+		WHERE attached_to_doctype = 'SACCO Member' AND attached_to_name IN %s AND file_name IN %s
+	""", (tuple(members), tuple(get_statement_file_name(m, from_date, to_date, format) for m in members)))) if members else set()
+
+	pending = [m for m in members if m not in done]
+	branding = get_branding_context()
+	generated = 0
+	for start in range(0, len(pending), STATEMENT_COMMIT):
+		batch = pending[start:start + STATEMENT_COMMIT]
+		for member, context in get_statement_data(batch, from_date, to_date).items():
+			context.update(branding)
+			save_statement(member, get_statement_file_name(member, from_date, to_date, format), render_statement(context, format))
+			generated += 1
+		frappe.db.commit()
+	return generated
+
+
+def get_statement_data(members, from_date, to_date):
+	"""{member: template context} for the period, from one query per section for the whole batch."""
+	members = {m.name: m for m in frappe.db.sql("""
+		SELECT name, member_name, email, phone, savings_account, ledger_account
+		FROM `tabSACCO Member` WHERE name IN %s
+	""", (tuple(members),), as_dict=True)} if members else {}
+	if not members:
+		return {}
+
+	names = tuple(members)
+	period = {"members": names, "from_date": from_date, "to_date": to_date}
+	savings_accounts = [m.savings_account for m in members.values() if m.savings_account]
+	loan_accounts = [m.ledger_account for m in members.values() if m.ledger_account]
+
+	# Savings accounts are liabilities: the member's balance is credit - debit
+	opening = get_balances_as_of(add_days(from_date, -1), accounts=savings_accounts)
+	closing = get_balances_as_of(to_date, accounts=savings_accounts)
+	loan_balances = get_balances_as_of(to_date, accounts=loan_accounts)
+
+	contexts = {}
+	for name, member in members.items():
+		contexts[name] = frappe._dict(
+			member=member,
+			from_date=from_date,
+			to_date=to_date,
+			generated_on=nowdate(),
+			savings=frappe._dict(
+				opening_balance=-flt(opening.get(member.savings_account), 2),
+				closing_balance=-flt(closing.get(member.savings_account), 2),
+				deposits=0,
+				withdrawals=0,
+				transactions=[]
+			),
+			loans=[],
+			loan_balance=flt(loan_balances.get(member.ledger_account), 2),
+			repayments=[],
+			welfare=[]
+		)
+
+	for row in frappe.db.sql("""
+		SELECT member, name, posting_date, type, amount, payment_mode, reference_number
+		FROM `tabSACCO Savings`
+		WHERE docstatus = 1 AND member IN %(members)s AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+		ORDER BY member, posting_date, creation
+	""", period, as_dict=True):
+		savings = contexts[row.member].savings
+		row.amount = flt(row.amount, 2)
+		savings.transactions.append(row)
+		if row.type == "Withdrawal":
+			savings.withdrawals += row.amount
+		else:
+			savings.deposits += row.amount
+
+	for row in frappe.db.sql("""
+		SELECT member, name, loan_product, status, loan_amount, monthly_installment, outstanding_balance
+		FROM `tabSACCO Loan`
+		WHERE docstatus = 1 AND member IN %(members)s AND DATE(creation) <= %(to_date)s
+		ORDER BY member, creation
+	""", period, as_dict=True):
+		for field in ("loan_amount", "monthly_installment", "outstanding_balance"):
+			row[field] = flt(row[field], 2)
+		contexts[row.member].loans.append(row)
+
+	for row in frappe.db.sql("""
+		SELECT member, name, loan, payment_date, payment_amount, payment_mode, reference_number
+		FROM `tabSACCO Loan Repayment`
+		WHERE docstatus = 1 AND member IN %(members)s AND payment_date BETWEEN %(from_date)s AND %(to_date)s
+		ORDER BY member, payment_date, creation
+	""", period, as_dict=True):
+		row.payment_amount = flt(row.payment_amount, 2)
+		contexts[row.member].repayments.append(row)
+
+	for row in frappe.db.sql("""
+		SELECT member, name, posting_date, type, purpose, contribution_amount
+		FROM `tabSACCO Welfare`
+		WHERE docstatus = 1 AND member IN %(members)s AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+		ORDER BY member, posting_date, creation
+	""", period, as_dict=True):
+		row.contribution_amount = flt(row.contribution_amount, 2)
+		contexts[row.member].welfare.append(row)
+
+	return contexts
+
+
+def get_statement_template():
+	global _statement_template
+	if _statement_template is None:
+		_statement_template = frappe.get_jenv().get_template(STATEMENT_TEMPLATE)
+	return _statement_template
+
+
+def render_statement(context, format="html"):
+	html = get_statement_template().render(context)
+	if format == "pdf":
+		from frappe.utils.pdf import get_pdf
+		return get_pdf(html)
+	return html
+
+
+def save_statement(member, file_name, content):
+	frappe.get_doc({
+		"doctype": "File",
+		"file_name": file_name,
+		"attached_to_doctype": "SACCO Member",
+		"attached_to_name": member,
+		"is_private": 1,
+		"content": content
+	}).insert(ignore_permissions=True)
+
+
+def get_statement_file_name(member, from_date, to_date, format="html"):
+	return f"Statement-{member}-{getdate(from_date)}-{getdate(to_date)}.{format}"
@@ -246,6 +246,14 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Full Details"}}
                 }
             },
+            "/sacc_app.member_api.recalculate_member_balances": {
+                "post": {
+                    "tags": ["Members"],
+                    "summary": "Recalculate Member Balances from the GL (repair)",
+                    "parameters": [{"name": "member_id", "in": "query", "schema": {"type": "string"}, "description": "Omit to rebuild all members in the background"}],
+                    "responses": {"200": {"description": "Recalculated balances or queued job"}}
+                }
+            },
             "/sacc_app.api.get_member_financial_history": {
                 "get": {
                     "tags": ["Members"],
@@ -280,6 +288,30 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Success"}}
                 }
             },
+            "/sacc_app.bulk_savings_api.record_bulk_savings_deposits": {
+                "post": {
+                    "tags": ["Savings"],
+                    "summary": "Record Bulk Savings Deposits",
+                    "description": "Validates and posts a batch of deposits (JSON rows or CSV upload with member, amount, mode, reference, posting_date columns) in one transaction. Returns per-row results.",
+                    "requestBody": {"content": {
+                        "application/json": {"schema": {"type": "object", "properties": {"rows": {"type": "array", "items": {"type": "object", "properties": {"member": {"type": "string"}, "amount": {"type": "number"}, "mode": {"type": "string"}, "reference": {"type": "string"}, "posting_date": {"type": "string", "format": "date"}}}}, "skip_invalid": {"type": "integer", "default": 1}}}},
+                        "multipart/form-data": {"schema": {"type": "object", "properties": {"file": {"type": "string", "format": "binary"}, "skip_invalid": {"type": "integer", "default": 1}}}}
+                    }},
+                    "responses": {"200": {"description": "Per-row Results"}}
+                }
+            },
+            "/sacc_app.checkoff_api.import_checkoff_remittance": {
+                "post": {
+                    "tags": ["Loans"],
+                    "summary": "Import Payroll Check-off Remittance",
+                    "description": "Splits each member's remitted amount across installments due on their active loans (oldest loan first), then savings, and posts the remittance as one Journal Entry. JSON rows or CSV upload with member (or national_id) and amount columns.",
+                    "requestBody": {"content": {
+                        "application/json": {"schema": {"type": "object", "properties": {"employer": {"type": "string"}, "posting_date": {"type": "string", "format": "date"}, "payment_mode": {"type": "string", "default": "Bank Transfer"}, "reference_number": {"type": "string"}, "rows": {"type": "array", "items": {"type": "object", "properties": {"member": {"type": "string"}, "national_id": {"type": "string"}, "amount": {"type": "number"}}}}, "skip_invalid": {"type": "integer", "default": 1}}, "required": ["employer"]}},
+                        "multipart/form-data": {"schema": {"type": "object", "properties": {"employer": {"type": "string"}, "posting_date": {"type": "string", "format": "date"}, "payment_mode": {"type": "string"}, "reference_number": {"type": "string"}, "file": {"type": "string", "format": "binary"}, "skip_invalid": {"type": "integer", "default": 1}}}}
+                    }},
+                    "responses": {"200": {"description": "Remittance totals and ID"}}
+                }
+            },
             "/sacc_app.api.get_all_savings_deposits": {
                 "get": {
                     "tags": ["Savings"],
@@ -294,6 +326,21 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Growth Data"}}
                 }
             },
+            "/sacc_app.dashboard_api.get_activity_trends": {
+                "get": {
+                    "tags": ["Reports"],
+                    "summary": "Get Activity Trends (Time Series from Daily/Monthly Rollups)",
+                    "parameters": [
+                        {"name": "metrics", "in": "query", "schema": {"type": "string"}, "description": "Comma-separated or JSON list of Deposits, Withdrawals, Repayments, Disbursements, Welfare Contributions, Welfare Withdrawals, Expenses (default: all)"},
+                        {"name": "granularity", "in": "query", "schema": {"type": "string", "enum": ["day", "week", "month", "quarter", "year"], "default": "month"}},
+                        {"name": "from_date", "in": "query", "schema": {"type": "string", "format": "date"}, "description": "Default: 11 months before to_date"},
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}, "description": "Default: today"},
+                        {"name": "category", "in": "query", "schema": {"type": "string"}, "description": "Expense account, to narrow Expenses"},
+                        {"name": "company", "in": "query", "schema": {"type": "string"}}
+                    ],
+                    "responses": {"200": {"description": "One entry per period with each metric's amount and count, zero-filled"}}
+                }
+            },
             "/sacc_app.api.get_savings_dashboard": {
                 "get": {
                     "tags": ["Savings"],
@@ -333,6 +380,31 @@ def get_swagger_spec():
             },
 
             # --- Loans ---
+            "/sacc_app.loan_calculator_api.get_loan_quotes": {
+                "get": {
+                    "tags": ["Loans"],
+                    "summary": "Batch Loan Quotes (amounts x periods) for a Product",
+                    "parameters": [
+                        {"name": "loan_product", "in": "query", "schema": {"type": "string"}, "required": True},
+                        {"name": "amounts", "in": "query", "schema": {"type": "string"}, "required": True, "description": "JSON list or comma-separated amounts"},
+                        {"name": "periods", "in": "query", "schema": {"type": "string"}, "description": "JSON list or comma-separated months; defaults to the product maximum"},
+                        {"name": "include_schedule", "in": "query", "schema": {"type": "integer", "default": 1}}
+                    ],
+                    "responses": {"200": {"description": "Installment, total interest and schedule per scenario"}}
+                }
+            },
+            "/sacc_app.loan_calculator_api.simulate_loan": {
+                "get": {
+                    "tags": ["Loans"],
+                    "summary": "What-if Simulation (lump sum, term or rate change) for an Active Loan",
+                    "parameters": [
+                        {"name": "loan_id", "in": "query", "schema": {"type": "string"}, "required": True},
+                        {"name": "events", "in": "query", "schema": {"type": "string"}, "description": "JSON list, e.g. [{\"type\": \"lump_sum\", \"amount\": 5000, \"mode\": \"reduce_term\"}, {\"type\": \"term_change\", \"months\": 6}, {\"type\": \"rate_change\", \"interest_rate\": 1.5}]"},
+                        {"name": "include_schedule", "in": "query", "schema": {"type": "integer", "default": 1}}
+                    ],
+                    "responses": {"200": {"description": "Current vs simulated installment, term, interest and total cost"}}
+                }
+            },
             "/sacc_app.api.apply_for_loan": {
                 "post": {
                     "tags": ["Loans"],
@@ -342,6 +414,19 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Applied"}}
                 }
             },
+            "/sacc_app.api.get_eligible_guarantors": {
+                "get": {
+                    "tags": ["Loans"],
+                    "summary": "Members with Free Guarantee Capacity, Ranked",
+                    "parameters": [
+                        {"name": "amount", "in": "query", "schema": {"type": "number", "default": 0}, "description": "Minimum free capacity"},
+                        {"name": "borrower", "in": "query", "schema": {"type": "string"}, "description": "Member to exclude"},
+                        {"name": "search", "in": "query", "schema": {"type": "string"}},
+                        {"name": "limit", "in": "query", "schema": {"type": "integer", "default": 20}}
+                    ],
+                    "responses": {"200": {"description": "Guarantors with savings, exposure, limit and free capacity"}}
+                }
+            },
             "/sacc_app.api.submit_loan_application": {
                 "post": {
                     "tags": ["Loans"],
@@ -366,6 +451,49 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Disbursed"}}
                 }
             },
+            "/sacc_app.loan_batch_api.start_loan_disbursement_run": {
+                "post": {
+                    "tags": ["Loans"],
+                    "summary": "Queue a Batch Disbursement Run for Many Loans",
+                    "requestBody": {"content": {"application/json": {"schema": {"type": "object", "properties": {"loan_ids": {"type": "array", "items": {"type": "string"}}, "approve": {"type": "integer", "default": 0, "description": "1 to approve loans Pending Approval in the same run"}}, "required": ["loan_ids"]}}}},
+                    "responses": {"200": {"description": "Run ID to poll with get_job_run_status"}}
+                }
+            },
+            "/sacc_app.api.get_job_run_status": {
+                "get": {
+                    "tags": ["Loans"],
+                    "summary": "Background Job Run Status and Per-Item Outcomes",
+                    "parameters": [
+                        {"name": "run_id", "in": "query", "schema": {"type": "string"}, "required": True}
+                    ],
+                    "responses": {"200": {"description": "Status, progress and details"}}
+                }
+            },
+            "/sacc_app.api.run_interest_accrual": {
+                "post": {
+                    "tags": ["Loans"],
+                    "summary": "Queue Daily Interest Accrual for a Date Range (re-runnable)",
+                    "requestBody": {"content": {"application/json": {"schema": {"type": "object", "properties": {"from_date": {"type": "string", "format": "date"}, "to_date": {"type": "string", "format": "date"}}}}}},
+                    "responses": {"200": {"description": "Run ID to poll with get_job_run_status"}}
+                }
+            },
+            "/sacc_app.api.start_member_statement_run": {
+                "post": {
+                    "tags": ["Members"],
+                    "summary": "Queue Member Statements for a Period (default: last month)",
+                    "description": "Generates statements in parallel background jobs and attaches each to its member as a private File.",
+                    "requestBody": {"content": {"application/json": {"schema": {"type": "object", "properties": {"from_date": {"type": "string", "format": "date"}, "to_date": {"type": "string", "format": "date"}, "format": {"type": "string", "enum": ["html", "pdf"], "default": "html"}, "members": {"type": "array", "items": {"type": "string"}, "description": "Member IDs; all members when omitted"}}}}}},
+                    "responses": {"200": {"description": "Run ID to poll with get_job_run_status"}}
+                }
+            },
+            "/sacc_app.api.resume_member_statement_run": {
+                "post": {
+                    "tags": ["Members"],
+                    "summary": "Resume a Member Statement Run (re-queues unfinished chunks)",
+                    "requestBody": {"content": {"application/json": {"schema": {"type": "object", "properties": {"run_id": {"type": "string"}}, "required": ["run_id"]}}}},
+                    "responses": {"200": {"description": "Chunks re-queued"}}
+                }
+            },
             "/sacc_app.api.mark_loan_default": {
                 "post": {
                     "tags": ["Loans"],
@@ -521,9 +649,11 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Profit & Loss Statement",
+                    "description": "Served from cache until new ledger activity; the cache object gives hit and age_seconds.",
                     "parameters": [
                         {"name": "from_date", "in": "query", "schema": {"type": "string", "format": "date"}},
-                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}}
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "refresh", "in": "query", "schema": {"type": "integer", "default": 0}, "description": "1 to recompute instead of using the cached result"}
                     ],
                     "responses": {"200": {"description": "P&L Report"}}
                 }
@@ -532,7 +662,11 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Balance Sheet",
-                    "parameters": [{"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}}],
+                    "description": "Served from cache until new ledger activity; the cache object gives hit and age_seconds.",
+                    "parameters": [
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "refresh", "in": "query", "schema": {"type": "integer", "default": 0}, "description": "1 to recompute instead of using the cached result"}
+                    ],
                     "responses": {"200": {"description": "Balance Sheet"}}
                 }
             },
@@ -540,9 +674,11 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Trial Balance",
+                    "description": "Served from cache until new ledger activity; the cache object gives hit and age_seconds.",
                     "parameters": [
                         {"name": "from_date", "in": "query", "schema": {"type": "string", "format": "date"}},
-                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}}
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "refresh", "in": "query", "schema": {"type": "integer", "default": 0}, "description": "1 to recompute instead of using the cached result"}
                     ],
                     "responses": {"200": {"description": "Trial Balance"}}
                 }
@@ -551,12 +687,13 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Account Statement (GL)",
-                    "description": "Get General Ledger statement. Provide either 'account' or 'member'.",
+                    "description": "Get General Ledger statement. Provide either 'account' or 'member'. Served from cache until new ledger activity.",
                     "parameters": [
                         {"name": "account", "in": "query", "schema": {"type": "string"}, "description": "Account Name or ID"},
                         {"name": "member", "in": "query", "schema": {"type": "string"}, "description": "Member ID (resolves to Savings Account)"},
                         {"name": "from_date", "in": "query", "schema": {"type": "string", "format": "date"}},
-                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}}
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "refresh", "in": "query", "schema": {"type": "integer", "default": 0}, "description": "1 to recompute instead of using the cached result"}
                     ],
                     "responses": {"200": {"description": "Statement"}}
                 }
@@ -572,6 +709,11 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Loan Aging Report",
+                    "parameters": [
+                        {"name": "bucket", "in": "query", "schema": {"type": "string"}, "description": "PAR bucket (Current, PAR 1, PAR 30, PAR 60, PAR 90) or aging label (0-30 ... 120+)"},
+                        {"name": "loan_product", "in": "query", "schema": {"type": "string"}},
+                        {"name": "member", "in": "query", "schema": {"type": "string"}}
+                    ],
                     "responses": {"200": {"description": "Report"}}
                 }
             },
@@ -598,14 +740,15 @@ def get_swagger_spec():
                 "get": {
                     "tags": ["Reports"],
                     "summary": "Loan Ledger Report",
-                    "description": "Get loan ledger transactions with running balance. Filter by date range, member, or loan ID.",
+                    "description": "Get loan ledger transactions with running balance. Filter by date range, member, or loan ID. Pass the returned next_cursor to fetch the next page; the running balance carries over between pages.",
                     "parameters": [
                         {"name": "date_from", "in": "query", "schema": {"type": "string", "format": "date"}},
                         {"name": "date_to", "in": "query", "schema": {"type": "string", "format": "date"}},
                         {"name": "member", "in": "query", "schema": {"type": "string"}},
                         {"name": "loan_id", "in": "query", "schema": {"type": "string"}},
-                        {"name": "limit_start", "in": "query", "schema": {"type": "integer", "default": 0}},
-                        {"name": "limit_page_length", "in": "query", "schema": {"type": "integer", "default": 100}}
+                        {"name": "cursor", "in": "query", "schema": {"type": "string"}, "description": "next_cursor from the previous page"},
+                        {"name": "limit_start", "in": "query", "schema": {"type": "integer", "default": 0}, "description": "Offset paging; prefer cursor for deep pages"},
+                        {"name": "limit_page_length", "in": "query", "schema": {"type": "integer", "default": 100, "maximum": 1000}}
                     ],
                     "responses": {"200": {"description": "Ledger Report with Running Balance"}}
                 }
@@ -640,6 +783,68 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "Trails"}}
                 }
             },
+            "/sacc_app.export_api.export_savings_transactions": {
+                "get": {
+                    "tags": ["Reports"],
+                    "summary": "Export Savings Transactions",
+                    "description": "Streams every savings transaction matching the filters of get_savings_transactions, without paging.",
+                    "parameters": [
+                        {"name": "format", "in": "query", "schema": {"type": "string", "enum": ["csv", "xlsx"], "default": "csv"}},
+                        {"name": "member", "in": "query", "schema": {"type": "string"}},
+                        {"name": "type", "in": "query", "schema": {"type": "string"}},
+                        {"name": "date_from", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "date_to", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "searchTerm", "in": "query", "schema": {"type": "string"}}
+                    ],
+                    "responses": {"200": {"description": "CSV or XLSX file, streamed"}}
+                }
+            },
+            "/sacc_app.export_api.export_transactions": {
+                "get": {
+                    "tags": ["Reports"],
+                    "summary": "Export Transactions",
+                    "description": "Streams every transaction matching the filters of get_all_transactions, without paging.",
+                    "parameters": [
+                        {"name": "format", "in": "query", "schema": {"type": "string", "enum": ["csv", "xlsx"], "default": "csv"}},
+                        {"name": "category", "in": "query", "schema": {"type": "string"}},
+                        {"name": "start_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "end_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "status", "in": "query", "schema": {"type": "string"}},
+                        {"name": "search", "in": "query", "schema": {"type": "string"}}
+                    ],
+                    "responses": {"200": {"description": "CSV or XLSX file, streamed"}}
+                }
+            },
+            "/sacc_app.export_api.export_loan_ledger_report": {
+                "get": {
+                    "tags": ["Reports"],
+                    "summary": "Export Loan Ledger",
+                    "description": "Streams the whole loan ledger with its running balance, with the filters of get_loan_ledger_report.",
+                    "parameters": [
+                        {"name": "format", "in": "query", "schema": {"type": "string", "enum": ["csv", "xlsx"], "default": "csv"}},
+                        {"name": "date_from", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "date_to", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "member", "in": "query", "schema": {"type": "string"}},
+                        {"name": "loan_id", "in": "query", "schema": {"type": "string"}}
+                    ],
+                    "responses": {"200": {"description": "CSV or XLSX file, streamed"}}
+                }
+            },
+            "/sacc_app.export_api.export_account_statement": {
+                "get": {
+                    "tags": ["Reports"],
+                    "summary": "Export Account Statement",
+                    "description": "Streams an account statement consolidated by voucher, with an opening row and running balance. Provide either 'account' or 'member'.",
+                    "parameters": [
+                        {"name": "format", "in": "query", "schema": {"type": "string", "enum": ["csv", "xlsx"], "default": "csv"}},
+                        {"name": "account", "in": "query", "schema": {"type": "string"}},
+                        {"name": "member", "in": "query", "schema": {"type": "string"}},
+                        {"name": "from_date", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "to_date", "in": "query", "schema": {"type": "string", "format": "date"}}
+                    ],
+                    "responses": {"200": {"description": "CSV or XLSX file, streamed"}}
+                }
+            },
 
             # --- Locations ---
             "/sacc_app.location_api.seed_kenya_data": {
@@ -818,10 +1023,10 @@ def get_swagger_spec():
                     "parameters": [
                         {"name": "limit_start", "in": "query", "schema": {"type": "integer", "default": 0}},
                         {"name": "limit_page_length", "in": "query", "schema": {"type": "integer", "default": 20}},
-                        {"name": "category", "in": "query", "schema": {"type": "string", "enum": ["Savings", "Loan", "Expense"]}},
+                        {"name": "category", "in": "query", "schema": {"type": "string", "enum": ["Savings", "Loan", "Loan Repayment", "Loan Disbursement", "Registration Fee", "Expense", "General"]}},
                         {"name": "start_date", "in": "query", "schema": {"type": "string", "format": "date"}},
                         {"name": "end_date", "in": "query", "schema": {"type": "string", "format": "date"}},
-                        {"name": "status", "in": "query", "schema": {"type": "string", "enum": ["Completed", "Cancelled", "Draft"]}},
+                        {"name": "status", "in": "query", "schema": {"type": "string", "enum": ["Completed", "Cancelled"]}},
                         {"name": "search", "in": "query", "schema": {"type": "string"}}
                     ],
                     "responses": {"200": {"description": "List of Transactions"}}
@@ -865,6 +1070,20 @@ def get_swagger_spec():
                     "responses": {"200": {"description": "List"}}
                 }
             },
+            "/sacc_app.api.get_chart_of_accounts": {
+                "get": {
+                    "tags": ["Accounts"],
+                    "summary": "Chart of Accounts with Rolled-up Balances (one GL query, paginated)",
+                    "parameters": [
+                        {"name": "as_of", "in": "query", "schema": {"type": "string", "format": "date"}},
+                        {"name": "parent_account", "in": "query", "schema": {"type": "string"}, "description": "Only this account and its descendants"},
+                        {"name": "leaf_only", "in": "query", "schema": {"type": "integer", "default": 0}},
+                        {"name": "start", "in": "query", "schema": {"type": "integer", "default": 0}},
+                        {"name": "page_length", "in": "query", "schema": {"type": "integer", "default": 500}}
+                    ],
+                    "responses": {"200": {"description": "Accounts in tree order with indent and balance"}}
+                }
+            },
             "/sacc_app.api.update_account": {
                 "post": {
                     "tags": ["Accounts"],
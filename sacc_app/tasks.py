@@ -2,52 +2,144 @@ import frappe
 from frappe import _
 from frappe.utils import add_days, getdate, format_date
 
+# Loans per set-based UPDATE; keeps row locks and statement size bounded
+DEMANDED_AMOUNTS_CHUNK = 5000
+
+# Used until the offsets are saved in SACCO Settings
+DEFAULT_REMINDER_DAYS_BEFORE_DUE = "7,3,1"
+DEFAULT_REMINDER_DAYS_OVERDUE = "1,7,30"
+
 def send_loan_reminders():
 	"""
-	Daily task to send reminders for loans due tomorrow.
+	Daily task: reminders for unpaid installments falling due in N days (upcoming) or
+	N days past due (overdue), per the offsets in SACCO Settings.
+
+	Only the handful of target due dates are looked up, through the due_date index, so the
+	cost follows the number of reminders rather than the portfolio. Every reminder is logged
+	under a unique installment/offset key in the same transaction as its outbox row,
+	so re-running the job never sends twice.
 	"""
-	tomorrow = add_days(frappe.utils.nowdate(), 1)
-	
-	# Fetch all active loans
-	active_loans = frappe.get_all("SACCO Loan", filters={"status": "Active"}, fields=["name", "member", "repayment_schedule", "monthly_installment"])
-	
-	import json
-	for loan in active_loans:
-		if not loan.repayment_schedule:
-			continue
-			
-		try:
-			schedule = json.loads(loan.repayment_schedule)
-		except:
-			continue
-			
-		for entry in schedule:
-			# Check if any installment is due tomorrow
-			# Entry format assumed from common Frappe patterns: {"payment_date": "YYYY-MM-DD", "principal_amount": ..., "interest_amount": ...}
-			if entry.get("payment_date") == tomorrow:
-				send_reminder_email(loan, entry)
-
-def send_reminder_email(loan, schedule_entry):
+	from sacc_app.jobs import track_job_run
+	from sacc_app.notify import queue_member_emails
+
+	with track_job_run("Loan Reminders") as run:
+		today = getdate(frappe.utils.nowdate())
+		target_dates = get_reminder_dates(today)
+		if not target_dates:
+			return
+
+		due = frappe.db.sql("""
+			SELECT inst.name AS installment, inst.due_date,
+				inst.amount - inst.principal_paid - inst.interest_paid AS amount_due,
+				loan.name AS loan, loan.member, loan.monthly_installment
+			FROM `tabSACCO Loan Installment` inst
+			INNER JOIN `tabSACCO Loan` loan ON loan.name = inst.parent
+			WHERE inst.parenttype = 'SACCO Loan'
+				AND inst.due_date IN %(dates)s
+				AND inst.status != 'Paid'
+				AND loan.status IN ('Active', 'Defaulted')
+				AND loan.docstatus = 1
+		""", {"dates": tuple(target_dates)}, as_dict=True)
+
+		for row in due:
+			row.days_offset = (getdate(row.due_date) - today).days
+			row.reminder_type = "Upcoming" if row.days_offset >= 0 else "Overdue"
+			row.dedupe_key = f"{row.installment}:{row.days_offset}"
+
+		sent = set()
+		keys = [row.dedupe_key for row in due]
+		for start in range(0, len(keys), 1000):
+			sent.update(frappe.get_all("SACCO Reminder Log",
+				filters={"name": ["in", keys[start:start + 1000]]}, pluck="name"))
+		due = [row for row in due if row.dedupe_key not in sent]
+		if not due:
+			return
+
+		now = frappe.utils.now_datetime()
+		frappe.db.bulk_insert("SACCO Reminder Log", fields=[
+			"name", "creation", "modified", "owner", "modified_by",
+			"dedupe_key", "loan", "member", "installment", "due_date", "reminder_type", "days_offset", "sent_on"
+		], values=[
+			(row.dedupe_key, now, now, "Administrator", "Administrator",
+				row.dedupe_key, row.loan, row.member, row.installment, row.due_date,
+				row.reminder_type, row.days_offset, today)
+			for row in due
+		], ignore_duplicates=True)
+
+		queue_member_emails([get_reminder_email(row) for row in due])
+		run.rows_affected = len(due)
+
+def get_reminder_dates(today):
+	"""Due dates that trigger a reminder today, from the configured day offsets."""
+	from sacc_app.sacco.doctype.sacco_settings.sacco_settings import parse_day_offsets
+
+	before = frappe.db.get_single_value("SACCO Settings", "reminder_days_before_due")
+	overdue = frappe.db.get_single_value("SACCO Settings", "reminder_days_overdue")
+	before = DEFAULT_REMINDER_DAYS_BEFORE_DUE if before is None else before
+	overdue = DEFAULT_REMINDER_DAYS_OVERDUE if overdue is None else overdue
+
+	dates = {add_days(today, d) for d in parse_day_offsets(before)}
+	dates.update(add_days(today, -d) for d in parse_day_offsets(overdue) if d > 0)
+	return sorted(dates)
+
+def get_reminder_email(row):
 	"""
-	Sends an email reminder to the member.
+	Builds the outbox entry for one due installment.
 	"""
-	from sacc_app.notify import send_member_email
-	
-	due_amount = schedule_entry.get("total_payment") or loan.monthly_installment
-	subject = _("Loan Repayment Reminder - Due Tomorrow")
+	due_amount = row.amount_due or row.monthly_installment
+	due_date = format_date(row.due_date)
+
+	if row.days_offset == 0:
+		when = "is due today"
+	elif row.days_offset == 1:
+		when = "is due tomorrow"
+	elif row.days_offset > 1:
+		when = f"is due in {row.days_offset} days"
+	else:
+		when = f"is overdue by {-row.days_offset} day(s)"
+
+	if row.reminder_type == "Overdue":
+		subject = _("Loan Repayment Overdue")
+		closing = "Please make a payment as soon as possible to avoid penalties."
+	else:
+		subject = _("Loan Repayment Reminder - Due {0}").format(due_date)
+		closing = "Please ensure you have sufficient funds in your account or make a payment via the portal."
+
 	message = f"""
-	<p>This is a reminder that your loan repayment for <strong>{loan.name}</strong> is due tomorrow, <strong>{format_date(schedule_entry.get('payment_date'))}</strong>.</p>
+	<p>This is a reminder that your loan repayment for <strong>{row.loan}</strong> {when}, <strong>{due_date}</strong>.</p>
 	<p>Amount Due: <strong>{frappe.format_value(due_amount, "Currency")}</strong></p>
-	<p>Please ensure you have sufficient funds in your account or make a payment via the portal.</p>
+	<p>{closing}</p>
 	"""
 	
-	send_member_email(loan.member, subject, message)
+	return {"recipient": row.member, "subject": subject, "message": message}
 	
 def update_all_demanded_amounts():
 	"""
-	Scheduled task to update demanded amounts for all active loans.
+	Nightly task: recomputes total_principal_demanded / total_interest_demanded for the
+	whole active book with one UPDATE ... JOIN per chunk of loans. Only loans whose
+	figures changed are written.
 	"""
-	active_loans = frappe.get_all("SACCO Loan", filters={"status": "Active"}, fields=["name"])
-	for l in active_loans:
-		loan_doc = frappe.get_doc("SACCO Loan", l.name)
-		loan_doc.update_demanded_amounts()
+	from sacc_app.jobs import track_job_run
+
+	with track_job_run("Update Demanded Amounts") as run:
+		loans = frappe.get_all("SACCO Loan", filters={"status": "Active", "docstatus": 1}, pluck="name")
+		today = frappe.utils.nowdate()
+
+		for start in range(0, len(loans), DEMANDED_AMOUNTS_CHUNK):
+			chunk = tuple(loans[start:start + DEMANDED_AMOUNTS_CHUNK])
+			frappe.db.sql("""
+				UPDATE `tabSACCO Loan` loan
+				LEFT JOIN (
+					SELECT parent, SUM(principal) AS principal, SUM(interest) AS interest
+					FROM `tabSACCO Loan Installment`
+					WHERE parenttype = 'SACCO Loan' AND parent IN %(loans)s AND due_date <= %(today)s
+					GROUP BY parent
+				) due ON due.parent = loan.name
+				SET loan.total_principal_demanded = IFNULL(due.principal, 0),
+					loan.total_interest_demanded = IFNULL(due.interest, 0)
+				WHERE loan.name IN %(loans)s
+					AND (IFNULL(loan.total_principal_demanded, 0) != IFNULL(due.principal, 0)
+						OR IFNULL(loan.total_interest_demanded, 0) != IFNULL(due.interest, 0))
+			""", {"loans": chunk, "today": today})
+			run.rows_affected += frappe.db._cursor.rowcount
+			frappe.db.commit()
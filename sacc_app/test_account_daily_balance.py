@@ -0,0 +1,40 @@
+import frappe
+from frappe.utils import add_days, flt, nowdate
+from sacc_app.ledger import get_balance_as_of, rebuild_account_balances, update_account_balances
+
+def gl_balance(account, as_of):
+    return flt(frappe.db.sql("""
+        SELECT SUM(debit) - SUM(credit) FROM `tabGL Entry`
+        WHERE account = %s AND posting_date <= %s AND is_cancelled = 0
+    """, (account, as_of))[0][0])
+
+def test_account_daily_balance():
+    print("--- Testing Account Daily Balance Snapshots ---")
+
+    # 1. Rebuild matches the GL for busy accounts at several dates
+    rebuild_account_balances()
+    accounts = frappe.db.sql_list("""
+        SELECT account FROM `tabGL Entry` WHERE is_cancelled = 0
+        GROUP BY account ORDER BY COUNT(*) DESC LIMIT 5
+    """)
+    for account in accounts:
+        for as_of in (nowdate(), add_days(nowdate(), -30), add_days(nowdate(), -365)):
+            snapshot, expected = get_balance_as_of(account, as_of), gl_balance(account, as_of)
+            print(f"{account} @ {as_of}: {snapshot} (GL {expected})")
+            assert abs(snapshot - expected) < 0.01
+
+    # 2. Catch-up after new postings keeps the snapshots in step
+    update_account_balances()
+    for account in accounts:
+        assert abs(get_balance_as_of(account) - gl_balance(account, "2999-12-31")) < 0.01
+
+    # 3. Closing balance of the last row equals the running total of its days
+    if accounts:
+        rows = frappe.db.get_all("SACCO Account Daily Balance", filters={"account": accounts[0]},
+            fields=["debit", "credit", "closing_balance"], order_by="posting_date")
+        assert abs(sum(flt(r.debit) - flt(r.credit) for r in rows) - flt(rows[-1].closing_balance)) < 0.01
+
+    print("--- Account Daily Balance Snapshots Test Passed! ---")
+
+if __name__ == "__main__":
+    test_account_daily_balance()
@@ -0,0 +1,43 @@
+import frappe
+from sacc_app.account_map import get_account_map, get_payment_account, clear_account_map, ACCOUNT_MAP_KEY
+
+def test_account_map():
+    print("--- Testing Cached Account Map ---")
+
+    accounts = get_account_map()
+    print(f"Account map for {accounts.company}: {dict(accounts)}")
+    assert accounts.company
+    assert accounts.cash
+    assert accounts.interest_income
+
+    # 1. Unmapped modes fall back to the cash account
+    assert get_payment_account("Cash") in (accounts.cash, accounts.mode_of_payment.get("Cash"))
+
+    # 2. Second read is served from cache without a rebuild
+    assert frappe.cache().get_value(ACCOUNT_MAP_KEY) is not None
+    assert get_account_map() == accounts
+
+    # 3. Invalidation drops the Redis copy and the next read rebuilds it
+    clear_account_map()
+    assert frappe.cache().get_value(ACCOUNT_MAP_KEY) is None
+    assert get_account_map().cash == accounts.cash
+
+    # 4. Renaming an account runs the after_rename hook and clears the map
+    parent = frappe.db.get_value("Account", accounts.cash, "parent_account")
+    account = frappe.get_doc({
+        "doctype": "Account",
+        "account_name": f"Map Rename Test {frappe.generate_hash(length=6)}",
+        "parent_account": parent,
+        "company": accounts.company,
+        "is_group": 0
+    }).insert(ignore_permissions=True)
+    get_account_map()
+    new_name = frappe.rename_doc("Account", account.name, f"{account.name} Renamed", force=True)
+    assert frappe.db.exists("Account", new_name)
+    assert frappe.cache().get_value(ACCOUNT_MAP_KEY) is None
+    frappe.db.rollback()
+
+    print("--- Cached Account Map Test Passed! ---")
+
+if __name__ == "__main__":
+    test_account_map()
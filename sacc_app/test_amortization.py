@@ -0,0 +1,36 @@
+from sacc_app.amortization import amortize, amortize_many, unit_schedule
+
+def test_amortization():
+    print("--- Testing Amortization Engine ---")
+
+    # 1. Reducing balance: P=10000, r=1% monthly, n=12 -> EMI 888.49
+    quote = amortize(10000, 1, 12, "Reducing Balance", "Monthly")
+    print(f"Reducing Balance - Installment: {quote['monthly_installment']:.2f}, Interest: {quote['total_interest']:.2f}")
+    assert abs(quote["monthly_installment"] - 888.49) < 0.01
+    assert abs(quote["schedule"][0]["interest"] - 100) < 0.01
+    assert quote["schedule"][-1]["interest"] < 10
+    assert abs(sum(r["principal"] for r in quote["schedule"]) - 10000) < 0.1
+
+    # 2. Flat rate: 12% annual over 12 months on 12000 -> 1440 interest
+    quote = amortize(12000, 12, 12, "Flat Rate", "Annually")
+    print(f"Flat Rate - Installment: {quote['monthly_installment']:.2f}, Interest: {quote['total_interest']:.2f}")
+    assert abs(quote["total_interest"] - 1440) < 0.01
+    assert abs(quote["monthly_installment"] - 1120) < 0.01
+    row = quote["schedule"][0]
+    assert abs(row["principal"] + row["interest"] - row["amount"]) < 0.02
+
+    # 3. Batch quotes reuse one unit schedule per period and match single pricing
+    unit_schedule.cache_clear()
+    quotes = amortize_many([5000, 10000, 20000], [6, 12], 1, "Reducing Balance", "Monthly")
+    assert len(quotes) == 6
+    assert unit_schedule.cache_info().misses == 2
+    single = amortize(20000, 1, 12, "Reducing Balance", "Monthly")
+    assert abs(quotes[-1]["monthly_installment"] - single["monthly_installment"]) < 1e-6
+
+    # 4. Zero period yields no schedule
+    assert amortize(1000, 5, 0)["schedule"] == []
+
+    print("--- Amortization Engine Test Passed! ---")
+
+if __name__ == "__main__":
+    test_amortization()
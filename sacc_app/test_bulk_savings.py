@@ -0,0 +1,60 @@
+import frappe
+from frappe.utils import flt
+from sacc_app.bulk_savings_api import record_bulk_savings_deposits
+
+def test_bulk_savings_deposits():
+    print("--- Testing Bulk Savings Deposits ---")
+
+    members = frappe.db.get_all("SACCO Member",
+        filters={"savings_account": ["is", "set"]},
+        fields=["name", "total_savings"],
+        limit=2)
+    if len(members) < 2:
+        print("Need at least two members with savings accounts. Skipping.")
+        return
+
+    before = {m.name: flt(m.total_savings) for m in members}
+    ref = frappe.generate_hash(length=8)
+
+    rows = [
+        {"member": members[0].name, "amount": 1500, "mode": "M-Pesa", "reference": f"{ref}-1"},
+        {"member": members[1].name, "amount": 2500, "mode": "Cash", "reference": f"{ref}-2"},
+        {"member": members[0].name, "amount": 500, "mode": "Cash"},
+        # Invalid rows
+        {"member": "MEM-DOES-NOT-EXIST", "amount": 100},
+        {"member": members[1].name, "amount": 0},
+        {"member": members[1].name, "amount": 100, "reference": f"{ref}-2"},
+    ]
+
+    # 1. All-or-nothing mode rejects the whole batch
+    res = record_bulk_savings_deposits(rows=rows, skip_invalid=0)
+    print(f"Strict mode: {res['message']}")
+    assert res["status"] == "error"
+    assert res["data"]["posted"] == 0
+
+    # 2. Default mode posts valid rows and reports the rest
+    res = record_bulk_savings_deposits(rows=rows)
+    print(f"Lenient mode: {res['message']}")
+    assert res["data"]["posted"] == 3
+    assert res["data"]["failed"] == 3
+    assert all(r["status"] == "Posted" for r in res["data"]["rows"][:3])
+    assert all(r["error"] for r in res["data"]["rows"][3:])
+
+    # 3. Balances updated once per member
+    after = dict(frappe.db.get_all("SACCO Member",
+        filters={"name": ["in", list(before)]},
+        fields=["name", "total_savings"],
+        as_list=True))
+    print(f"Balances before: {before}, after: {after}")
+    assert abs(flt(after[members[0].name]) - before[members[0].name] - 2000) < 0.01
+    assert abs(flt(after[members[1].name]) - before[members[1].name] - 2500) < 0.01
+
+    # 4. Re-posting the same references is rejected
+    res = record_bulk_savings_deposits(rows=rows[:2])
+    print(f"Re-post: {res['message']}")
+    assert res["data"]["posted"] == 0
+
+    print("--- Bulk Savings Deposits Test Passed! ---")
+
+if __name__ == "__main__":
+    test_bulk_savings_deposits()
@@ -0,0 +1,36 @@
+import time
+import frappe
+from frappe.utils import flt
+from sacc_app.api import get_chart_of_accounts
+
+def test_chart_of_accounts():
+    print("--- Testing Chart of Accounts Balances ---")
+    from erpnext.accounts.utils import get_balance_on
+
+    # 1. Full chart in one call, balances match ERPNext for leaves and groups
+    started = time.monotonic()
+    res = get_chart_of_accounts(page_length=5000)
+    print(f"{res['data']['total_count']} accounts in {time.monotonic() - started:.3f}s")
+    assert res["status"] == "success"
+    accounts = res["data"]["accounts"]
+    for acc in [a for a in accounts if a["is_group"]][:3] + [a for a in accounts if not a["is_group"]][:5]:
+        expected = flt(get_balance_on(acc["name"]), 2)
+        print(f"{acc['name']}: {acc['balance']} (ERPNext {expected})")
+        assert abs(acc["balance"] - expected) < 0.01
+
+    # 2. Subtree filtering and pagination
+    group = next((a for a in accounts if a["is_group"] and a["indent"] > 0), None)
+    if group:
+        sub = get_chart_of_accounts(parent_account=group["name"], page_length=2)["data"]
+        assert sub["accounts"][0]["name"] == group["name"] and sub["accounts"][0]["indent"] == 0
+        assert len(sub["accounts"]) <= 2 and sub["total_count"] >= len(sub["accounts"])
+
+    # 3. As-of date before any postings gives zero balances
+    past = get_chart_of_accounts(as_of="1900-01-01", page_length=50)["data"]["accounts"]
+    assert all(a["balance"] == 0 for a in past)
+
+    assert get_chart_of_accounts(parent_account="No Such Account")["status"] == "error"
+    print("--- Chart of Accounts Balances Test Passed! ---")
+
+if __name__ == "__main__":
+    test_chart_of_accounts()
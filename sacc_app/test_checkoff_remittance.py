@@ -0,0 +1,47 @@
+import frappe
+from frappe.utils import flt
+from sacc_app.checkoff_api import import_checkoff_remittance
+
+def test_checkoff_remittance():
+    print("--- Testing Check-off Remittance Import ---")
+
+    loan = frappe.db.get_value("SACCO Loan", {"status": "Active", "docstatus": 1},
+        ["name", "member", "outstanding_balance", "monthly_installment"], as_dict=True)
+    saver = frappe.db.get_value("SACCO Member",
+        {"savings_account": ["is", "set"], "active_loan": ["is", "not set"]}, ["name", "total_savings"], as_dict=True)
+    if not loan or not saver:
+        print("Need an active loan and a member without one. Skipping.")
+        return
+
+    ref = frappe.generate_hash(length=8)
+    rows = [
+        {"member": loan.member, "amount": flt(loan.monthly_installment) + 1000},
+        {"member": saver.name, "amount": 750},
+        {"member": "MEM-DOES-NOT-EXIST", "amount": 100},
+    ]
+
+    res = import_checkoff_remittance("Test Employer", reference_number=ref, rows=rows)
+    print(res["message"], res["data"])
+    assert res["status"] == "success"
+    assert res["data"]["failed_count"] == 1
+
+    remittance = frappe.get_doc("SACCO Checkoff Remittance", res["data"]["remittance"])
+    for line in remittance.lines:
+        print(f"  Row {line.row_no} {line.member}: {line.allocation} {line.amount} {line.loan or ''} {line.status}")
+
+    # Loans first, remainder to savings, everything under one Journal Entry
+    assert remittance.journal_entry
+    loan_lines = [l for l in remittance.lines if l.loan == loan.name]
+    assert all(l.loan_repayment for l in loan_lines)
+    saver_line = [l for l in remittance.lines if l.member == saver.name][0]
+    assert saver_line.allocation == "Savings" and flt(saver_line.amount) == 750
+    assert abs(flt(frappe.db.get_value("SACCO Member", saver.name, "total_savings")) - flt(saver.total_savings) - 750) < 0.01
+
+    # The same remittance reference cannot be posted twice
+    assert import_checkoff_remittance("Test Employer", reference_number=ref, rows=rows)["status"] == "error"
+
+    frappe.db.commit()
+    print("--- Check-off Remittance Import Test Passed! ---")
+
+if __name__ == "__main__":
+    test_checkoff_remittance()
@@ -1,7 +1,6 @@
 
 import frappe
 from frappe.utils import flt, nowdate, add_months
-import json
 
 def test_demanded_amounts():
     print("--- Testing Demanded Amounts Calculation ---")
@@ -56,14 +55,10 @@ def test_demanded_amounts():
     print(f"Initial Interest Demanded: {loan.total_interest_demanded}")
     
     # 4. Manipulate schedule to simulate months passed
-    schedule = json.loads(loan.repayment_schedule)
-    
     # Set first 3 installments to past dates
     for i in range(3):
-        schedule[i]["payment_date"] = add_months(nowdate(), -(3-i))
-        
-    loan.repayment_schedule = json.dumps(schedule)
-    loan.db_set("repayment_schedule", loan.repayment_schedule)
+        frappe.db.set_value("SACCO Loan Installment", loan.installments[i].name,
+            "due_date", add_months(nowdate(), -(3-i)))
     
     # 5. Run update
     print("Simulated 3 months passing...")
@@ -87,6 +82,19 @@ def test_demanded_amounts():
     assert abs(loan.total_principal_demanded - expected_p) < 0.1
     assert abs(loan.total_interest_demanded - expected_i) < 0.1
     
+    # 6. Nightly set-based job produces the same figures and records its run
+    from sacc_app.tasks import update_all_demanded_amounts
+    frappe.db.set_value("SACCO Loan", loan.name, {"total_principal_demanded": 0, "total_interest_demanded": 0})
+    update_all_demanded_amounts()
+    loan.reload()
+    print(f"Batch Principal Demanded: {loan.total_principal_demanded}")
+    assert abs(loan.total_principal_demanded - expected_p) < 0.1
+    assert abs(loan.total_interest_demanded - expected_i) < 0.1
+    
+    run = frappe.get_last_doc("SACCO Job Run", filters={"job_name": "Update Demanded Amounts"})
+    print(f"Job Run: {run.status}, {run.rows_affected} rows in {run.duration:.3f}s")
+    assert run.status == "Completed" and run.rows_affected >= 1
+    
     print("--- Demanded Amounts Test Passed! ---")
 
 if __name__ == "__main__":
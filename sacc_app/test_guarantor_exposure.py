@@ -0,0 +1,54 @@
+import frappe
+from frappe.utils import flt
+from sacc_app.api import get_eligible_guarantors
+from sacc_app.guarantors import (get_guarantor_capacity, get_guarantor_error, rebuild_guarantor_exposure,
+    update_guarantor_exposure)
+
+def test_guarantor_exposure():
+    print("--- Testing Guarantor Exposure Index ---")
+
+    # 1. Rebuild fills the index from active loans
+    rebuild_guarantor_exposure()
+    row = frappe.db.sql("""
+        SELECT g.guarantor_member, COUNT(*) AS active, SUM(g.guarantee_amount) AS total
+        FROM `tabSACCO Guarantor` g
+        INNER JOIN `tabSACCO Loan` l ON l.name = g.parent AND l.docstatus = 1 AND l.status IN ('Active', 'Defaulted')
+        WHERE g.parenttype = 'SACCO Loan' AND g.status != 'Rejected'
+        GROUP BY g.guarantor_member
+        LIMIT 1
+    """, as_dict=True)
+    if row:
+        row = row[0]
+        exposure = frappe.db.get_value("SACCO Guarantor Exposure", row.guarantor_member,
+            ["active_guarantees", "total_guaranteed", "exposure"], as_dict=True)
+        print(f"Guarantor {row.guarantor_member}: {exposure}")
+        assert exposure.active_guarantees == row.active
+        assert abs(flt(exposure.total_guaranteed) - flt(row.total)) < 0.01
+        assert flt(exposure.exposure) <= flt(exposure.total_guaranteed) + 0.01
+
+    # 2. Capacity and limit checks
+    member = frappe.db.get_value("SACCO Member", {"status": "Active"}, "name")
+    if member:
+        update_guarantor_exposure([member])
+        limits = frappe._dict(enforce=1, multiple=1, max_active=0)
+        capacity = get_guarantor_capacity([member], limits)
+        free = flt(capacity[member].free_capacity)
+        print(f"Member {member} free capacity: {free}")
+        rows = [frappe._dict(guarantor_member=member, guarantee_amount=free + 100, status="Pending")]
+        assert get_guarantor_error(rows, capacity, limits)
+        assert get_guarantor_error(rows, capacity, frappe._dict(limits, enforce=0)) is None
+        if free > 0:
+            rows[0].guarantee_amount = free
+            assert get_guarantor_error(rows, capacity, limits) is None
+
+    # 3. Search ranks by free capacity
+    res = get_eligible_guarantors(amount=0, limit=10)
+    guarantors = res["data"]["guarantors"]
+    print(f"Top guarantors: {[(g.member, g.free_capacity) for g in guarantors]}")
+    assert res["status"] == "success"
+    assert all(a.free_capacity >= b.free_capacity for a, b in zip(guarantors, guarantors[1:]))
+
+    print("--- Guarantor Exposure Index Test Passed! ---")
+
+if __name__ == "__main__":
+    test_guarantor_exposure()
@@ -0,0 +1,44 @@
+import frappe
+from frappe.utils import add_days, flt, nowdate
+from sacc_app.accrual import accrue_interest, settle_accrued_interest
+
+def test_interest_accrual():
+    print("--- Testing Daily Interest Accrual ---")
+
+    date = add_days(nowdate(), -1)
+    accrued_before = flt(frappe.db.sql("SELECT SUM(accrued_interest) FROM `tabSACCO Loan`")[0][0])
+
+    # 1. One accrual per product per day, each with its Journal Entry
+    accrue_interest(date, date)
+    accruals = frappe.db.get_all("SACCO Interest Accrual", filters={"accrual_date": date},
+        fields=["name", "loan_product", "loan_count", "amount", "journal_entry"])
+    print(f"Accruals for {date}: {accruals}")
+    assert len({a.loan_product for a in accruals}) == len(accruals)
+    assert all(a.journal_entry for a in accruals)
+
+    # 2. Re-running the same day posts nothing new
+    accrued_after = flt(frappe.db.sql("SELECT SUM(accrued_interest) FROM `tabSACCO Loan`")[0][0])
+    accrue_interest(date, date)
+    assert frappe.db.count("SACCO Interest Accrual", {"accrual_date": date}) == len(accruals)
+    assert abs(flt(frappe.db.sql("SELECT SUM(accrued_interest) FROM `tabSACCO Loan`")[0][0]) - accrued_after) < 0.01
+    print(f"Accrued interest on the book: {accrued_before} -> {accrued_after}")
+
+    # 3. No installment recognizes more than its interest, whether accrued or collected
+    over = frappe.db.sql("""
+        SELECT COUNT(*) FROM `tabSACCO Loan Installment`
+        WHERE GREATEST(interest_accrued, interest_paid) > interest + 0.01
+    """)[0][0]
+    assert over == 0
+
+    # 4. Collected interest clears the accrued balance first, never below zero
+    loan = frappe.db.get_value("SACCO Loan", {"accrued_interest": [">", 0]}, ["name", "accrued_interest"], as_dict=True)
+    if loan:
+        settled = settle_accrued_interest([(loan.name, flt(loan.accrued_interest) + 100)])
+        assert abs(settled[0] - flt(loan.accrued_interest)) < 0.01
+        assert flt(frappe.db.get_value("SACCO Loan", loan.name, "accrued_interest")) == 0
+        frappe.db.rollback()
+
+    print("--- Daily Interest Accrual Test Passed! ---")
+
+if __name__ == "__main__":
+    test_interest_accrual()
@@ -1,7 +1,6 @@
 
 import frappe
 from frappe.utils import flt, nowdate, add_months
-import json
 
 def test_interest_methods():
     print("--- Testing Interest Calculation Methods ---")
@@ -99,7 +98,8 @@ def test_interest_methods():
     assert abs(loan_red.monthly_installment - 888.49) < 0.1
     
     # Verify schedule portions
-    schedule = json.loads(loan_red.repayment_schedule)
+    schedule = loan_red.get_repayment_schedule()
+    assert len(loan_red.installments) == 12
     # First month: Interest = 10000 * 0.01 = 100. Principal = 888.49 - 100 = 788.49.
     print(f"First Month - Principal: {schedule[0]['principal']}, Interest: {schedule[0]['interest']}")
     assert abs(schedule[0]['interest'] - 100) < 0.1
@@ -0,0 +1,43 @@
+import frappe
+from sacc_app.loan_batch_api import run_loan_disbursement
+from sacc_app.api import get_job_run_status
+
+def test_loan_disbursement_run():
+    print("--- Testing Batch Loan Disbursement Run ---")
+
+    loans = frappe.db.get_all("SACCO Loan", filters={"status": "Approved", "docstatus": 0}, pluck="name", limit=5)
+    if not loans:
+        print("No approved draft loans found. Skipping.")
+        return
+
+    # 1. Run synchronously with one unknown loan mixed in
+    run = frappe.get_doc({"doctype": "SACCO Job Run", "job_name": "Loan Disbursement Run"}).insert(ignore_permissions=True)
+    run_loan_disbursement(loans + ["LOAN-DOES-NOT-EXIST"], run=run.name)
+
+    status = get_job_run_status(run.name)["data"]
+    details = status.details
+    print(f"Run {run.name}: {status.status}, {details['disbursed']} disbursed, {details['failed']} failed")
+    for loan, outcome in details["loans"].items():
+        print(f"  {loan}: {outcome['status']} {outcome.get('message') or outcome.get('journal_entry')}")
+
+    assert status.status == "Completed"
+    assert details["loans"]["LOAN-DOES-NOT-EXIST"]["status"] == "Failed"
+
+    # 2. Disbursed loans are submitted, scheduled and linked to the shared entry
+    for loan in [l for l, o in details["loans"].items() if o["status"] == "Disbursed"]:
+        doc = frappe.get_doc("SACCO Loan", loan)
+        assert doc.docstatus == 1 and doc.status == "Active"
+        assert doc.disbursement_entry in details["journal_entries"]
+        assert len(doc.installments) == doc.repayment_period
+        assert all(g.docstatus == 1 for g in doc.guarantors)
+        assert frappe.db.get_value("SACCO Member", doc.member, "active_loan") == loan
+
+    # 3. Running the same loans again disburses none of them a second time
+    rerun = frappe.get_doc({"doctype": "SACCO Job Run", "job_name": "Loan Disbursement Run"}).insert(ignore_permissions=True)
+    run_loan_disbursement(loans, run=rerun.name)
+    assert get_job_run_status(rerun.name)["data"].details["disbursed"] == 0
+
+    print("--- Batch Loan Disbursement Run Test Passed! ---")
+
+if __name__ == "__main__":
+    test_loan_disbursement_run()
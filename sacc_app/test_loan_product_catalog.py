@@ -0,0 +1,41 @@
+import frappe
+from sacc_app.api import get_all_loan_products, get_loan_products
+from sacc_app.sacco.doctype.sacco_loan_product.sacco_loan_product import (
+    PRODUCT_CATALOG_KEY, get_loan_product, get_product_catalog
+)
+
+def test_loan_product_catalog():
+    print("--- Testing Loan Product Catalog Cache ---")
+
+    product_name = "Catalog Test Product"
+    if not frappe.db.exists("SACCO Loan Product", product_name):
+        frappe.get_doc({
+            "doctype": "SACCO Loan Product",
+            "product_name": product_name,
+            "interest_rate": 10,
+            "max_repayment_period": 12,
+            "interest_method": "Flat Rate"
+        }).insert(ignore_permissions=True)
+
+    # 1. Catalog serves listings and single lookups
+    catalog = get_product_catalog()
+    assert product_name in catalog["by_name"]
+    assert any(p["name"] == product_name for p in get_all_loan_products()["data"])
+    assert any(p["type"] == product_name for p in get_loan_products()["products"])
+    assert frappe.cache().get_value(PRODUCT_CATALOG_KEY) is not None
+
+    # 2. Updating the product invalidates and the next read sees the change
+    doc = frappe.get_doc("SACCO Loan Product", product_name)
+    doc.interest_rate = 11
+    doc.save(ignore_permissions=True)
+    print(f"Rate after update: {get_loan_product(product_name).interest_rate}")
+    assert get_loan_product(product_name).interest_rate == 11
+
+    # 3. Deleting the product removes it from the catalog
+    frappe.delete_doc("SACCO Loan Product", product_name)
+    assert product_name not in get_product_catalog()["by_name"]
+
+    print("--- Loan Product Catalog Cache Test Passed! ---")
+
+if __name__ == "__main__":
+    test_loan_product_catalog()
@@ -0,0 +1,44 @@
+import frappe
+from frappe.utils import add_days, nowdate
+from sacc_app.tasks import send_loan_reminders
+
+def test_loan_reminders():
+    print("--- Testing Loan Reminder Pipeline ---")
+
+    inst = frappe.db.sql("""
+        SELECT inst.name, inst.due_date, loan.name AS loan
+        FROM `tabSACCO Loan Installment` inst
+        INNER JOIN `tabSACCO Loan` loan ON loan.name = inst.parent
+        WHERE inst.status != 'Paid' AND loan.status = 'Active' AND loan.docstatus = 1
+        LIMIT 1
+    """, as_dict=True)
+    if not inst:
+        print("No unpaid installment on an active loan found. Skipping.")
+        return
+    inst = inst[0]
+
+    # 1. Move the installment to fall due tomorrow (1-day offset)
+    frappe.db.set_value("SACCO Loan Installment", inst.name, "due_date", add_days(nowdate(), 1))
+    frappe.db.delete("SACCO Reminder Log", {"installment": inst.name})
+    outbox_before = frappe.db.count("SACCO Notification Outbox")
+
+    send_loan_reminders()
+    key = f"{inst.name}:1"
+    assert frappe.db.exists("SACCO Reminder Log", key)
+    outbox_after = frappe.db.count("SACCO Notification Outbox")
+    print(f"Reminder logged as {key}, outbox +{outbox_after - outbox_before}")
+    assert outbox_after > outbox_before
+
+    # 2. Re-running the same day never double-sends
+    send_loan_reminders()
+    assert frappe.db.count("SACCO Notification Outbox") == outbox_after
+    assert frappe.db.count("SACCO Reminder Log", {"installment": inst.name}) == 1
+
+    # Restore the original due date
+    frappe.db.set_value("SACCO Loan Installment", inst.name, "due_date", inst.due_date)
+    frappe.db.commit()
+
+    print("--- Loan Reminder Pipeline Test Passed! ---")
+
+if __name__ == "__main__":
+    test_loan_reminders()
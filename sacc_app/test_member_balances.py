@@ -0,0 +1,51 @@
+import frappe
+from frappe.utils import flt
+from sacc_app.api import record_savings_deposit, record_savings_withdrawal
+from sacc_app.member_api import recalculate_member_balances
+
+def get_stored(member_id):
+    return frappe.db.get_value("SACCO Member", member_id,
+        ["total_savings", "total_loan_outstanding"], as_dict=True)
+
+def test_member_balances():
+    print("--- Testing Incremental Member Balances ---")
+
+    suffix = frappe.utils.now_datetime().strftime("%f")
+    member = frappe.get_doc({
+        "doctype": "SACCO Member",
+        "first_name": "Test",
+        "last_name": f"Balance {suffix}",
+        "email": f"testbal_{suffix}@example.com",
+        "phone": f"0713{suffix[:6]}",
+        "national_id": f"BAL{suffix}",
+        "status": "Active",
+        "registration_fee_paid": 1
+    })
+    member.insert(ignore_permissions=True)
+    member_id = member.name
+    print(f"Created test member: {member_id}")
+
+    # 1. Deposit and withdrawal adjust the stored total without a GL re-sum
+    record_savings_deposit(member=member_id, amount=5000, mode="Cash")
+    record_savings_withdrawal(member=member_id, amount=2000, mode="Cash")
+    stored = get_stored(member_id)
+    print(f"After deposit/withdrawal: {stored}")
+    assert abs(flt(stored.total_savings) - 3000) < 0.01
+
+    # 2. Cancelling a deposit reverses both the GL and the stored total
+    deposit = frappe.get_doc("SACCO Savings", {"member": member_id, "type": "Deposit", "docstatus": 1})
+    deposit.cancel()
+    stored = get_stored(member_id)
+    print(f"After cancelling deposit: {stored}")
+    assert abs(flt(stored.total_savings) + 2000) < 0.01
+
+    # 3. Stored totals agree with a full GL recalculation
+    res = recalculate_member_balances(member_id=member_id)
+    print(f"Recalculated: {res['data']}")
+    assert abs(flt(res["data"].total_savings) - flt(stored.total_savings)) < 0.01
+    assert abs(flt(res["data"].total_loan_outstanding) - flt(stored.total_loan_outstanding)) < 0.01
+
+    print("--- Incremental Member Balances Test Passed! ---")
+
+if __name__ == "__main__":
+    test_member_balances()
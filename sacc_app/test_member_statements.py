@@ -0,0 +1,50 @@
+import json
+import frappe
+from frappe.utils import add_days, get_first_day, get_last_day, nowdate
+from sacc_app.statements import (
+    generate_statements, get_statement_data, get_statement_file_name, run_statement_chunk,
+    start_statement_run
+)
+
+def test_member_statements():
+    print("--- Testing Member Statement Run ---")
+
+    members = frappe.db.sql_list("""
+        SELECT name FROM `tabSACCO Member` WHERE IFNULL(savings_account, '') != '' ORDER BY creation DESC LIMIT 3
+    """)
+    assert members, "Need members with savings accounts"
+    last_month = add_days(get_first_day(nowdate()), -1)
+    from_date, to_date = get_first_day(last_month), get_last_day(last_month)
+
+    # 1. Statement data for the batch comes from set-based queries, one context per member
+    contexts = get_statement_data(members, from_date, to_date)
+    assert set(contexts) == set(members)
+    for member, context in contexts.items():
+        savings = context.savings
+        print(f"{member}: opening {savings.opening_balance}, closing {savings.closing_balance}, "
+            f"{len(savings.transactions)} savings, {len(context.loans)} loans, {len(context.welfare)} welfare")
+
+    # 2. A run with its chunks, worked here instead of by the queue
+    run = start_statement_run(from_date, to_date, "html", members)
+    chunks = frappe.db.get_all("SACCO Statement Chunk", filters={"job_run": run}, pluck="name")
+    assert len(chunks) == 1
+    for chunk in chunks:
+        run_statement_chunk(chunk)
+
+    job = frappe.db.get_value("SACCO Job Run", run, ["status", "progress", "rows_affected", "details"], as_dict=True)
+    print(f"Run {run}: {job.status} {job.progress}% ({job.rows_affected} statements)")
+    assert job.status == "Completed" and job.progress == 100
+    assert json.loads(job.details)["completed_chunks"] == 1
+
+    # 3. Every member has their statement attached
+    for member in members:
+        file_name = get_statement_file_name(member, from_date, to_date, "html")
+        assert frappe.db.exists("File", {"attached_to_doctype": "SACCO Member", "attached_to_name": member, "file_name": file_name})
+
+    # 4. Resuming or re-running skips statements already generated
+    assert generate_statements(members, from_date, to_date, "html") == 0
+
+    print("--- Member Statement Run Test Passed! ---")
+
+if __name__ == "__main__":
+    test_member_statements()
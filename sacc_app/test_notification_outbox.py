@@ -0,0 +1,48 @@
+import frappe
+from sacc_app.notify import send_member_email, queue_member_emails, dispatch_notifications
+
+OUTBOX = "SACCO Notification Outbox"
+
+def test_notification_outbox():
+    print("--- Testing Notification Outbox ---")
+
+    member = frappe.db.get_value("SACCO Member", {"email": ["is", "set"]}, ["name", "email"], as_dict=True)
+    if not member:
+        print("No member with an email found. Skipping.")
+        return
+
+    subject = f"Outbox Test {frappe.generate_hash(length=6)}"
+
+    # 1. Queuing writes a pending row in the current transaction
+    send_member_email(member.name, subject, "<p>Outbox test message</p>")
+    row = frappe.db.get_value(OUTBOX, {"subject": subject}, ["recipient", "status", "salutation"], as_dict=True)
+    print(f"Queued: {row}")
+    assert row.recipient == member.email
+    assert row.status == "Pending"
+
+    # 2. A rolled-back transaction leaves nothing to send
+    frappe.db.savepoint("outbox_test")
+    queue_member_emails([{"recipient": member.email, "subject": f"{subject} rollback", "message": "x"}])
+    frappe.db.rollback(save_point="outbox_test")
+    assert not frappe.db.exists(OUTBOX, {"subject": f"{subject} rollback"})
+
+    # 3. Dispatcher renders and marks the batch sent (emails muted here)
+    frappe.flags.mute_emails = True
+    dispatch_notifications()
+    status = frappe.db.get_value(OUTBOX, {"subject": subject}, "status")
+    print(f"Status after dispatch: {status}")
+    assert status == "Sent"
+
+    # 4. A row claimed by another dispatcher is not picked up again
+    send_member_email(member.name, f"{subject} claimed", "<p>Outbox test message</p>")
+    frappe.db.set_value(OUTBOX, {"subject": f"{subject} claimed"}, "status", "Sending")
+    frappe.db.commit()
+    dispatch_notifications()
+    assert frappe.db.get_value(OUTBOX, {"subject": f"{subject} claimed"}, "status") == "Sending"
+    frappe.db.delete(OUTBOX, {"subject": f"{subject} claimed"})
+    frappe.db.commit()
+
+    print("--- Notification Outbox Test Passed! ---")
+
+if __name__ == "__main__":
+    test_notification_outbox()
@@ -0,0 +1,72 @@
+import frappe
+from frappe.utils import flt
+from sacc_app.allocation import apply_waterfall, parse_allocation_order, reverse_waterfall
+
+def make_rows():
+    return [
+        frappe._dict(name=f"INST-{n}", installment_no=n, principal=100, interest=20, penalty=5 if n == 1 else 0,
+            principal_paid=0, interest_paid=0, penalty_paid=0, status="Pending")
+        for n in range(1, 4)
+    ]
+
+def test_repayment_allocation():
+    print("--- Testing Repayment Allocation Waterfall ---")
+
+    # 1. Default order: penalty, then interest, then principal, oldest installment first
+    order = parse_allocation_order(None)
+    rows = make_rows()
+    paid, changed, left = apply_waterfall(rows, 150, order)
+    print(f"Paid {paid}, rows touched: {[r.name for r in changed]}, left {left}")
+    assert paid == {"penalty": 5, "interest": 40, "principal": 105}
+    assert rows[0].status == "Paid" and rows[1].status == "Partially Paid" and rows[2].status == "Pending"
+    assert rows[1].interest_paid == 20 and rows[1].principal_paid == 5
+
+    # 2. Configurable order
+    rows = make_rows()
+    paid, _, _ = apply_waterfall(rows, 50, parse_allocation_order("Principal, Interest, Penalty"))
+    assert paid["principal"] == 50 and paid["interest"] == 0
+
+    # 3. Overpayment is returned as left over once the schedule is settled
+    rows = make_rows()
+    paid, _, left = apply_waterfall(rows, 400, order)
+    assert all(r.status == "Paid" for r in rows) and flt(left) == 35
+
+    # 4. Reversal takes payments back from the latest installments
+    rows = make_rows()
+    paid, _, _ = apply_waterfall(rows, 150, order)
+    reverse_waterfall(list(reversed(rows)), {"principal": 5, "interest": 20, "penalty": 0})
+    assert rows[1].status == "Pending" and rows[0].status == "Paid"
+
+    # 5. Invalid order is rejected
+    try:
+        parse_allocation_order("Interest, Principal")
+        raise AssertionError("Expected validation error")
+    except frappe.ValidationError:
+        pass
+
+    # 6. Cursor advances on a real loan
+    loan = frappe.db.get_value("SACCO Loan", {"status": "Active", "docstatus": 1},
+        ["name", "member", "monthly_installment", "next_installment_idx"], as_dict=True)
+    if loan:
+        repayment = frappe.get_doc({
+            "doctype": "SACCO Loan Repayment",
+            "loan": loan.name,
+            "payment_amount": loan.monthly_installment,
+            "payment_mode": "Cash"
+        }).insert(ignore_permissions=True)
+        repayment.submit()
+        repayment.reload()
+        cursor = frappe.db.get_value("SACCO Loan", loan.name, "next_installment_idx")
+        print(f"Loan {loan.name}: cursor {loan.next_installment_idx} -> {cursor}, "
+            f"principal {repayment.principal_portion}, interest {repayment.interest_portion}")
+        assert abs(flt(repayment.principal_portion) + flt(repayment.interest_portion) + flt(repayment.penalty_portion)
+            - flt(loan.monthly_installment)) < 0.01
+
+        repayment.cancel()
+        assert frappe.db.get_value("SACCO Loan", loan.name, "next_installment_idx") <= cursor
+        frappe.db.commit()
+
+    print("--- Repayment Allocation Waterfall Test Passed! ---")
+
+if __name__ == "__main__":
+    test_repayment_allocation()
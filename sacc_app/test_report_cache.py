@@ -0,0 +1,43 @@
+import time
+import frappe
+from sacc_app.api import get_trial_balance, record_savings_deposit
+from sacc_app.cache import get_gl_watermark, get_report_version, increment_report_version
+
+def test_report_cache():
+    print("--- Testing Report Cache ---")
+
+    # 1. First call computes (forced), the repeat view is served from cache
+    started = time.monotonic()
+    first = get_trial_balance(refresh=1)
+    computed = time.monotonic() - started
+    assert first["status"] == "success" and not first["cache"]["hit"]
+
+    started = time.monotonic()
+    second = get_trial_balance()
+    cached = time.monotonic() - started
+    print(f"Computed in {computed:.3f}s, served from cache in {cached:.3f}s (age {second['cache']['age_seconds']}s)")
+    assert second["cache"]["hit"] and second["data"] == first["data"]
+    assert second["cache"]["computed_at"] == first["cache"]["computed_at"]
+
+    # 2. A posting moves the GL watermark and the next view recomputes
+    watermark = get_gl_watermark()
+    member = frappe.db.get_value("SACCO Member", {"status": "Active", "savings_account": ["is", "set"]}, "name")
+    if member:
+        record_savings_deposit(member, 10, mode="Cash", reference=f"CACHE-{frappe.generate_hash(length=6)}")
+        assert get_gl_watermark() != watermark
+        third = get_trial_balance()
+        assert not third["cache"]["hit"]
+        frappe.db.rollback()
+
+    # 3. A posting committed after the result was cached moves the counter even when its GL
+    #    rows are older than the watermark, and the next view recomputes
+    get_trial_balance()
+    version = get_report_version()
+    increment_report_version()
+    assert get_report_version() == version + 1
+    assert not get_trial_balance()["cache"]["hit"]
+
+    print("--- Report Cache Test Passed! ---")
+
+if __name__ == "__main__":
+    test_report_cache()
@@ -0,0 +1,44 @@
+import frappe
+from sacc_app.api import get_all_transactions, record_savings_deposit
+from sacc_app.transaction_feed import refresh_transaction_feed
+
+def test_transaction_feed():
+    print("--- Testing Transaction Feed ---")
+
+    member = frappe.db.get_value("SACCO Member", {"status": "Active", "savings_account": ["is", "set"]}, "name")
+    assert member, "Need an active member with a savings account"
+
+    # 1. A deposit shows up in the feed as soon as its Journal Entry is submitted
+    res = record_savings_deposit(member, 1234, mode="Cash", reference=f"FEED-{frappe.generate_hash(length=6)}")
+    savings = res["id"]
+    voucher = frappe.db.get_value("SACCO Savings", savings, "journal_entry") or \
+        frappe.db.get_value("Journal Entry", {"user_remark": ["like", f"%(Ref: {savings})"], "docstatus": 1}, "name")
+    assert voucher, f"No Journal Entry found for {savings}"
+
+    row = frappe.db.get_value("SACCO Transaction Feed", voucher,
+        ["category", "direction", "amount", "member", "status"], as_dict=True)
+    print(f"Feed row: {row}")
+    assert row and row.category == "Savings" and row.status == "Completed"
+    assert row.direction == "In" and abs(row.amount - 1234) < 0.01
+
+    # 2. The list reads it back with the filters the transactions screen uses
+    listed = get_all_transactions(category="Savings", search=voucher, status="Completed")
+    assert listed["status"] == "success"
+    assert [t["transaction_id"] for t in listed["data"]] == [voucher]
+    assert listed["pagination"]["total"] == 1
+
+    # 3. Cancelling keeps the amounts and flips the status
+    frappe.get_doc("Journal Entry", voucher).cancel()
+    row = frappe.db.get_value("SACCO Transaction Feed", voucher, ["status", "amount"], as_dict=True)
+    assert row.status == "Cancelled" and abs(row.amount - 1234) < 0.01
+
+    # 4. Rebuilding from the GL gives the same row
+    frappe.db.delete("SACCO Transaction Feed", {"name": voucher})
+    refresh_transaction_feed([voucher])
+    assert frappe.db.get_value("SACCO Transaction Feed", voucher, "status") == "Cancelled"
+
+    frappe.db.rollback()
+    print("--- Transaction Feed Test Passed! ---")
+
+if __name__ == "__main__":
+    test_transaction_feed()
@@ -0,0 +1,152 @@
+"""
+Transaction feed.
+
+SACCO Transaction Feed keeps one row per Journal Entry / Payment Entry with what the
+transactions screen shows: category, cash direction and amount, member and status. Rows are
+written when the voucher is submitted or cancelled, so listing transactions is one indexed
+read instead of grouping GL Entry and classifying every voucher on the page.
+"""
+
+import re
+
+import frappe
+from frappe.utils import flt
+
+from sacc_app.jobs import track_job_run
+
+FEED_VOUCHER_TYPES = ("Journal Entry", "Payment Entry")
+
+# Vouchers per refresh statement in the rebuild
+REBUILD_CHUNK = 1000
+
+# ERPNext marks the reversing GL rows it adds on cancellation with this remark; they are left
+# out so a cancelled voucher keeps the amounts it was posted with
+REVERSAL_REMARK = "On cancellation of %%"
+
+# Filter values of the transactions list that cover more than one category
+CATEGORY_FILTERS = {
+	"Loan": ("Loan Repayment", "Loan Disbursement")
+}
+
+MEMBER_PATTERN = re.compile(r"MEM-\d+")
+
+# Per voucher: volume, net cash/bank movement, whether it touches an expense account, and
+# the party and remarks of its first row
+VOUCHER_SQL = f"""
+	SELECT gle.voucher_no, gle.voucher_type, gle.company,
+		MIN(gle.posting_date) AS posting_date,
+		MIN(gle.creation) AS posted_on,
+		SUM(gle.debit) AS total_volume,
+		SUM(CASE WHEN acc.account_type IN ('Cash', 'Bank') THEN gle.debit - gle.credit ELSE 0 END) AS net_cash,
+		MAX(acc.root_type = 'Expense') AS has_expense,
+		MIN(gle.is_cancelled) AS is_cancelled,
+		SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(gle.party_type, '') ORDER BY gle.creation, gle.name SEPARATOR '\\n'), '\\n', 1) AS party_type,
+		SUBSTRING_INDEX(GROUP_CONCAT(IFNULL(gle.party, '') ORDER BY gle.creation, gle.name SEPARATOR '\\n'), '\\n', 1) AS party,
+		MIN(gle.remarks) AS remarks
+	FROM `tabGL Entry` gle
+	LEFT JOIN `tabAccount` acc ON acc.name = gle.account
+	WHERE gle.voucher_type IN %(voucher_types)s AND gle.voucher_no IN %(vouchers)s
+		AND (gle.is_cancelled = 0 OR IFNULL(gle.remarks, '') NOT LIKE '{REVERSAL_REMARK}')
+	GROUP BY gle.voucher_no, gle.voucher_type, gle.company
+"""
+
+FEED_FIELDS = ("voucher_no", "voucher_type", "company", "posting_date", "posted_on", "category",
+	"direction", "amount", "total_volume", "member", "member_name", "party_type", "party", "remarks", "status")
+
+
+def update_transaction_feed(doc, method=None):
+	"""doc_events hook for Journal Entry / Payment Entry on submit and cancel."""
+	refresh_transaction_feed([doc.name])
+
+
+def refresh_transaction_feed(vouchers):
+	"""Recomputes the feed rows of the given vouchers from their GL entries in one upsert."""
+	vouchers = tuple({v for v in vouchers if v})
+	if not vouchers:
+		return
+
+	rows = frappe.db.sql(VOUCHER_SQL, {"voucher_types": FEED_VOUCHER_TYPES, "vouchers": vouchers}, as_dict=True)
+	if not rows:
+		return
+
+	members = get_members(rows)
+	for row in rows:
+		row.category = get_category(row)
+		net_cash = flt(row.net_cash, 2)
+		row.direction = "In" if net_cash > 0 else "Out" if net_cash < 0 else "Neutral"
+		# Vouchers with no cash leg (transfers between member accounts) show their volume
+		row.amount = abs(net_cash) or flt(row.total_volume, 2)
+		row.member, row.member_name = members.get(row.voucher_no, (None, None))
+		row.party_type = row.party_type or None
+		row.party = row.party or None
+		row.status = "Cancelled" if row.is_cancelled else "Completed"
+
+	frappe.db.sql(f"""
+		INSERT INTO `tabSACCO Transaction Feed` (
+			name, creation, modified, owner, modified_by, docstatus, idx, {", ".join(FEED_FIELDS)}
+		)
+		VALUES {", ".join(["(%s, NOW(), NOW(), 'Administrator', 'Administrator', 0, 0, " + ", ".join(["%s"] * len(FEED_FIELDS)) + ")"] * len(rows))}
+		ON DUPLICATE KEY UPDATE
+			modified = VALUES(modified),
+			{", ".join(f"{field} = VALUES({field})" for field in FEED_FIELDS)}
+	""", [v for row in rows for v in (row.voucher_no, *(row[field] for field in FEED_FIELDS))])
+
+
+def get_category(row):
+	remarks = (row.remarks or "").lower()
+	if "savings" in remarks:
+		return "Savings"
+	if "repayment" in remarks:
+		return "Loan Repayment"
+	if "disbursement" in remarks:
+		return "Loan Disbursement"
+	if "registration" in remarks:
+		return "Registration Fee"
+	if row.voucher_type == "Journal Entry" and row.has_expense:
+		return "Expense"
+	return "General"
+
+
+def get_members(rows):
+	"""{voucher: (member, member_name)} from the customer party, else a member ID in the remarks."""
+	customers = {row.party for row in rows if row.party_type == "Customer" and row.party}
+	by_customer = {c: (m, name) for m, name, c in frappe.db.sql("""
+		SELECT name, member_name, customer_link FROM `tabSACCO Member` WHERE customer_link IN %s
+	""", (tuple(customers),))} if customers else {}
+
+	mentioned = {}
+	for row in rows:
+		if row.party_type == "Customer" and row.party in by_customer:
+			continue
+		match = MEMBER_PATTERN.search(row.remarks or "")
+		if match:
+			mentioned[row.voucher_no] = match.group()
+
+	by_id = dict(frappe.db.sql("""
+		SELECT name, member_name FROM `tabSACCO Member` WHERE name IN %s
+	""", (tuple(set(mentioned.values())),))) if mentioned else {}
+
+	members = {}
+	for row in rows:
+		if row.party_type == "Customer" and row.party in by_customer:
+			members[row.voucher_no] = by_customer[row.party]
+		elif mentioned.get(row.voucher_no) in by_id:
+			member = mentioned[row.voucher_no]
+			members[row.voucher_no] = (member, by_id[member])
+	return members
+
+
+def rebuild_transaction_feed():
+	"""
+	Refills the feed from every Journal Entry and Payment Entry in the GL. Run after restoring
+	or reposting ledgers: bench execute sacc_app.transaction_feed.rebuild_transaction_feed
+	"""
+	with track_job_run("Transaction Feed Rebuild") as run:
+		vouchers = frappe.db.sql_list("""
+			SELECT DISTINCT voucher_no FROM `tabGL Entry`
+			WHERE voucher_type IN %s
+			ORDER BY voucher_no
+		""", (FEED_VOUCHER_TYPES,))
+		for start in range(0, len(vouchers), REBUILD_CHUNK):
+			refresh_transaction_feed(vouchers[start:start + REBUILD_CHUNK])
+		run.rows_affected = len(vouchers)
@@ -0,0 +1,37 @@
+import frappe
+from frappe.utils import cint
+
+
+def reserve_names(prefix, count, digits=5):
+	"""
+	Reserves `count` consecutive document names from a naming series
+	(e.g. prefix "SAV-" for autoname "SAV-.#####") with a single locked update,
+	so bulk inserts don't pay one series round-trip per row.
+	"""
+	if count <= 0:
+		return []
+
+	current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (prefix,))
+	if current:
+		start = cint(current[0][0])
+		frappe.db.sql("UPDATE `tabSeries` SET `current` = %s WHERE `name` = %s", (start + count, prefix))
+	else:
+		start = 0
+		frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, count))
+
+	return [f"{prefix}{str(start + i).zfill(digits)}" for i in range(1, count + 1)]
+
+
+def count_journal_entry_links(journal_entry):
+	"""
+	Number of SACCO documents posted through one Journal Entry. Bulk deposits, batch disbursements
+	and check-off remittances share an entry, which must then be reversed per document, not cancelled.
+	"""
+	return sum(
+		frappe.db.count(doctype, {fieldname: journal_entry})
+		for doctype, fieldname in (
+			("SACCO Savings", "journal_entry"),
+			("SACCO Loan Repayment", "journal_entry"),
+			("SACCO Loan", "disbursement_entry")
+		)
+	)
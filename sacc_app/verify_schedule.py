@@ -44,11 +44,11 @@ def test_schedule_breakdown():
     print(f"Total Repayable: {loan.total_repayable}")
     print(f"Monthly Installment: {loan.monthly_installment}")
     
-    if not loan.repayment_schedule:
+    schedule = loan.get_repayment_schedule()
+    if not schedule:
         print("FAILURE: Repayment Schedule is empty.")
         return
 
-    schedule = json.loads(loan.repayment_schedule)
     if schedule:
         row = schedule[0]
         print("\nSample Schedule Item:")
@@ -1,6 +1,7 @@
 import frappe
 from frappe import _
 from frappe.utils import flt, nowdate
+from sacc_app.account_map import get_account_map, get_payment_account
 
 @frappe.whitelist(allow_guest=True, methods=['POST'])
 def create_welfare_claim(member_id, reason, claim_amount, description=None):
@@ -161,16 +162,12 @@ def pay_welfare_claim(claim_id, payment_amount, payment_mode="Cash"):
     claim.save(ignore_permissions=True)
     
     # Create GL Entry for the payment
-    company = frappe.defaults.get_user_default("Company") or frappe.db.get_single_value("Global Defaults", "default_company")
+    accounts = get_account_map()
+    company = accounts.company
     
     # Get accounts
-    cash_account = frappe.db.get_value("Account", {"account_type": "Cash", "company": company, "is_group": 0})
-    if not cash_account:
-        cash_account = frappe.db.get_value("Account", {"is_group": 0, "root_type": "Asset", "company": company})
-    
-    welfare_fund = frappe.db.get_value("Account", {"account_name": "Welfare Fund Account", "company": company})
-    if not welfare_fund:
-        welfare_fund = frappe.db.get_value("Account", {"root_type": "Liability", "is_group": 0, "company": company})
+    cash_account = get_payment_account(payment_mode, company)
+    welfare_fund = accounts.welfare_fund
     
     # Create Journal Entry for payment
     je = frappe.new_doc("Journal Entry")